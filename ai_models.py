@@ -2,75 +2,509 @@
 AI模型管理模块
 支持多个AI模型提供商的统一接入和管理
 """
+import asyncio
+import atexit
+import functools
 import json
+import logging
+import random
+import re
+import string
+import threading
 import time
-from typing import Dict, Any, Optional, List
-from abc import ABC, abstractmethod
+import weakref
+from datetime import datetime, timezone
+from collections import OrderedDict, deque
+from enum import Enum
+from typing import Dict, Any, Optional, List, Tuple
+import httpx
 import openai
 import requests
-from sqlalchemy.orm import Session
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from sqlalchemy.orm import Session, load_only, sessionmaker
 from config import settings, AI_MODEL_CONFIGS
-from models import AIModelConfig, SystemLog
+from sqlalchemy import insert, func
+from models import AIModelConfig, SystemLog, LlmCallMetric, SessionLocal
+from prompt_cache import PromptCache, prompt_cache, response_cache
 
+logger = logging.getLogger(__name__)
 
-class BaseAIModel(ABC):
-    """AI模型基类"""
+try:
+    import dashscope
+except ImportError:  # 阿里通义千问SDK为可选依赖
+    dashscope = None
+
+try:
+    import orjson
+except ImportError:  # 未安装orjson时回退到标准库json
+    orjson = None
+
+try:
+    import tiktoken
+except ImportError:  # 未安装tiktoken时按字符数估算token
+    tiktoken = None
+
+
+def _json_dumps(obj: Any, sort_keys: bool = False) -> bytes:
+    """序列化为JSON bytes，优先使用orjson"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else None)
+    return json.dumps(obj, ensure_ascii=False, sort_keys=sort_keys, separators=(",", ":")).encode("utf-8")
+
+
+def _json_loads(data: bytes) -> Any:
+    """解析JSON，优先使用orjson"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# 模块级共享的异步HTTP客户端，所有模型实例复用同一个keep-alive连接池；
+# 连接池绑定创建时的事件循环，按事件循环分别保存（循环关闭回收后对应条目自动释放）
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """获取当前事件循环共享的异步HTTP客户端"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        if settings.AI_HTTP2:
+            # HTTP/2下多个并发请求复用同一TCP连接
+            limits = httpx.Limits(max_keepalive_connections=50, max_connections=100)
+        else:
+            # HTTP/1.1每个连接同时只能承载一个请求，需要更大的连接池
+            limits = httpx.Limits(max_keepalive_connections=100, max_connections=200)
+        client = _async_clients[loop] = httpx.AsyncClient(
+            limits=limits,
+            http2=settings.AI_HTTP2,
+            timeout=60
+        )
+    return client
+
+
+# 模块级共享的同步HTTP会话，复用TCP/TLS连接，并对限流和网关错误自动重试
+_session = requests.Session()
+_session.headers["Connection"] = "keep-alive"
+_adapter = HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=100,
+    max_retries=Retry(
+        total=2,
+        backoff_factor=0.3,
+        status_forcelist=[429, 502, 503, 504],
+        allowed_methods=frozenset(["GET", "POST"]),
+        raise_on_status=False  # 重试用尽后返回最后一次响应，交由调用方按状态码处理
+    )
+)
+_session.mount("https://", _adapter)
+_session.mount("http://", _adapter)
+
+# 连接测试结果缓存：config_id -> (是否成功, 测试时间戳)，避免页面刷新反复发起付费调用
+_TEST_CACHE: Dict[int, Tuple[bool, float]] = {}
+TEST_CACHE_TTL = 30  # 秒
+
+# 各提供商的默认并发上限，可由模型配置的max_concurrent覆盖
+PROVIDER_CONCURRENCY = {"openai": 20, "deepseek": 10, "baidu": 5, "dashscope": 5}
+RATE_LIMIT_RETRIES = 3
+
+
+class _RateLimiter:
+    """限流器：信号量限制并发数，时间戳滑动窗口限制每分钟请求数"""
+    __slots__ = ("max_concurrent", "per_minute", "_semaphore", "_calls")
+    
+    def __init__(self, max_concurrent: int, per_minute: Optional[int] = None):
+        self.max_concurrent = max_concurrent
+        self.per_minute = per_minute
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._calls: deque = deque()
+    
+    async def _wait_window(self):
+        """等待滑动窗口内有空余名额"""
+        while True:
+            now = time.monotonic()
+            while self._calls and now - self._calls[0] >= 60:
+                self._calls.popleft()
+            if len(self._calls) < self.per_minute:
+                self._calls.append(now)
+                return
+            await asyncio.sleep(60 - (now - self._calls[0]))
+    
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        if self.per_minute:
+            try:
+                await self._wait_window()
+            except BaseException:
+                self._semaphore.release()
+                raise
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        self._semaphore.release()
+
+
+# 限流器按配置ID在所有管理器实例间共享，各配置的上限互不影响；
+# 信号量绑定创建时的事件循环，按事件循环分别保存（循环关闭回收后对应条目自动释放）
+_rate_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[int, _RateLimiter]]" = weakref.WeakKeyDictionary()
+
+
+def _rate_limiter(config: AIModelConfig) -> _RateLimiter:
+    """获取当前事件循环中模型配置的限流器，配置的上限变化时重建"""
+    max_concurrent = config.max_concurrent or PROVIDER_CONCURRENCY.get(config.provider, 5)
+    limiters = _rate_limiters.setdefault(asyncio.get_running_loop(), {})
+    limiter = limiters.get(config.id)
+    if limiter is None or (limiter.max_concurrent, limiter.per_minute) != (max_concurrent, config.requests_per_minute):
+        limiter = _RateLimiter(max_concurrent, config.requests_per_minute)
+        limiters[config.id] = limiter
+    return limiter
+
+
+def _is_rate_limited(result: Dict[str, Any]) -> bool:
+    """判断失败结果是否由接口限流导致"""
+    error = str(result.get("error") or "")
+    return "429" in error or "limit reached" in error.lower()
+
+
+def _over_budget(model: "BaseAIModel", prompt: str, kwargs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """调用前按本地估算的token数检查预算，超出时直接返回失败结果"""
+    budget = model.config.max_tokens_budget
+    if not budget:
+        return None
+    estimate = model.count_tokens(prompt) + (kwargs.get('max_tokens') or model.config.max_tokens or 0)
+    if estimate > budget:
+        return {"success": False, "error": f"预计消耗{estimate}个token，超出单次调用预算{budget}", "content": None}
+    return None
+
+
+async def _agenerate_limited(model: "BaseAIModel", prompt: str, **kwargs) -> Dict[str, Any]:
+    """在限流器内调用模型，遇到限流时释放名额并指数退避重试"""
+    rejected = _over_budget(model, prompt, kwargs)
+    if rejected:
+        return rejected
+    
+    limiter = _rate_limiter(model.config)
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        async with limiter:
+            result = await model.agenerate_text(prompt, **kwargs)
+        if result["success"] or not _is_rate_limited(result) or attempt == RATE_LIMIT_RETRIES:
+            return result
+        await asyncio.sleep(0.5 * 2 ** attempt + random.random() * 0.1)
+
+
+
+# JSON请求头（请求体序列化为bytes后发送）
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# 百度访问令牌缓存：(api_key, api_secret) -> (access_token, 过期时间戳)
+_TOKEN_CACHE: Dict[Tuple[str, str], Tuple[str, float]] = {}
+
+
+class _CircuitBreaker:
+    """熔断器：连续失败达到阈值后，在冷却时间内直接拒绝请求"""
+    __slots__ = ("failure_threshold", "reset_timeout", "_failures", "_opened_at")
+    
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+    
+    def allow(self) -> bool:
+        """是否允许发起请求，冷却结束后放行一次试探请求"""
+        if self._opened_at is None:
+            return True
+        if time.monotonic() - self._opened_at < self.reset_timeout:
+            return False
+        # 试探请求失败会立即再次熔断
+        self._opened_at = None
+        self._failures = self.failure_threshold - 1
+        return True
+    
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+    
+    def record_failure(self):
+        self._failures += 1
+        if self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+
+
+# 百度令牌接口熔断器：(api_key, api_secret) -> 熔断器
+_TOKEN_BREAKERS: Dict[Tuple[str, str], _CircuitBreaker] = {}
+
+
+# SystemLog与调用指标写入缓冲区，由后台任务批量落库，避免每次生成都单独提交日志
+_log_buffer: deque = deque()
+_metric_buffer: deque = deque()
+LOG_FLUSH_INTERVAL = 1.0  # 秒
+LOG_FLUSH_THRESHOLD = 50
+
+
+def buffer_log(log: SystemLog):
+    """将日志加入写入缓冲区"""
+    _log_buffer.append(log)
+    if len(_log_buffer) + len(_metric_buffer) > LOG_FLUSH_THRESHOLD:
+        flush_logs()
+
+
+def buffer_metric(config_id: int, response_time: float, total_tokens: int = 0,
+                  success: bool = True, cache_hit: bool = False):
+    """将一次AI调用的轻量指标加入写入缓冲区"""
+    _metric_buffer.append({
+        "config_id": config_id,
+        "duration_ms": int(response_time * 1000),
+        "total_tokens": total_tokens,
+        "success": success,
+        "cache_hit": cache_hit,
+        "created_at": datetime.utcnow()
+    })
+    if len(_log_buffer) + len(_metric_buffer) > LOG_FLUSH_THRESHOLD:
+        flush_logs()
+
+
+def flush_logs() -> int:
+    """将缓冲区中的日志和指标批量写入数据库，返回写入条数"""
+    logs = []
+    while _log_buffer:
+        logs.append(_log_buffer.popleft())
+    metrics = []
+    while _metric_buffer:
+        metrics.append(_metric_buffer.popleft())
+    if not logs and not metrics:
+        return 0
+    
+    db = SessionLocal()
+    try:
+        if metrics:
+            db.execute(insert(LlmCallMetric), metrics)
+        db.add_all(logs)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error("写入AI日志失败: %s", e)
+        return 0
+    finally:
+        db.close()
+    return len(logs) + len(metrics)
+
+
+async def log_flush_loop(interval: float = LOG_FLUSH_INTERVAL):
+    """后台定时刷新日志缓冲区"""
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(flush_logs)
+
+
+# 非FastAPI场景（脚本调用）退出时也落库剩余日志
+atexit.register(flush_logs)
+
+
+async def close_async_client():
+    """关闭当前事件循环的共享HTTP客户端和同步客户端（应用关闭时调用）"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+    BaiduModel.close_client()
+
+
+def _drain_sse_frames(buffer: bytearray) -> List[bytes]:
+    """从缓冲区取出所有完整SSE事件的data部分，不完整的事件留在缓冲区"""
+    frames = []
+    while (index := buffer.find(b'\n\n')) != -1:
+        frame = bytes(buffer[:index])
+        del buffer[:index + 2]
+        if frame.startswith(b'data: '):
+            frames.append(frame[6:])  # 移除 'data: ' 前缀
+    return frames
+
+
+@functools.lru_cache(maxsize=16)
+def _tiktoken_encoding(model_name: str):
+    """获取模型对应的BPE编码（按模型名缓存），未知模型使用cl100k_base"""
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def _total_tokens(usage: Any) -> int:
+    """从接口返回的usage中取出总token数"""
+    if isinstance(usage, dict):
+        return usage.get("total_tokens", 0) or 0
+    return 0
+
+
+class PromptCategory(str, Enum):
+    """提示词类别：只有信息类提示词的生成结果可以缓存复用"""
+    INFORMATIONAL = "informational"  # 创作、改写等不产生副作用的提示词
+    COMMAND = "command"  # 指令类或用户直接输入的提示词，不缓存
+
+
+class BaseAIModel:
+    """AI模型基类（子类需实现generate_text、generate_text_stream和test_connection）"""
+    
+    __slots__ = ("config",)
     
     def __init__(self, config: AIModelConfig):
         self.config = config
         
-    @abstractmethod
     def generate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
         """生成文本"""
-        pass
+        raise NotImplementedError
+    
+    async def agenerate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        """异步生成文本（默认放到线程中执行同步实现，避免阻塞事件循环）"""
+        return await asyncio.to_thread(self.generate_text, prompt, **kwargs)
+    
+    def take_refreshed_token(self) -> Optional[Tuple[str, datetime]]:
+        """取出新获取、尚未写入配置表的访问令牌和过期时间（只有需要换取令牌的提供商会返回）"""
+        return None
     
-    @abstractmethod
     def generate_text_stream(self, prompt: str, **kwargs):
         """流式生成文本"""
-        pass
+        raise NotImplementedError
+    
+    def count_tokens(self, text: str) -> int:
+        """本地估算token数（中文约每2个字符一个token）"""
+        return len(text) // 2 + 1
+    
+    async def agenerate_text_stream(self, prompt: str, chunk_size: int = 16, **kwargs):
+        """异步流式生成文本（默认等待完整结果后按块输出）"""
+        result = await self.agenerate_text(prompt, **kwargs)
+        for chunk in self._simulate_stream(result, chunk_size):
+            yield chunk
+    
+    @staticmethod
+    def _simulate_stream(result: Dict[str, Any], chunk_size: int = 16):
+        """将完整结果按块模拟流式输出（用于不支持真正流式的接口）"""
+        if not result["success"]:
+            yield {"error": result.get("error", "生成失败")}
+            return
+        
+        content = result["content"]
+        for i in range(0, len(content), chunk_size):
+            yield {
+                "success": True,
+                "content": content[i:i + chunk_size],
+                "finished": False
+            }
+        
+        # 流式生成完成，完整内容只在最后一块返回
+        yield {
+            "success": True,
+            "content": "",
+            "full_content": content,
+            "finished": True,
+            "usage": result.get("usage", {})
+        }
     
-    @abstractmethod
     def test_connection(self) -> bool:
         """测试连接"""
-        pass
+        raise NotImplementedError
 
 
 class OpenAIModel(BaseAIModel):
     """OpenAI模型"""
     
+    __slots__ = ("client", "_async_clients", "_defaults", "_create")
+    
+    API_KEY_PATTERN = re.compile(r"^sk-[A-Za-z0-9_-]{20,}$")
+    # 调用时允许覆盖的请求参数
+    OVERRIDABLE_PARAMS = ("max_tokens", "temperature", "n", "stop")
+    
     def __init__(self, config: AIModelConfig):
         super().__init__(config)
-        openai.api_key = config.api_key
-        if hasattr(config, 'api_base') and config.api_secret:
-            openai.api_base = config.api_secret  # 用于自定义API地址
+        base_url = config.api_secret or None  # 用于自定义API地址
+        self.client = openai.OpenAI(api_key=config.api_key or "", base_url=base_url)
+        # 异步客户端在首次异步调用时按事件循环创建，复用该循环的共享连接池
+        self._async_clients = weakref.WeakKeyDictionary()
+        # 默认请求参数和创建接口按配置固定，配置更新时模型实例会重建
+        self._defaults = {
+            "model": config.model_name or "gpt-3.5-turbo",
+            "max_tokens": config.max_tokens,
+            "temperature": config.temperature,
+            "n": 1,
+            "stop": None,
+        }
+        self._create = self.client.chat.completions.create
     
-    def generate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
-        """生成文本"""
-        try:
-            response = openai.ChatCompletion.create(
-                model=self.config.model_name or "gpt-3.5-turbo",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=kwargs.get('max_tokens', self.config.max_tokens),
-                temperature=kwargs.get('temperature', self.config.temperature),
-                n=kwargs.get('n', 1),
-                stop=kwargs.get('stop'),
+    @property
+    def async_client(self) -> openai.AsyncOpenAI:
+        """当前事件循环的异步客户端，HTTP/2下并发请求多路复用同一连接"""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = openai.AsyncOpenAI(
+                api_key=self.config.api_key or "",
+                base_url=self.config.api_secret or None,  # 用于自定义API地址
+                http_client=get_async_client()
             )
-            
-            content = response.choices[0].message.content
-            usage = response.usage
-            
-            return {
+        return client
+    
+    def count_tokens(self, text: str) -> int:
+        """使用tiktoken在本地计算token数，无需调用接口"""
+        if tiktoken is None:
+            return super().count_tokens(text)
+        return len(_tiktoken_encoding(self._defaults["model"]).encode(text))
+    
+    def _request_params(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        """构建请求参数"""
+        params = {**self._defaults, "messages": [{"role": "user", "content": prompt}]}
+        params.update((key, kwargs[key]) for key in self.OVERRIDABLE_PARAMS if key in kwargs)
+        return params
+    
+    @staticmethod
+    def _split_response(response, count: int) -> List[Dict[str, Any]]:
+        """将n=count的返回结果拆分为count个独立结果，token用量按条均摊"""
+        usage = response.usage
+        
+        def share(total: int, index: int) -> int:
+            return total // count + (1 if index < total % count else 0)
+        
+        results = []
+        for index, choice in enumerate(response.choices[:count]):
+            prompt_tokens = share(usage.prompt_tokens, index)
+            completion_tokens = share(usage.completion_tokens, index)
+            results.append({
                 "success": True,
-                "content": content,
+                "content": choice.message.content,
                 "usage": {
-                    "prompt_tokens": usage.prompt_tokens,
-                    "completion_tokens": usage.completion_tokens,
-                    "total_tokens": usage.total_tokens
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens
                 },
                 "model": response.model
+            })
+        return results
+    
+    @classmethod
+    def _parse_response(cls, response) -> Dict[str, Any]:
+        """解析接口返回结果"""
+        return cls._split_response(response, 1)[0]
+    
+    def generate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        """生成文本"""
+        try:
+            response = self._create(**self._request_params(prompt, **kwargs))
+            return self._parse_response(response)
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "content": None
             }
+    
+    async def agenerate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        """异步生成文本（相同提示词和参数的并发请求合并为一次调用）"""
+        try:
+            params = self._request_params(prompt, **kwargs)
+            if params["n"] == 1 and settings.AI_OPENAI_BATCH_WINDOW > 0:
+                return await _openai_batch_queue.submit(self, params)
+            response = await self.async_client.chat.completions.create(**params)
+            return self._parse_response(response)
         except Exception as e:
             return {
                 "success": False,
@@ -81,29 +515,21 @@ class OpenAIModel(BaseAIModel):
     def generate_text_stream(self, prompt: str, **kwargs):
         """流式生成文本"""
         try:
-            response = openai.ChatCompletion.create(
-                model=self.config.model_name or "gpt-3.5-turbo",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=kwargs.get('max_tokens', self.config.max_tokens),
-                temperature=kwargs.get('temperature', self.config.temperature),
-                n=kwargs.get('n', 1),
-                stop=kwargs.get('stop'),
+            response = self._create(
+                **self._request_params(prompt, **kwargs),
                 stream=True
             )
             
-            content = ""
+            parts: List[str] = []
             for chunk in response:
                 if hasattr(chunk, 'choices') and len(chunk.choices) > 0:
                     delta = chunk.choices[0].delta
                     if hasattr(delta, 'content') and delta.content:
                         chunk_content = delta.content
-                        content += chunk_content
+                        parts.append(chunk_content)
                         yield {
                             "success": True,
                             "content": chunk_content,
-                            "full_content": content,
                             "finished": False
                         }
             
@@ -111,7 +537,37 @@ class OpenAIModel(BaseAIModel):
             yield {
                 "success": True,
                 "content": "",
-                "full_content": content,
+                "full_content": "".join(parts),
+                "finished": True
+            }
+            
+        except Exception as e:
+            yield {"error": str(e)}
+    
+    async def agenerate_text_stream(self, prompt: str, **kwargs):
+        """异步流式生成文本，首个token到达即输出"""
+        try:
+            response = await self.async_client.chat.completions.create(
+                **self._request_params(prompt, **kwargs),
+                stream=True
+            )
+            
+            parts: List[str] = []
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    chunk_content = chunk.choices[0].delta.content
+                    parts.append(chunk_content)
+                    yield {
+                        "success": True,
+                        "content": chunk_content,
+                        "finished": False
+                    }
+            
+            # 流式生成完成
+            yield {
+                "success": True,
+                "content": "",
+                "full_content": "".join(parts),
                 "finished": True
             }
             
@@ -120,8 +576,11 @@ class OpenAIModel(BaseAIModel):
     
     def test_connection(self) -> bool:
         """测试连接"""
+        # 官方接口的密钥格式明显不对时直接判定失败（自定义地址的兼容接口密钥格式不固定）
+        if not self.config.api_secret and not self.API_KEY_PATTERN.match(self.config.api_key or ""):
+            return False
         try:
-            response = openai.ChatCompletion.create(
+            self.client.chat.completions.create(
                 model=self.config.model_name or "gpt-3.5-turbo",
                 messages=[{"role": "user", "content": "测试连接"}],
                 max_tokens=10
@@ -131,96 +590,277 @@ class OpenAIModel(BaseAIModel):
             return False
 
 
+class _BatchQueue:
+    """OpenAI请求合并队列：时间窗口内相同提示词和参数的请求合并为一次n=k调用"""
+    
+    def __init__(self):
+        self._pending: Dict[Tuple[Any, ...], List[asyncio.Future]] = {}
+        self._tasks: set = set()  # 持有合并调用任务的引用，避免被垃圾回收
+    
+    async def submit(self, model: OpenAIModel, params: Dict[str, Any]) -> Dict[str, Any]:
+        """提交请求并等待合并调用的结果"""
+        key = (model.config.api_key, model.config.api_secret, _json_dumps(params, sort_keys=True))
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiters = self._pending.get(key)
+        if waiters is None:
+            waiters = self._pending[key] = []
+            loop.call_later(settings.AI_OPENAI_BATCH_WINDOW, self._schedule_flush, loop, key, model, params)
+        waiters.append(future)
+        return await future
+    
+    def _schedule_flush(self, loop: asyncio.AbstractEventLoop, key: Tuple[Any, ...], model: OpenAIModel, params: Dict[str, Any]):
+        """窗口结束时启动合并调用"""
+        task = loop.create_task(self._flush(key, model, params))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _flush(self, key: Tuple[Any, ...], model: OpenAIModel, params: Dict[str, Any]):
+        """发起合并调用并把结果分发给各个等待方"""
+        waiters = self._pending.pop(key, [])
+        if not waiters:
+            return
+        try:
+            response = await model.async_client.chat.completions.create(**{**params, "n": len(waiters)})
+            results = model._split_response(response, len(waiters))
+        except Exception as e:
+            results = []
+            error = str(e)
+        else:
+            error = "返回结果数量不足"
+        
+        for index, future in enumerate(waiters):
+            if future.done():
+                continue
+            if index < len(results):
+                future.set_result(results[index])
+            else:
+                future.set_result({"success": False, "error": error, "content": None})
+
+
+_openai_batch_queue = _BatchQueue()
+
+
 class BaiduModel(BaseAIModel):
     """百度文心一言模型"""
     
+    __slots__ = ("access_token", "model_name", "_endpoint", "_token_query", "_token_refreshed")
+    
+    TOKEN_URL = "https://aip.baidubce.com/oauth/2.0/token"
+    
+    # 所有实例共享的同步客户端，HTTP/2下并发请求复用同一TLS连接
+    _client: Optional[httpx.Client] = None
+    
+    @classmethod
+    def _sync_client(cls) -> httpx.Client:
+        """获取共享的同步HTTP客户端"""
+        if cls._client is None or cls._client.is_closed:
+            cls._client = httpx.Client(
+                transport=httpx.HTTPTransport(
+                    http2=settings.AI_HTTP2,
+                    retries=3,  # 建立连接失败时重试
+                    limits=httpx.Limits(max_keepalive_connections=20)
+                ),
+                timeout=30
+            )
+        return cls._client
+    
+    @classmethod
+    def close_client(cls):
+        """关闭共享的同步HTTP客户端"""
+        if cls._client is not None:
+            cls._client.close()
+            cls._client = None
+    
     def __init__(self, config: AIModelConfig):
         super().__init__(config)
+        # 访问令牌在首次调用时获取，避免构造实例时阻塞
         self.access_token = None
-        self._get_access_token()
+        self._token_refreshed = False
+        # 模型名、接口地址和令牌参数按配置固定，只计算一次
+        self.model_name = config.model_name or "ernie-bot-turbo"
+        self._endpoint = f"https://aip.baidubce.com/rpc/2.0/ai/v1/chat/{self.model_name}"
+        self._token_query = {
+            "grant_type": "client_credentials",
+            "client_id": config.api_key,
+            "client_secret": config.api_secret
+        }
+    
+    def _token_params(self) -> Dict[str, str]:
+        """获取令牌请求参数"""
+        return self._token_query
+    
+    def _token_key(self) -> Tuple[str, str]:
+        """令牌缓存键"""
+        return (self.config.api_key, self.config.api_secret)
+    
+    def _load_cached_token(self) -> bool:
+        """从缓存读取未过期的令牌，进程内缓存未命中时读取配置表中持久化的令牌"""
+        entry = _TOKEN_CACHE.get(self._token_key())
+        if not entry and self.config.access_token and self.config.token_expires_at:
+            entry = (self.config.access_token, self.config.token_expires_at.replace(tzinfo=timezone.utc).timestamp())
+            _TOKEN_CACHE[self._token_key()] = entry
+        if entry and entry[1] > time.time():
+            self.access_token = entry[0]
+            return True
+        self.access_token = None
+        return False
+    
+    def _store_token(self, result: Dict[str, Any]):
+        """缓存令牌，提前60秒视为过期；同时标记为待写入配置表，随下一次使用统计一起提交，重启后无需重新获取"""
+        self.access_token = result.get("access_token")
+        if self.access_token:
+            expires_at = time.time() + result.get("expires_in", 0) - 60
+            _TOKEN_CACHE[self._token_key()] = (self.access_token, expires_at)
+            self.config.access_token = self.access_token
+            self.config.token_expires_at = datetime.utcfromtimestamp(expires_at)
+            self._token_refreshed = True
+    
+    def take_refreshed_token(self) -> Optional[Tuple[str, datetime]]:
+        """取出新获取的令牌，取出后清除标记，同一令牌只写入一次"""
+        if not self._token_refreshed:
+            return None
+        self._token_refreshed = False
+        return self.config.access_token, self.config.token_expires_at
+    
+    def _token_breaker(self) -> _CircuitBreaker:
+        """获取当前密钥对应的令牌接口熔断器"""
+        breaker = _TOKEN_BREAKERS.get(self._token_key())
+        if breaker is None:
+            breaker = _TOKEN_BREAKERS[self._token_key()] = _CircuitBreaker()
+        return breaker
+    
+    def _store_token_response(self, content: bytes):
+        """解析令牌接口响应，未返回令牌时抛出异常"""
+        result = _json_loads(content)
+        if not result.get("access_token"):
+            raise RuntimeError(result.get("error_description") or "未获取到访问令牌")
+        self._store_token(result)
     
     def _get_access_token(self):
-        """获取访问令牌"""
+        """获取访问令牌，失败时抛出异常；连续失败3次后熔断60秒，期间不再请求令牌接口"""
+        if self._load_cached_token():
+            return
+        breaker = self._token_breaker()
+        if not breaker.allow():
+            raise RuntimeError("百度令牌接口连续失败，暂停获取访问令牌")
+        try:
+            response = self._sync_client().post(self.TOKEN_URL, params=self._token_params())
+            self._store_token_response(response.content)
+        except Exception:
+            breaker.record_failure()
+            logger.exception("获取百度访问令牌失败")
+            raise
+        breaker.record_success()
+    
+    async def _aget_access_token(self):
+        """异步获取访问令牌"""
+        if self._load_cached_token():
+            return
+        breaker = self._token_breaker()
+        if not breaker.allow():
+            raise RuntimeError("百度令牌接口连续失败，暂停获取访问令牌")
         try:
-            url = "https://aip.baidubce.com/oauth/2.0/token"
-            params = {
-                "grant_type": "client_credentials",
-                "client_id": self.config.api_key,
-                "client_secret": self.config.api_secret
+            response = await get_async_client().post(self.TOKEN_URL, params=self._token_params())
+            self._store_token_response(response.content)
+        except Exception:
+            breaker.record_failure()
+            logger.exception("获取百度访问令牌失败")
+            raise
+        breaker.record_success()
+    
+    def _build_request(self, prompt: str, **kwargs) -> Tuple[str, str, Dict[str, Any]]:
+        """构建请求地址和请求体"""
+        url = f"{self._endpoint}?access_token={self.access_token}"
+        
+        payload = {
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": kwargs.get('temperature', self.config.temperature),
+            "max_output_tokens": kwargs.get('max_tokens', self.config.max_tokens)
+        }
+        return self.model_name, url, payload
+    
+    @staticmethod
+    def _parse_result(result: Dict[str, Any], model_name: str) -> Dict[str, Any]:
+        """解析接口返回结果"""
+        if "result" in result:
+            return {
+                "success": True,
+                "content": result["result"],
+                "usage": result.get("usage", {}),
+                "model": model_name
+            }
+        else:
+            return {
+                "success": False,
+                "error": result.get("error_msg", "未知错误"),
+                "content": None
             }
-            response = requests.post(url, params=params)
-            result = response.json()
-            self.access_token = result.get("access_token")
-        except Exception as e:
-            print(f"获取百度访问令牌失败: {e}")
+    
+    @classmethod
+    def _parse_response(cls, response: httpx.Response, model_name: str) -> Dict[str, Any]:
+        """检查HTTP状态码后解析接口返回结果（网关错误、限流等非200响应不是接口的JSON格式）"""
+        if response.status_code != 200:
+            return {"success": False, "error": f"HTTP {response.status_code}: {response.text}", "content": None}
+        return cls._parse_result(_json_loads(response.content), model_name)
     
     def generate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
         """生成文本"""
-        if not self.access_token:
-            return {"success": False, "error": "未获取到访问令牌", "content": None}
-        
         try:
-            model_name = self.config.model_name or "ernie-bot-turbo"
-            url = f"https://aip.baidubce.com/rpc/2.0/ai/v1/chat/{model_name}?access_token={self.access_token}"
-            
-            payload = {
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": kwargs.get('temperature', self.config.temperature),
-                "max_output_tokens": kwargs.get('max_tokens', self.config.max_tokens)
-            }
-            
-            response = requests.post(url, json=payload)
-            result = response.json()
-            
-            if "result" in result:
-                return {
-                    "success": True,
-                    "content": result["result"],
-                    "usage": result.get("usage", {}),
-                    "model": model_name
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": result.get("error_msg", "未知错误"),
-                    "content": None
-                }
+            self._get_access_token()
+            model_name, url, payload = self._build_request(prompt, **kwargs)
+            response = self._sync_client().post(url, content=_json_dumps(payload), headers=JSON_HEADERS)
+            return self._parse_response(response, model_name)
+        except Exception as e:
+            return {"success": False, "error": str(e), "content": None}
+    
+    async def agenerate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        """异步生成文本"""
+        try:
+            await self._aget_access_token()
+            model_name, url, payload = self._build_request(prompt, **kwargs)
+            response = await get_async_client().post(url, content=_json_dumps(payload), headers=JSON_HEADERS)
+            return self._parse_response(response, model_name)
         except Exception as e:
             return {"success": False, "error": str(e), "content": None}
     
     def generate_text_stream(self, prompt: str, **kwargs):
-        """流式生成文本（模拟流式，因为百度API不支持真正的流式）"""
+        """流式生成文本（SSE接口，边接收边解析，不缓存完整响应体）"""
         try:
-            # 百度API不支持真正的流式，所以我们模拟流式输出
-            result = self.generate_text(prompt, **kwargs)
-            
-            if not result["success"]:
-                yield {"error": result.get("error", "生成失败")}
-                return
+            self._get_access_token()
+            _, url, payload = self._build_request(prompt, **kwargs)
+            payload["stream"] = True
             
-            content = result["content"]
+            parts: List[str] = []
+            usage: Dict[str, Any] = {}
+            with self._sync_client().stream("POST", url, content=_json_dumps(payload), headers=JSON_HEADERS) as response:
+                buffer = bytearray()
+                for raw in response.iter_bytes():
+                    buffer.extend(raw)
+                    for data in _drain_sse_frames(buffer):
+                        event = _json_loads(data)
+                        usage = event.get("usage") or usage
+                        chunk_content = event.get("result")
+                        if chunk_content:
+                            parts.append(chunk_content)
+                            yield {
+                                "success": True,
+                                "content": chunk_content,
+                                "finished": False
+                            }
             
-            # 模拟逐字符流式输出
-            import time
-            current_content = ""
-            for i, char in enumerate(content):
-                current_content += char
-                yield {
-                    "success": True,
-                    "content": char,
-                    "full_content": current_content,
-                    "finished": False
-                }
-                # 短暂延迟模拟流式效果
-                time.sleep(0.01)
+            # 出错时接口直接返回普通JSON而不是SSE事件
+            if not parts and buffer.strip():
+                yield {"error": _json_loads(bytes(buffer)).get("error_msg", "未知错误")}
+                return
             
             # 流式生成完成
             yield {
                 "success": True,
                 "content": "",
-                "full_content": content,
-                "finished": True,
-                "usage": result.get("usage", {})
+                "full_content": "".join(parts),
+                "usage": usage,
+                "finished": True
             }
             
         except Exception as e:
@@ -235,68 +875,96 @@ class BaiduModel(BaseAIModel):
 class DashScopeModel(BaseAIModel):
     """阿里通义千问模型"""
     
+    __slots__ = ("_base_params",)
+    
+    def __init__(self, config: AIModelConfig):
+        if dashscope is None:
+            raise ImportError("未安装dashscope，请先执行 pip install dashscope")
+        super().__init__(config)
+        # 密钥和模型名按配置固定，构造时确定一次；密钥随调用传入，避免改写模块级全局配置
+        self._base_params = {
+            "api_key": config.api_key,
+            "model": config.model_name or "qwen-turbo"
+        }
+    
+    def _call_params(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        """构建调用参数"""
+        return {
+            **self._base_params,
+            "prompt": prompt,
+            "max_tokens": kwargs.get('max_tokens', self.config.max_tokens),
+            "temperature": kwargs.get('temperature', self.config.temperature)
+        }
+    
+    def _parse_response(self, response) -> Dict[str, Any]:
+        """解析接口返回结果"""
+        if response.status_code == 200:
+            return {
+                "success": True,
+                "content": response.output.text,
+                "usage": response.usage,
+                "model": self.config.model_name
+            }
+        else:
+            return {
+                "success": False,
+                "error": response.message,
+                "content": None
+            }
+    
     def generate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
         """生成文本"""
         try:
-            import dashscope
-            dashscope.api_key = self.config.api_key
-            
-            response = dashscope.Generation.call(
-                model=self.config.model_name or "qwen-turbo",
-                prompt=prompt,
-                max_tokens=kwargs.get('max_tokens', self.config.max_tokens),
-                temperature=kwargs.get('temperature', self.config.temperature)
-            )
-            
-            if response.status_code == 200:
-                return {
-                    "success": True,
-                    "content": response.output.text,
-                    "usage": response.usage,
-                    "model": self.config.model_name
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": response.message,
-                    "content": None
-                }
+            response = dashscope.Generation.call(**self._call_params(prompt, **kwargs))
+            return self._parse_response(response)
+        except Exception as e:
+            return {"success": False, "error": str(e), "content": None}
+    
+    async def agenerate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        """异步生成文本（旧版SDK没有AioGeneration时退回线程执行）"""
+        aio_generation = getattr(dashscope, "AioGeneration", None)
+        if aio_generation is None:
+            return await super().agenerate_text(prompt, **kwargs)
+        
+        try:
+            response = await aio_generation.call(**self._call_params(prompt, **kwargs))
+            return self._parse_response(response)
         except Exception as e:
             return {"success": False, "error": str(e), "content": None}
     
     def generate_text_stream(self, prompt: str, **kwargs):
-        """流式生成文本（模拟流式，因为通义千问API可能不支持真正的流式）"""
+        """流式生成文本（增量输出模式，每个事件只包含新生成的部分）"""
         try:
-            # 通义千问API不支持真正的流式，所以我们模拟流式输出
-            result = self.generate_text(prompt, **kwargs)
-            
-            if not result["success"]:
-                yield {"error": result.get("error", "生成失败")}
-                return
-            
-            content = result["content"]
+            responses = dashscope.Generation.call(
+                **self._call_params(prompt, **kwargs),
+                stream=True,
+                incremental_output=True
+            )
             
-            # 模拟逐字符流式输出
-            import time
-            current_content = ""
-            for i, char in enumerate(content):
-                current_content += char
-                yield {
-                    "success": True,
-                    "content": char,
-                    "full_content": current_content,
-                    "finished": False
-                }
-                # 短暂延迟模拟流式效果
-                time.sleep(0.01)
+            parts: List[str] = []
+            usage = {}
+            for response in responses:
+                if response.status_code != 200:
+                    yield {"error": response.message}
+                    return
+                
+                usage = response.usage or usage
+                chunk_content = response.output.text
+                if chunk_content:
+                    parts.append(chunk_content)
+                    yield {
+                        "success": True,
+                        "content": chunk_content,
+                        "finished": False
+                    }
             
             # 流式生成完成
             yield {
                 "success": True,
                 "content": "",
-                "full_content": content,
-                "finished": True,
-                "usage": result.get("usage", {})
+                "full_content": "".join(parts),
+                "usage": usage,
+                "finished": True
             }
             
         except Exception as e:
@@ -311,50 +979,97 @@ class DashScopeModel(BaseAIModel):
 class DeepSeekModel(BaseAIModel):
     """DeepSeek模型"""
     
+    __slots__ = ("base_url", "_endpoint", "_headers", "_default_model")
+    
     def __init__(self, config: AIModelConfig):
         super().__init__(config)
         self.base_url = config.api_secret or "https://api.deepseek.com"
+        # 请求头、接口地址和默认模型按配置固定，只计算一次
+        self._endpoint = f"{self.base_url}/v1/chat/completions"
+        self._headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {config.api_key}"
+        }
+        self._default_model = config.model_name or "deepseek-chat"
+    
+    def _build_request(self, prompt: str, stream: bool = False, **kwargs) -> Tuple[Dict[str, str], Dict[str, Any]]:
+        """构建请求头和请求体"""
+        payload = {
+            "model": self._default_model,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": kwargs.get('max_tokens', self.config.max_tokens),
+            "temperature": kwargs.get('temperature', self.config.temperature),
+            "stream": stream
+        }
+        return self._headers, payload
+    
+    def _parse_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """解析接口返回结果"""
+        choice = result["choices"][0]
+        usage = result.get("usage", {})
+        
+        return {
+            "success": True,
+            "content": choice["message"]["content"],
+            "usage": {
+                "prompt_tokens": usage.get("prompt_tokens", 0),
+                "completion_tokens": usage.get("completion_tokens", 0),
+                "total_tokens": usage.get("total_tokens", 0)
+            },
+            "model": result.get("model", self.config.model_name)
+        }
+    
+    @staticmethod
+    def _delta_content(data: bytes) -> Optional[str]:
+        """从SSE数据帧中取出增量文本"""
+        try:
+            return _json_loads(data)["choices"][0]["delta"].get("content")
+        except (ValueError, KeyError, IndexError):
+            return None
         
     def generate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
         """生成文本"""
         try:
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.config.api_key}"
-            }
+            headers, payload = self._build_request(prompt, **kwargs)
             
-            payload = {
-                "model": self.config.model_name or "deepseek-chat",
-                "messages": [
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": kwargs.get('max_tokens', self.config.max_tokens),
-                "temperature": kwargs.get('temperature', self.config.temperature),
-                "stream": False
-            }
-            
-            response = requests.post(
-                f"{self.base_url}/v1/chat/completions",
+            response = _session.post(
+                self._endpoint,
                 headers=headers,
-                json=payload,
+                data=_json_dumps(payload),
                 timeout=60
             )
             
             if response.status_code == 200:
-                result = response.json()
-                choice = result["choices"][0]
-                usage = result.get("usage", {})
-                
+                return self._parse_result(_json_loads(response.content))
+            else:
+                error_msg = f"HTTP {response.status_code}: {response.text}"
                 return {
-                    "success": True,
-                    "content": choice["message"]["content"],
-                    "usage": {
-                        "prompt_tokens": usage.get("prompt_tokens", 0),
-                        "completion_tokens": usage.get("completion_tokens", 0),
-                        "total_tokens": usage.get("total_tokens", 0)
-                    },
-                    "model": result.get("model", self.config.model_name)
+                    "success": False,
+                    "error": error_msg,
+                    "content": None
                 }
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "content": None
+            }
+    
+    async def agenerate_text(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        """异步生成文本"""
+        try:
+            headers, payload = self._build_request(prompt, **kwargs)
+            
+            response = await get_async_client().post(
+                self._endpoint,
+                headers=headers,
+                content=_json_dumps(payload)
+            )
+            
+            if response.status_code == 200:
+                return self._parse_result(_json_loads(response.content))
             else:
                 error_msg = f"HTTP {response.status_code}: {response.text}"
                 return {
@@ -372,25 +1087,12 @@ class DeepSeekModel(BaseAIModel):
     def generate_text_stream(self, prompt: str, **kwargs):
         """流式生成文本"""
         try:
-            headers = {
-                "Content-Type": "application/json", 
-                "Authorization": f"Bearer {self.config.api_key}"
-            }
+            headers, payload = self._build_request(prompt, stream=True, **kwargs)
             
-            payload = {
-                "model": self.config.model_name or "deepseek-chat",
-                "messages": [
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": kwargs.get('max_tokens', self.config.max_tokens),
-                "temperature": kwargs.get('temperature', self.config.temperature),
-                "stream": True
-            }
-            
-            response = requests.post(
-                f"{self.base_url}/v1/chat/completions",
+            response = _session.post(
+                self._endpoint,
                 headers=headers,
-                json=payload,
+                data=_json_dumps(payload),
                 stream=True,
                 timeout=60
             )
@@ -399,36 +1101,80 @@ class DeepSeekModel(BaseAIModel):
                 yield {"error": f"HTTP {response.status_code}: {response.text}"}
                 return
             
-            content = ""
-            for line in response.iter_lines():
-                if line:
-                    line = line.decode('utf-8')
-                    if line.startswith('data: '):
-                        data = line[6:]  # 移除 'data: ' 前缀
-                        if data.strip() == '[DONE]':
+            parts: List[str] = []
+            buffer = bytearray()
+            done = False
+            for raw in response.iter_content(chunk_size=4096):
+                buffer.extend(raw)
+                for data in _drain_sse_frames(buffer):
+                    if data == b'[DONE]':
+                        done = True
+                        break
+                    
+                    chunk_content = self._delta_content(data)
+                    if chunk_content:
+                        parts.append(chunk_content)
+                        yield {
+                            "success": True,
+                            "content": chunk_content,
+                            "finished": False
+                        }
+                if done:
+                    break
+            
+            # 流式生成完成
+            yield {
+                "success": True,
+                "content": "",
+                "full_content": "".join(parts),
+                "finished": True
+            }
+            
+        except Exception as e:
+            yield {"error": str(e)}
+    
+    async def agenerate_text_stream(self, prompt: str, **kwargs):
+        """异步流式生成文本（与agenerate_text复用同一个共享客户端）"""
+        try:
+            headers, payload = self._build_request(prompt, stream=True, **kwargs)
+            
+            async with get_async_client().stream(
+                "POST",
+                self._endpoint,
+                headers=headers,
+                content=_json_dumps(payload)
+            ) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    yield {"error": f"HTTP {response.status_code}: {response.text}"}
+                    return
+                
+                parts: List[str] = []
+                buffer = bytearray()
+                done = False
+                async for raw in response.aiter_bytes():
+                    buffer.extend(raw)
+                    for data in _drain_sse_frames(buffer):
+                        if data == b'[DONE]':
+                            done = True
                             break
                         
-                        try:
-                            chunk = json.loads(data)
-                            if 'choices' in chunk and len(chunk['choices']) > 0:
-                                delta = chunk['choices'][0].get('delta', {})
-                                if 'content' in delta:
-                                    chunk_content = delta['content']
-                                    content += chunk_content
-                                    yield {
-                                        "success": True,
-                                        "content": chunk_content,
-                                        "full_content": content,
-                                        "finished": False
-                                    }
-                        except json.JSONDecodeError:
-                            continue
+                        chunk_content = self._delta_content(data)
+                        if chunk_content:
+                            parts.append(chunk_content)
+                            yield {
+                                "success": True,
+                                "content": chunk_content,
+                                "finished": False
+                            }
+                    if done:
+                        break
             
             # 流式生成完成
             yield {
                 "success": True,
                 "content": "",
-                "full_content": content,
+                "full_content": "".join(parts),
                 "finished": True
             }
             
@@ -441,20 +1187,72 @@ class DeepSeekModel(BaseAIModel):
         return result["success"]
 
 
+# 模型实例缓存（TTL+LRU），所有管理器实例共享：config_id（默认模型为None） -> (模型实例, 缓存时间戳)
+_model_cache: "OrderedDict[Optional[int], Tuple[BaseAIModel, float]]" = OrderedDict()
+_model_access_counts: Dict[Optional[int], int] = {}
+_model_cache_lock = threading.Lock()
+
+
+def _detached_config(config: AIModelConfig) -> AIModelConfig:
+    """复制配置的列数据到不属于任何会话的对象，请求会话提交或关闭后缓存的模型仍可读取配置"""
+    return AIModelConfig(**{column.key: getattr(config, column.key) for column in AIModelConfig.__table__.columns})
+
+
 class AIModelManager:
     """AI模型管理器"""
     
+    MODEL_CACHE_MAX = 64
+    MODEL_CACHE_TTL = 60  # 秒
+    MODEL_CACHE_MIN_HITS = 2  # 访问次数达到阈值才缓存，只访问一次的配置不占用缓存
+    
+    # 提供商到模型类的分发表，所有管理器实例共享
+    MODEL_CLASSES = {
+        "openai": OpenAIModel,
+        "baidu": BaiduModel,
+        "dashscope": DashScopeModel,
+        "deepseek": DeepSeekModel,
+    }
+    
     def __init__(self, db: Session):
         self.db = db
-        self.models = {
-            "openai": OpenAIModel,
-            "baidu": BaiduModel,
-            "dashscope": DashScopeModel,
-            "deepseek": DeepSeekModel,
-        }
+        self.models = self.MODEL_CLASSES
+        # 异步路径在线程池中用独立会话写入统计（请求会话不是线程安全的）；
+        # 内存SQLite的每个连接是独立的数据库，只能沿用当前会话
+        bind = db.get_bind()
+        in_memory = bind.dialect.name == "sqlite" and bind.url.database in (None, "", ":memory:")
+        self._session_factory = None if in_memory else sessionmaker(bind=bind, autoflush=False)
+    
+    def _cache_model(self, config_id: Optional[int], model: BaseAIModel):
+        """缓存模型实例"""
+        with _model_cache_lock:
+            hits = _model_access_counts.get(config_id, 0) + 1
+            _model_access_counts[config_id] = hits
+            if hits < self.MODEL_CACHE_MIN_HITS:
+                return
+            
+            _model_cache[config_id] = (model, time.time())
+            _model_cache.move_to_end(config_id)
+            while len(_model_cache) > self.MODEL_CACHE_MAX:
+                _model_cache.popitem(last=False)
+    
+    @staticmethod
+    def _invalidate_model_cache():
+        """清空模型实例缓存（配置变更时调用）"""
+        with _model_cache_lock:
+            _model_cache.clear()
+            _model_access_counts.clear()
     
     def get_model(self, config_id: Optional[int] = None) -> Optional[BaseAIModel]:
         """获取AI模型实例"""
+        with _model_cache_lock:
+            entry = _model_cache.get(config_id)
+            if entry is not None:
+                model, cached_at = entry
+                if time.time() - cached_at < self.MODEL_CACHE_TTL:
+                    _model_cache.move_to_end(config_id)
+                    return model
+                del _model_cache[config_id]
+        
         if config_id:
             config = self.db.query(AIModelConfig).filter(
                 AIModelConfig.id == config_id,
@@ -474,44 +1272,214 @@ class AIModelManager:
         if not model_class:
             return None
         
-        return model_class(config)
+        try:
+            model = model_class(_detached_config(config))
+        except Exception:
+            # 缺少可选依赖等原因无法构造模型时视为无可用模型
+            logger.exception("创建AI模型实例失败: %s", config.name)
+            return None
+        self._cache_model(config_id, model)
+        return model
+    
+    @staticmethod
+    def _cache_context(model: BaseAIModel, kwargs: Dict[str, Any], category: PromptCategory,
+                       platform: Optional[str] = None) -> Tuple[Optional[PromptCache], str]:
+        """选择本次调用使用的缓存和命名空间：只缓存信息类提示词，并按平台隔离；temperature为0的确定性调用使用精确响应缓存"""
+        if category != PromptCategory.INFORMATIONAL:
+            return None, ""
+        temperature = kwargs.get('temperature', model.config.temperature)
+        if temperature == 0:
+            # 不同配置可能使用不同的账号和接口地址，命名空间包含配置ID，避免配置之间共享结果
+            namespace = _json_dumps([
+                model.config.id,
+                model.config.provider,
+                model.config.model_name,
+                temperature,
+                kwargs.get('max_tokens', model.config.max_tokens),
+                platform
+            ]).decode()
+            return response_cache, namespace
+        if settings.AI_PROMPT_CACHE_ENABLED:
+            return prompt_cache, f"{model.config.id}:{platform or ''}"
+        return None, ""
     
-    def generate_content(self, prompt: str, config_id: Optional[int] = None, **kwargs) -> Dict[str, Any]:
-        """生成内容"""
+    def generate_content(self, prompt: str, config_id: Optional[int] = None,
+                         category: PromptCategory = PromptCategory.COMMAND, platform: Optional[str] = None,
+                         **kwargs) -> Dict[str, Any]:
+        """生成内容（仅信息类提示词会查询和写入缓存）"""
         model = self.get_model(config_id)
         if not model:
             return {"success": False, "error": "未找到可用的AI模型", "content": None}
         
+        # 先查缓存（按模型配置和生成参数隔离）
+        cache, namespace = self._cache_context(model, kwargs, category, platform)
+        vector = None
+        start_time = time.time()
+        if cache is not None:
+            cached, vector = cache.lookup(prompt, namespace)
+            if cached is not None:
+                result = {**cached, "cache_hit": True}
+                self._record_generation(model, prompt, result, time.time() - start_time)
+                return result
+        
         # 记录使用
+        result = _over_budget(model, prompt, kwargs) or model.generate_text(prompt, **kwargs)
+        end_time = time.time()
+        result["cache_hit"] = False
+        
+        if cache is not None and result["success"]:
+            cache.put(prompt, result, namespace, vector)
+        
+        self._record_generation(model, prompt, result, end_time - start_time)
+        
+        return result
+    
+    async def generate_content_async(self, prompt: str, config_id: Optional[int] = None,
+                                     category: PromptCategory = PromptCategory.COMMAND, platform: Optional[str] = None,
+                                     **kwargs) -> Dict[str, Any]:
+        """异步生成内容（等待模型接口时不阻塞事件循环，数据库写入放到线程池执行）"""
+        model = self.get_model(config_id)
+        if not model:
+            return {"success": False, "error": "未找到可用的AI模型", "content": None}
+        
+        cache, namespace = self._cache_context(model, kwargs, category, platform)
+        vector = None
         start_time = time.time()
-        result = model.generate_text(prompt, **kwargs)
+        if cache is not None:
+            cached, vector = await cache.alookup(prompt, namespace)
+            if cached is not None:
+                result = {**cached, "cache_hit": True}
+                await self._arecord_generation(model, prompt, result, time.time() - start_time)
+                return result
+        
+        result = await _agenerate_limited(model, prompt, **kwargs)
         end_time = time.time()
+        result["cache_hit"] = False
+        
+        if cache is not None and result["success"]:
+            cache.put(prompt, result, namespace, vector)
         
-        # 更新使用统计
-        if result["success"]:
-            model.config.usage_count += 1
-            if "usage" in result and "total_tokens" in result["usage"]:
-                model.config.total_tokens += result["usage"]["total_tokens"]
-            self.db.commit()
+        await self._arecord_generation(model, prompt, result, end_time - start_time)
+        
+        return result
+    
+    async def _run_in_record_session(self, write, *args):
+        """在线程池中用独立的短生命周期会话执行统计写入，会话作为最后一个参数传入"""
+        if self._session_factory is None:
+            write(*args, None)
+            return
+        
+        def record():
+            db = self._session_factory()
+            try:
+                write(*args, db)
+            finally:
+                db.close()
+        
+        await asyncio.get_running_loop().run_in_executor(None, record)
+    
+    async def _arecord_generation(self, model: BaseAIModel, prompt: str, result: Dict[str, Any], response_time: float):
+        """在线程池中用独立的短生命周期会话记录生成结果"""
+        await self._run_in_record_session(self._record_generation, model, prompt, result, response_time)
+    
+    async def generate_many(self, prompts: List[str], config_id: Optional[int] = None,
+                            category: PromptCategory = PromptCategory.COMMAND, platform: Optional[str] = None,
+                            **kwargs) -> List[Dict[str, Any]]:
+        """并发生成多个提示词的内容（按模型配置限制并发，遇到限流时指数退避重试）"""
+        model = self.get_model(config_id)
+        if not model:
+            return [{"success": False, "error": "未找到可用的AI模型", "content": None} for _ in prompts]
+        
+        cache, namespace = self._cache_context(model, kwargs, category, platform)
+        
+        async def timed_generate(prompt: str) -> Tuple[Dict[str, Any], float]:
+            start_time = time.time()
+            vector = None
+            if cache is not None:
+                cached, vector = await cache.alookup(prompt, namespace)
+                if cached is not None:
+                    return {**cached, "cache_hit": True}, time.time() - start_time
+            
+            result = await _agenerate_limited(model, prompt, **kwargs)
+            result["cache_hit"] = False
+            if cache is not None and result["success"]:
+                cache.put(prompt, result, namespace, vector)
+            return result, time.time() - start_time
         
-        # 记录日志
-        log = SystemLog(
-            level="INFO" if result["success"] else "ERROR",
+        outcomes = await asyncio.gather(*(timed_generate(prompt) for prompt in prompts), return_exceptions=True)
+        
+        results = []
+        for prompt, outcome in zip(prompts, outcomes):
+            if isinstance(outcome, Exception):
+                result, response_time = {"success": False, "error": str(outcome), "content": None}, 0.0
+            else:
+                result, response_time = outcome
+            await self._arecord_generation(model, prompt, result, response_time)
+            results.append(result)
+        
+        return results
+    
+    def _commit_usage(self, model: BaseAIModel, total_tokens: int, db: Optional[Session] = None):
+        """以单条原子UPDATE累加使用次数和token数，失败时回滚，不影响生成结果返回"""
+        db = db or self.db
+        try:
+            # 在数据库端自增，避免并发请求先读后写导致计数丢失
+            values = {
+                AIModelConfig.usage_count: func.coalesce(AIModelConfig.usage_count, 0) + 1,
+                AIModelConfig.total_tokens: func.coalesce(AIModelConfig.total_tokens, 0) + total_tokens
+            }
+            # 模型持有的是配置副本，只有本次新获取的访问令牌才随使用统计一起写入配置表
+            token = model.take_refreshed_token()
+            if token:
+                values[AIModelConfig.access_token], values[AIModelConfig.token_expires_at] = token
+            db.query(AIModelConfig).filter(AIModelConfig.id == model.config.id).update(
+                values, synchronize_session=False
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error("更新AI使用统计失败: %s", e)
+    
+    def _record_generation(self, model: BaseAIModel, prompt: str, result: Dict[str, Any], response_time: float,
+                           db: Optional[Session] = None):
+        """记录一次生成的使用统计和日志（db为空时使用管理器的会话）"""
+        # 更新使用统计（单次提交，缓存命中未调用接口不计入）
+        total_tokens = _total_tokens(result.get("usage"))
+        if result["success"] and not result.get("cache_hit"):
+            self._commit_usage(model, total_tokens, db)
+        
+        # 常规路径只记录轻量指标，失败时才写入详细日志（均进入缓冲区批量写入）
+        buffer_metric(model.config.id, response_time, total_tokens,
+                      result["success"], result.get("cache_hit", False))
+        if not result["success"]:
+            buffer_log(SystemLog(
+                level="ERROR",
+                module="ai_models",
+                message=f"AI内容生成 - 模型: {model.config.name}",
+                details={
+                    "config_id": model.config.id,
+                    "prompt_length": len(prompt),
+                    "success": False,
+                    "error": result.get("error"),
+                    "response_time": response_time
+                }
+            ))
+    
+    @staticmethod
+    def _buffer_stream_failure(model: BaseAIModel, prompt: str, message: str, error: str, response_time: float):
+        """记录流式生成失败的调用指标和错误日志"""
+        buffer_metric(model.config.id, response_time, success=False)
+        buffer_log(SystemLog(
+            level="ERROR",
             module="ai_models",
-            message=f"AI内容生成 - 模型: {model.config.name}",
+            message=f"{message} - 模型: {model.config.name}",
             details={
                 "config_id": model.config.id,
                 "prompt_length": len(prompt),
-                "success": result["success"],
-                "error": result.get("error"),
-                "response_time": end_time - start_time,
-                "usage": result.get("usage")
+                "error": error,
+                "response_time": response_time
             }
-        )
-        self.db.add(log)
-        self.db.commit()
-        
-        return result
+        ))
     
     def generate_content_stream(self, prompt: str, config_id: Optional[int] = None, **kwargs):
         """流式生成内容"""
@@ -520,25 +1488,18 @@ class AIModelManager:
             yield {"error": "未找到可用的AI模型"}
             return
         
+        rejected = _over_budget(model, prompt, kwargs)
+        if rejected:
+            yield {"error": rejected["error"]}
+            return
+        
         # 记录开始时间
         start_time = time.time()
         
         try:
             for chunk in model.generate_text_stream(prompt, **kwargs):
                 if "error" in chunk:
-                    # 记录错误日志
-                    log = SystemLog(
-                        level="ERROR",
-                        module="ai_models",
-                        message=f"AI流式生成失败 - 模型: {model.config.name}",
-                        details={
-                            "config_id": model.config.id,
-                            "prompt_length": len(prompt),
-                            "error": chunk["error"]
-                        }
-                    )
-                    self.db.add(log)
-                    self.db.commit()
+                    self._buffer_stream_failure(model, prompt, "AI流式生成失败", chunk["error"], time.time() - start_time)
                     yield chunk
                     return
                 
@@ -546,52 +1507,62 @@ class AIModelManager:
                 
                 # 如果是最后一个chunk，更新使用统计
                 if chunk.get("finished", False):
-                    end_time = time.time()
-                    model.config.usage_count += 1
-                    if "usage" in chunk:
-                        usage = chunk["usage"]
-                        if "total_tokens" in usage:
-                            model.config.total_tokens += usage["total_tokens"]
-                    self.db.commit()
+                    total_tokens = _total_tokens(chunk.get("usage"))
+                    self._commit_usage(model, total_tokens)
                     
-                    # 记录成功日志
-                    log = SystemLog(
-                        level="INFO",
-                        module="ai_models",
-                        message=f"AI流式生成完成 - 模型: {model.config.name}",
-                        details={
-                            "config_id": model.config.id,
-                            "prompt_length": len(prompt),
-                            "success": True,
-                            "response_time": end_time - start_time,
-                            "content_length": len(chunk.get("full_content", "")),
-                            "usage": chunk.get("usage")
-                        }
-                    )
-                    self.db.add(log)
-                    self.db.commit()
+                    # 记录调用指标
+                    buffer_metric(model.config.id, time.time() - start_time, total_tokens)
                     
         except Exception as e:
-            # 记录异常日志
-            end_time = time.time()
-            log = SystemLog(
-                level="ERROR",
-                module="ai_models",
-                message=f"AI流式生成异常 - 模型: {model.config.name}",
-                details={
-                    "config_id": model.config.id,
-                    "prompt_length": len(prompt),
-                    "error": str(e),
-                    "response_time": end_time - start_time
-                }
-            )
-            self.db.add(log)
-            self.db.commit()
+            self._buffer_stream_failure(model, prompt, "AI流式生成异常", str(e), time.time() - start_time)
+            yield {"error": str(e)}
+    
+    async def agenerate_content_stream(self, prompt: str, config_id: Optional[int] = None, **kwargs):
+        """异步流式生成内容（等待模型输出时不占用线程，使用统计在线程池中用独立会话写入）"""
+        model = self.get_model(config_id)
+        if not model:
+            yield {"error": "未找到可用的AI模型"}
+            return
+        
+        rejected = _over_budget(model, prompt, kwargs)
+        if rejected:
+            yield {"error": rejected["error"]}
+            return
+        
+        start_time = time.time()
+        
+        try:
+            async for chunk in model.agenerate_text_stream(prompt, **kwargs):
+                if "error" in chunk:
+                    self._buffer_stream_failure(model, prompt, "AI流式生成失败", chunk["error"], time.time() - start_time)
+                    yield chunk
+                    return
+                
+                yield chunk
+                
+                # 最后一个chunk到达后更新使用统计
+                if chunk.get("finished", False):
+                    total_tokens = _total_tokens(chunk.get("usage"))
+                    await self._run_in_record_session(self._commit_usage, model, total_tokens)
+                    buffer_metric(model.config.id, time.time() - start_time, total_tokens)
+                    
+        except Exception as e:
+            self._buffer_stream_failure(model, prompt, "AI流式生成异常", str(e), time.time() - start_time)
             yield {"error": str(e)}
     
     def list_configs(self) -> List[AIModelConfig]:
-        """列出所有AI模型配置"""
-        return self.db.query(AIModelConfig).filter(AIModelConfig.is_active == True).all()
+        """列出所有AI模型配置（只加载列表展示的列，不读取密钥）"""
+        return self.db.query(AIModelConfig).options(load_only(
+            AIModelConfig.id,
+            AIModelConfig.name,
+            AIModelConfig.provider,
+            AIModelConfig.model_name,
+            AIModelConfig.is_active,
+            AIModelConfig.is_default,
+            AIModelConfig.usage_count,
+            AIModelConfig.total_tokens,
+            AIModelConfig.created_at
+        )).filter(AIModelConfig.is_active == True).all()
     
     def add_config(self, name: str, provider: str, api_key: str, **kwargs) -> AIModelConfig:
         """添加AI模型配置"""
@@ -603,7 +1574,10 @@ class AIModelManager:
             model_name=kwargs.get('model_name'),
             max_tokens=kwargs.get('max_tokens', 2000),
             temperature=kwargs.get('temperature', 0.7),
-            is_default=kwargs.get('is_default', False)
+            is_default=kwargs.get('is_default', False),
+            max_concurrent=kwargs.get('max_concurrent'),
+            requests_per_minute=kwargs.get('requests_per_minute'),
+            max_tokens_budget=kwargs.get('max_tokens_budget')
         )
         
         # 如果设为默认，取消其他默认设置
@@ -615,6 +1589,7 @@ class AIModelManager:
         self.db.add(config)
         self.db.commit()
         self.db.refresh(config)
+        self._invalidate_model_cache()
         return config
     
     def update_config(self, config_id: int, **kwargs) -> Optional[AIModelConfig]:
@@ -636,54 +1611,102 @@ class AIModelManager:
         
         self.db.commit()
         self.db.refresh(config)
+        self._invalidate_model_cache()
+        _TEST_CACHE.pop(config_id, None)
         return config
     
     def test_config(self, config_id: int) -> Dict[str, Any]:
         """测试AI模型配置"""
+        cached = _TEST_CACHE.get(config_id)
+        if cached and time.time() - cached[1] < TEST_CACHE_TTL:
+            success = cached[0]
+            return {"success": success, "error": None if success else "连接测试失败"}
+        
         model = self.get_model(config_id)
         if not model:
             return {"success": False, "error": "配置不存在"}
         
         try:
             success = model.test_connection()
+            _TEST_CACHE[config_id] = (success, time.time())
             return {"success": success, "error": None if success else "连接测试失败"}
         except Exception as e:
             return {"success": False, "error": str(e)}
     
     def get_usage_stats(self, config_id: Optional[int] = None) -> Dict[str, Any]:
         """获取使用统计"""
+        # 只查询统计需要的列，合计在数据库端完成
+        rows_query = self.db.query(
+            AIModelConfig.id,
+            AIModelConfig.name,
+            AIModelConfig.provider,
+            AIModelConfig.usage_count,
+            AIModelConfig.total_tokens,
+            AIModelConfig.is_active,
+            AIModelConfig.is_default
+        )
+        totals_query = self.db.query(
+            func.coalesce(func.sum(AIModelConfig.usage_count), 0),
+            func.coalesce(func.sum(AIModelConfig.total_tokens), 0)
+        )
         if config_id:
-            configs = self.db.query(AIModelConfig).filter(AIModelConfig.id == config_id).all()
-        else:
-            configs = self.db.query(AIModelConfig).all()
-        
-        stats = []
-        total_usage = 0
-        total_tokens = 0
-        
-        for config in configs:
-            stats.append({
-                "id": config.id,
-                "name": config.name,
-                "provider": config.provider,
-                "usage_count": config.usage_count,
-                "total_tokens": config.total_tokens,
-                "is_active": config.is_active,
-                "is_default": config.is_default
-            })
-            total_usage += config.usage_count
-            total_tokens += config.total_tokens
+            rows_query = rows_query.filter(AIModelConfig.id == config_id)
+            totals_query = totals_query.filter(AIModelConfig.id == config_id)
+        
+        keys = ("id", "name", "provider", "usage_count", "total_tokens", "is_active", "is_default")
+        stats = [dict(zip(keys, row)) for row in rows_query.all()]
+        total_usage, total_tokens = totals_query.one()
         
         return {
             "configs": stats,
             "total_usage": total_usage,
-            "total_tokens": total_tokens
+            "total_tokens": total_tokens,
+            "cache_hits": response_cache.hits + prompt_cache.hits,
+            "cache_misses": response_cache.misses + prompt_cache.misses
         }
 
 
 # 内容生成相关的提示词模板
 class PromptTemplates:
-    """提示词模板"""
+    """提示词模板（模板在导入时解析一次，之后只做变量替换）"""
+    
+    # 各模板的提示词类别，未登记的模板按指令类处理
+    CATEGORIES = {
+        "comprehensive": PromptCategory.INFORMATIONAL,
+        "rewrite": PromptCategory.INFORMATIONAL,
+    }
+    
+    @classmethod
+    def category(cls, template_name: str) -> PromptCategory:
+        """获取模板的提示词类别"""
+        return cls.CATEGORIES.get(template_name, PromptCategory.COMMAND)
+    
+    @classmethod
+    def required_fields(cls, template_name: str) -> frozenset:
+        """获取模板所需的变量名"""
+        return _REQUIRED_FIELDS[template_name]
+    
+    @classmethod
+    def render(cls, template_name: str, **kwargs) -> str:
+        """渲染提示词，相同参数的渲染结果直接取缓存"""
+        missing = _REQUIRED_FIELDS[template_name].difference(kwargs)
+        if missing:
+            raise ValueError(f"提示词模板 {template_name} 缺少变量: {', '.join(sorted(missing))}")
+        try:
+            return _render(template_name, tuple(sorted(kwargs.items())))
+        except TypeError:
+            # 参数不可哈希时跳过缓存
+            return _render_parsed(_PARSED_TEMPLATES[template_name], kwargs)
+    
+    @classmethod
+    def render_comprehensive(cls, **kwargs) -> str:
+        """渲染综合创作提示词"""
+        return cls.render("comprehensive", **kwargs)
+    
+    @classmethod
+    def render_rewrite(cls, **kwargs) -> str:
+        """渲染内容改写提示词"""
+        return cls.render("rewrite", **kwargs)
     
     COMPREHENSIVE_CREATION = """
 你是一个专业的新媒体内容创作专家，请根据以下主题和要求，一次性生成完整的内容方案：
@@ -754,4 +1777,36 @@ class PromptTemplates:
 7. 针对{audience}的阅读习惯和兴趣点
 
 请提供改写后的内容：
-""" 
\ No newline at end of file
+""" 
+
+
+def _parse_template(template: str) -> List[Tuple[str, Optional[str]]]:
+    """将模板预解析为(字面文本, 变量名)列表"""
+    return [(literal, field_name) for literal, field_name, _, _ in string.Formatter().parse(template)]
+
+
+def _render_parsed(parsed: List[Tuple[str, Optional[str]]], values: Dict[str, Any]) -> str:
+    """按预解析结果拼接模板"""
+    parts = []
+    for literal, field_name in parsed:
+        parts.append(literal)
+        if field_name is not None:
+            parts.append(str(values[field_name]))
+    return "".join(parts)
+
+
+# 导入时预解析全部模板，并提取各模板的必填变量
+_PARSED_TEMPLATES = {
+    "comprehensive": _parse_template(PromptTemplates.COMPREHENSIVE_CREATION),
+    "rewrite": _parse_template(PromptTemplates.CONTENT_REWRITE),
+}
+
+_REQUIRED_FIELDS = {
+    name: frozenset(field_name for _, field_name in parsed if field_name)
+    for name, parsed in _PARSED_TEMPLATES.items()
+}
+
+
+@functools.lru_cache(maxsize=512)
+def _render(template_name: str, frozen_items: Tuple[Tuple[str, Any], ...]) -> str:
+    return _render_parsed(_PARSED_TEMPLATES[template_name], dict(frozen_items))
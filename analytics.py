@@ -2,46 +2,202 @@
 数据分析模块
 实现内容表现分析、发布效果分析、用户行为分析等功能
 """
-import pandas as pd
+import heapq
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+import pandas as pd
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, and_, or_
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy import func, desc, and_, or_, case, event
 from collections import defaultdict, Counter
 import json
 
 from models import (
     ContentDraft, PublishRecord, HotTopic, AIModelConfig, 
-    PlatformAccount, SystemLog
+    PlatformAccount, SystemLog, LlmCallMetric
+)
+
+
+# 单条发布记录的互动量（浏览+点赞+评论+分享），用于在数据库端聚合
+ENGAGEMENT_EXPR = (
+    func.coalesce(PublishRecord.view_count, 0) + func.coalesce(PublishRecord.like_count, 0) +
+    func.coalesce(PublishRecord.comment_count, 0) + func.coalesce(PublishRecord.share_count, 0)
 )
 
 
+# 热点查询返回的列，与HotspotAnalyzer中构建列式数据的列名一一对应
+TOPIC_COLUMNS = ("title", "platform", "hot_score", "category", "sentiment", "keywords", "created_at")
+
+# 关键词分隔符（连同两侧空白一起切分，等价于逐个split(",")后strip）
+_KEYWORD_SEP = re.compile(r"\s*,\s*")
+
+
+def _split_keywords(keywords_column) -> List[str]:
+    """把所有话题的逗号分隔关键词拼接后一次切分"""
+    fields = [keywords for keywords in keywords_column if keywords]
+    if not fields:
+        return []
+    return _KEYWORD_SEP.split(",".join(fields).strip())
+
+
+# 创作建议模板：按情感倾向给出切入角度，按分类追加提示
+_SENTIMENT_TEMPLATES = {
+    "positive": "可以从正面角度解读'{title}'，分享相关的成功经验或积极影响",
+    "negative": "可以分析'{title}'背后的问题，提供解决方案或预防措施",
+    "neutral": "可以客观分析'{title}'的多个方面，提供深度解读"
+}
+_CATEGORY_TIPS = {
+    "科技": "重点关注技术发展趋势和应用场景",
+    "教育": "结合学习方法和教育理念",
+    "娱乐": "注意娱乐性和话题性的平衡",
+    "健康": "提供科学可靠的健康知识",
+    "综合": "可以从多个维度进行分析"
+}
+
+
+def _score_stats(frame: pd.DataFrame, key: str) -> Dict[Any, Dict[str, Any]]:
+    """按指定列分组统计热点数量、总热度和平均热度（保持各组首次出现的顺序）"""
+    grouped = frame.groupby(key, sort=False)["hot_score"].agg(["count", "sum"])
+    return {
+        group: {
+            "count": int(count),
+            "avg_score": round(float(total) / int(count), 2),
+            "total_score": float(total)
+        }
+        for group, count, total in zip(grouped.index, grouped["count"], grouped["sum"])
+    }
+
+
+def _rank_hours(hour_posts: np.ndarray, hour_success: np.ndarray,
+                hour_engagement: np.ndarray, top: int = 5) -> List[Dict[str, Any]]:
+    """按24小时桶计算成功率、平均互动量和综合得分，返回得分最高的几个时段"""
+    active_hours = np.flatnonzero(hour_success)
+    success_rates = hour_success[active_hours] / hour_posts[active_hours] * 100
+    avg_engagements = hour_engagement[active_hours] / hour_success[active_hours]
+    scores = np.round(success_rates * 0.7 + avg_engagements * 0.3, 2)
+    # 稳定排序：得分相同时小时数小的在前
+    order = np.argsort(-scores, kind="stable")[:top]
+    return [
+        {
+            "hour": int(active_hours[i]),
+            "success_rate": round(float(success_rates[i]), 2),
+            "avg_engagement": round(float(avg_engagements[i]), 2),
+            "score": round(float(success_rates[i] * 0.7 + avg_engagements[i] * 0.3), 2)
+        }
+        for i in order
+    ]
+
+
+def _value_counts(values, limit: Optional[int] = None) -> Dict[Any, int]:
+    """统计各取值的出现次数，按次数降序排列，次数相同时按首次出现顺序（与Counter.most_common一致）"""
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    keys = list(uniques)
+    if (codes < 0).any():
+        # 空值单独作为一类
+        codes = np.where(codes < 0, len(keys), codes)
+        keys.append(None)
+    if not keys:
+        return {}
+    
+    counts = np.bincount(codes, minlength=len(keys))
+    first_seen = np.full(len(keys), len(codes))
+    np.minimum.at(first_seen, codes, np.arange(len(codes)))
+    order = np.lexsort((first_seen, -counts))[:limit]
+    return {keys[i]: int(counts[i]) for i in order}
+
+
+# 内容表现分析结果缓存，所有分析器实例（每个请求一个）共享：
+# (数据库地址, days, platform) -> (计算时间, 分析结果)
+_perf_cache: Dict[Tuple[str, int, Optional[str]], Tuple[float, Dict[str, Any]]] = {}
+_perf_cache_lock = threading.Lock()
+_perf_cache_generation = 0  # 每次清空时递增，计算期间缓存被清空的结果不写入
+
+
+def invalidate_performance_cache():
+    """清空内容表现分析缓存"""
+    global _perf_cache_generation
+    with _perf_cache_lock:
+        _perf_cache.clear()
+        _perf_cache_generation += 1
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_publish_records_changed(session, flush_context):
+    """记录本次事务是否新增、修改或删除了发布记录（本进程内的写入都经过ORM会话）"""
+    if any(isinstance(obj, PublishRecord) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["publish_records_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_publish_commit(session):
+    """发布记录的变更提交后清空缓存（提交前清空可能被并发请求用旧数据重新填充）"""
+    if session.info.pop("publish_records_changed", False):
+        invalidate_performance_cache()
+
+
+@event.listens_for(Session, "after_rollback")
+def _clear_publish_records_changed(session):
+    """回滚的变更不影响缓存"""
+    session.info.pop("publish_records_changed", None)
+
+
 class ContentAnalyzer:
     """内容分析器"""
     
+    PERFORMANCE_CACHE_TTL = 300  # 内容表现分析结果缓存时间（秒），外部进程写入的数据最多延迟这么久可见
+    
     def __init__(self, db: Session):
         self.db = db
     
     def analyze_content_performance(self, 
                                   days: int = 30,
                                   platform: Optional[str] = None) -> Dict[str, Any]:
-        """分析内容表现"""
-        # 获取指定时间范围内的发布记录
+        """分析内容表现（相同参数的结果在所有请求间缓存一段时间，发布记录变更后失效）"""
+        key = (str(self.db.get_bind().url), days, platform)
+        with _perf_cache_lock:
+            cached = _perf_cache.get(key)
+            generation = _perf_cache_generation
+        if cached and time.monotonic() - cached[0] < self.PERFORMANCE_CACHE_TTL:
+            return cached[1]
+        
+        result = self._compute_content_performance(days, platform)
+        with _perf_cache_lock:
+            if generation == _perf_cache_generation:
+                _perf_cache[key] = (time.monotonic(), result)
+        return result
+    
+    def _compute_content_performance(self, days: int, platform: Optional[str]) -> Dict[str, Any]:
+        """执行内容表现分析"""
+        # 指定时间范围内的发布记录筛选条件
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
         
-        query = self.db.query(PublishRecord).filter(
+        filters = [
             PublishRecord.created_at >= start_date,
             PublishRecord.created_at <= end_date
-        )
+        ]
         
         if platform:
-            query = query.filter(PublishRecord.platform == platform)
-        
-        records = query.all()
-        
-        if not records:
+            filters.append(PublishRecord.platform == platform)
+        
+        # 按平台和状态在数据库中聚合，只取回聚合后的少量行
+        platform_rows = self.db.query(
+            PublishRecord.platform,
+            PublishRecord.status,
+            func.count(PublishRecord.id),
+            func.coalesce(func.sum(PublishRecord.view_count), 0),
+            func.coalesce(func.sum(PublishRecord.like_count), 0),
+            func.coalesce(func.sum(PublishRecord.comment_count), 0),
+            func.coalesce(func.sum(PublishRecord.share_count), 0)
+        ).filter(*filters).group_by(PublishRecord.platform, PublishRecord.status).all()
+        
+        total_posts = sum(row[2] for row in platform_rows)
+        
+        if not total_posts:
             return {
                 "total_posts": 0,
                 "performance_summary": {
@@ -63,78 +219,93 @@ class ContentAnalyzer:
                 }
             }
         
-        # 基础统计
-        total_posts = len(records)
-        successful_posts = len([r for r in records if r.status == "success"])
-        failed_posts = len([r for r in records if r.status == "failed"])
-        
-        # 平台分析
-        platform_stats = defaultdict(lambda: {
-            "posts": 0, "success": 0, "failed": 0,
-            "total_views": 0, "total_likes": 0, "total_comments": 0, "total_shares": 0
-        })
-        
-        for record in records:
-            platform_stats[record.platform]["posts"] += 1
-            if record.status == "success":
-                platform_stats[record.platform]["success"] += 1
-                platform_stats[record.platform]["total_views"] += record.view_count or 0
-                platform_stats[record.platform]["total_likes"] += record.like_count or 0
-                platform_stats[record.platform]["total_comments"] += record.comment_count or 0
-                platform_stats[record.platform]["total_shares"] += record.share_count or 0
-            elif record.status == "failed":
-                platform_stats[record.platform]["failed"] += 1
+        # 基础统计和平台分析：把聚合行按平台编码装入矩阵
+        # 列依次为 [posts, success, failed, views, likes, comments, shares]，互动量只计成功发布
+        platforms, statuses, counts, *metrics = zip(*platform_rows)
+        codes, platform_names = pd.factorize(np.asarray(platforms, dtype=object))
+        counts = np.asarray(counts, dtype=np.int64)
+        success_mask = np.asarray(statuses, dtype=object) == "success"
+        failed_mask = np.asarray(statuses, dtype=object) == "failed"
+        
+        n_platforms = len(platform_names)
+        platform_matrix = np.zeros((n_platforms, 7), dtype=np.int64)
+        platform_matrix[:, 0] = np.bincount(codes, weights=counts, minlength=n_platforms)
+        platform_matrix[:, 1] = np.bincount(codes[success_mask], weights=counts[success_mask], minlength=n_platforms)
+        platform_matrix[:, 2] = np.bincount(codes[failed_mask], weights=counts[failed_mask], minlength=n_platforms)
+        for column, values in enumerate(metrics, start=3):
+            values = np.asarray(values, dtype=np.int64)[success_mask]
+            platform_matrix[:, column] = np.bincount(codes[success_mask], weights=values, minlength=n_platforms)
+        
+        successful_posts = int(platform_matrix[:, 1].sum())
+        failed_posts = int(platform_matrix[:, 2].sum())
+        # 总互动量一次整列求和，各平台共用
+        engagement = platform_matrix[:, 3:].sum(axis=1)
         
         # 计算平台成功率和平均互动
         platform_analysis = {}
-        for platform, stats in platform_stats.items():
-            success_rate = (stats["success"] / stats["posts"] * 100) if stats["posts"] > 0 else 0
-            avg_engagement = (
-                (stats["total_views"] + stats["total_likes"] + 
-                 stats["total_comments"] + stats["total_shares"]) / 
-                max(stats["success"], 1)
-            )
+        for platform_name, row, total_engagement in zip(
+            platform_names, platform_matrix.tolist(), engagement.tolist()
+        ):
+            posts, success, _, views, likes, comments, shares = row
+            success_rate = (success / posts * 100) if posts > 0 else 0
+            divisor = max(success, 1)
             
-            platform_analysis[platform] = {
-                "posts": stats["posts"],
+            platform_analysis[platform_name] = {
+                "posts": posts,
                 "success_rate": round(success_rate, 2),
-                "avg_views": round(stats["total_views"] / max(stats["success"], 1), 2),
-                "avg_likes": round(stats["total_likes"] / max(stats["success"], 1), 2),
-                "avg_comments": round(stats["total_comments"] / max(stats["success"], 1), 2),
-                "avg_shares": round(stats["total_shares"] / max(stats["success"], 1), 2),
-                "avg_engagement": round(avg_engagement, 2)
+                "avg_views": round(views / divisor, 2),
+                "avg_likes": round(likes / divisor, 2),
+                "avg_comments": round(comments / divisor, 2),
+                "avg_shares": round(shares / divisor, 2),
+                "avg_engagement": round(total_engagement / divisor, 2)
             }
         
-        # 时间分析（按小时统计最佳发布时间）
-        hour_stats = defaultdict(lambda: {"posts": 0, "success": 0, "total_engagement": 0})
-        
-        for record in records:
-            if record.publish_time:
-                hour = record.publish_time.hour
-                hour_stats[hour]["posts"] += 1
-                if record.status == "success":
-                    hour_stats[hour]["success"] += 1
-                    engagement = (record.view_count or 0) + (record.like_count or 0) + \
-                               (record.comment_count or 0) + (record.share_count or 0)
-                    hour_stats[hour]["total_engagement"] += engagement
+        # 时间分析（按发布小时和状态在数据库中分组统计）
+        publish_hour = func.extract("hour", PublishRecord.publish_time)
+        hour_rows = self.db.query(
+            publish_hour,
+            PublishRecord.status,
+            func.count(PublishRecord.id),
+            func.coalesce(func.sum(ENGAGEMENT_EXPR), 0)
+        ).filter(
+            *filters, PublishRecord.publish_time.isnot(None)
+        ).group_by(publish_hour, PublishRecord.status).all()
+        
+        # 按小时装入24个桶：发布数、成功数、成功发布的总互动量
+        hour_posts = np.zeros(24, dtype=np.int64)
+        hour_success = np.zeros(24, dtype=np.int64)
+        hour_engagement = np.zeros(24, dtype=np.int64)
+        if hour_rows:
+            hours, statuses, counts, engagements = zip(*hour_rows)
+            # 小时只有0-23，用int8存放；单个小时、状态分组的发布数不会超过int32上限（约21亿），
+            # 互动量总和可能更大，仍用int64，各桶的累加结果也统一为int64
+            hours = np.asarray(hours, dtype=np.int8)
+            counts = np.asarray(counts, dtype=np.int32)
+            success_mask = np.asarray(statuses, dtype=object) == "success"
+            hour_posts = np.bincount(hours, weights=counts, minlength=24).astype(np.int64)
+            hour_success = np.bincount(
+                hours[success_mask], weights=counts[success_mask], minlength=24
+            ).astype(np.int64)
+            hour_engagement = np.bincount(
+                hours[success_mask], weights=np.asarray(engagements, dtype=np.int64)[success_mask], minlength=24
+            ).astype(np.int64)
+        
+        hour_stats = {
+            int(hour): {
+                "posts": int(hour_posts[hour]),
+                "success": int(hour_success[hour]),
+                "total_engagement": int(hour_engagement[hour])
+            }
+            for hour in np.flatnonzero(hour_posts)
+        }
         
         # 找出最佳发布时间
-        best_hours = []
-        for hour, stats in hour_stats.items():
-            if stats["success"] > 0:
-                avg_engagement = stats["total_engagement"] / stats["success"]
-                success_rate = stats["success"] / stats["posts"] * 100
-                best_hours.append({
-                    "hour": hour,
-                    "success_rate": round(success_rate, 2),
-                    "avg_engagement": round(avg_engagement, 2),
-                    "score": round(success_rate * 0.7 + avg_engagement * 0.3, 2)
-                })
-        
-        best_hours.sort(key=lambda x: x["score"], reverse=True)
+        best_hours = _rank_hours(hour_posts, hour_success, hour_engagement, top=5)
         
         # 内容洞察
-        content_insights = self._analyze_content_patterns(records)
+        content_insights = self._analyze_content_patterns(
+            filters, successful_posts, failed_posts, self._top_failure_reasons(filters)
+        )
         
         return {
             "total_posts": total_posts,
@@ -145,8 +316,8 @@ class ContentAnalyzer:
             },
             "platform_analysis": platform_analysis,
             "time_analysis": {
-                "best_hours": best_hours[:5],  # 前5个最佳时间
-                "hour_distribution": dict(hour_stats)
+                "best_hours": best_hours,  # 前5个最佳时间
+                "hour_distribution": hour_stats
             },
             "content_insights": content_insights,
             "analysis_period": {
@@ -156,55 +327,62 @@ class ContentAnalyzer:
             }
         }
     
-    def _analyze_content_patterns(self, records: List[PublishRecord]) -> Dict[str, Any]:
+    def _top_failure_reasons(self, filters: List[Any], limit: int = 5) -> Dict[str, int]:
+        """按错误信息前50个字符在数据库中分组，返回出现次数最多的失败原因"""
+        reason = func.coalesce(
+            func.nullif(func.substr(PublishRecord.error_message, 1, 50), ""), "未知错误"
+        )
+        rows = self.db.query(reason, func.count(PublishRecord.id)).filter(
+            *filters, PublishRecord.status == "failed"
+        ).group_by(reason).order_by(func.count(PublishRecord.id).desc(), reason).limit(limit).all()
+        return dict(rows)
+    
+    def _analyze_content_patterns(self, filters: List[Any], successful_posts: int,
+                                  failed_posts: int, failure_reasons: Dict[str, int]) -> Dict[str, Any]:
         """分析内容模式"""
-        # 分析标题长度与表现的关系
-        title_performance = []
-        content_length_performance = []
-        
-        for record in records:
-            if record.status == "success" and record.title:
-                title_length = len(record.title)
-                content_length = len(record.content or "")
-                engagement = (record.view_count or 0) + (record.like_count or 0) + \
-                           (record.comment_count or 0) + (record.share_count or 0)
-                
-                title_performance.append({"length": title_length, "engagement": engagement})
-                content_length_performance.append({"length": content_length, "engagement": engagement})
-        
-        # 计算最佳标题长度范围
-        if title_performance:
-            df_title = pd.DataFrame(title_performance)
-            title_ranges = {
-                "short": df_title[df_title["length"] <= 20]["engagement"].mean(),
-                "medium": df_title[(df_title["length"] > 20) & (df_title["length"] <= 40)]["engagement"].mean(),
-                "long": df_title[df_title["length"] > 40]["engagement"].mean()
-            }
-            
-            # 移除NaN值
-            title_ranges = {k: v for k, v in title_ranges.items() if not pd.isna(v)}
-            best_title_range = max(title_ranges.items(), key=lambda x: x[1])[0] if title_ranges else "medium"
-        else:
-            best_title_range = "medium"
-            title_ranges = {}
-        
-        # 分析失败原因
-        failed_records = [r for r in records if r.status == "failed"]
-        failure_reasons = Counter([r.error_message[:50] if r.error_message else "未知错误" 
-                                 for r in failed_records])
+        # 分析标题长度与表现的关系：按长度区间在数据库中求平均互动量
+        title_length = func.length(PublishRecord.title)
+        length_range = case(
+            (title_length <= 20, "short"),
+            (title_length <= 40, "medium"),
+            else_="long"
+        )
+        range_rows = self.db.query(
+            length_range,
+            func.avg(ENGAGEMENT_EXPR)
+        ).filter(
+            *filters,
+            PublishRecord.status == "success",
+            PublishRecord.title.isnot(None),
+            PublishRecord.title != ""
+        ).group_by(length_range).all()
+        
+        range_means = {name: float(mean) for name, mean in range_rows if mean is not None}
+        title_ranges = {name: range_means[name] for name in ("short", "medium", "long") if name in range_means}
+        best_title_range = max(title_ranges.items(), key=lambda x: x[1])[0] if title_ranges else "medium"
         
         return {
             "best_title_length": best_title_range,
             "title_length_analysis": title_ranges,
-            "total_successful_posts": len([r for r in records if r.status == "success"]),
-            "total_failed_posts": len(failed_records),
-            "common_failure_reasons": dict(failure_reasons.most_common(5))
+            "total_successful_posts": successful_posts,
+            "total_failed_posts": failed_posts,
+            "common_failure_reasons": failure_reasons
         }
     
-    def get_content_recommendations(self, platform: Optional[str] = None) -> Dict[str, Any]:
-        """获取内容创作建议"""
+    def get_content_recommendations(self, platform: Optional[str] = None,
+                                    performance_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """获取内容创作建议（可传入已计算的最近30天内容表现分析结果）"""
         # 分析最近30天的数据
-        performance_data = self.analyze_content_performance(days=30, platform=platform)
+        if performance_data is None:
+            performance_data = self.analyze_content_performance(days=30, platform=platform)
+        
+        # 没有发布记录时直接返回，不再基于空结果的默认值生成建议
+        if not performance_data.get("total_posts"):
+            return {
+                "recommendations": [],
+                "performance_summary": performance_data["performance_summary"],
+                "analysis_date": datetime.now().isoformat()
+            }
         
         recommendations = []
         
@@ -272,8 +450,16 @@ class HotspotAnalyzer:
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
         
-        # 获取热点数据
-        topics = self.db.query(HotTopic).filter(
+        # 获取热点数据（只查询分析用到的列，返回轻量的Row而不是完整ORM对象）
+        topics = self.db.query(
+            HotTopic.title,
+            HotTopic.platform,
+            HotTopic.hot_score,
+            HotTopic.category,
+            HotTopic.sentiment,
+            HotTopic.keywords,
+            HotTopic.created_at
+        ).filter(
             HotTopic.created_at >= start_date,
             HotTopic.created_at <= end_date
         ).order_by(desc(HotTopic.hot_score)).all()
@@ -295,56 +481,35 @@ class HotspotAnalyzer:
                 }
             }
         
-        # 平台分析
-        platform_stats = defaultdict(lambda: {"count": 0, "avg_score": 0, "total_score": 0})
-        
-        for topic in topics:
-            platform_stats[topic.platform]["count"] += 1
-            platform_stats[topic.platform]["total_score"] += topic.hot_score
-        
-        for platform in platform_stats:
-            platform_stats[platform]["avg_score"] = round(
-                platform_stats[platform]["total_score"] / platform_stats[platform]["count"], 2
-            )
+        # 一次性转为列式数据，各项统计都在整列上进行，不再逐条遍历
+        frame = pd.DataFrame.from_records(topics, columns=TOPIC_COLUMNS)
         
-        # 分类分析
-        category_stats = Counter([topic.category for topic in topics])
+        # 平台分析
+        platform_stats = _score_stats(frame, "platform")
         
-        # 情感分析
-        sentiment_stats = Counter([topic.sentiment for topic in topics])
+        # 分类和情感分析（整列计数）
+        category_stats = _value_counts(frame["category"], limit=10)
+        sentiment_stats = _value_counts(frame["sentiment"])
         
         # 关键词分析
-        all_keywords = []
-        for topic in topics:
-            if topic.keywords:
-                keywords = [kw.strip() for kw in topic.keywords.split(",")]
-                all_keywords.extend(keywords)
-        
-        keyword_frequency = Counter(all_keywords)
+        keyword_frequency = _value_counts(_split_keywords(frame["keywords"]), limit=20)
         
         # 热度趋势分析（按天分组）
-        daily_trends = defaultdict(lambda: {"count": 0, "avg_score": 0, "total_score": 0})
-        
-        for topic in topics:
-            date_key = topic.created_at.strftime("%Y-%m-%d")
-            daily_trends[date_key]["count"] += 1
-            daily_trends[date_key]["total_score"] += topic.hot_score
-        
-        for date in daily_trends:
-            daily_trends[date]["avg_score"] = round(
-                daily_trends[date]["total_score"] / daily_trends[date]["count"], 2
-            )
+        # 先截断到天并编码，只对去重后的日期做格式化，避免逐条strftime
+        day_codes, day_values = pd.factorize(frame["created_at"].to_numpy().astype("datetime64[D]"))
+        frame["date"] = np.datetime_as_string(day_values, unit="D")[day_codes]
+        daily_trends = _score_stats(frame, "date")
         
         # 生成创作机会
         opportunities = self._identify_content_opportunities(topics)
         
         return {
             "total_topics": len(topics),
-            "platform_analysis": dict(platform_stats),
-            "category_distribution": dict(category_stats.most_common(10)),
-            "sentiment_analysis": dict(sentiment_stats),
-            "top_keywords": dict(keyword_frequency.most_common(20)),
-            "daily_trends": dict(daily_trends),
+            "platform_analysis": platform_stats,
+            "category_distribution": category_stats,
+            "sentiment_analysis": sentiment_stats,
+            "top_keywords": keyword_frequency,
+            "daily_trends": daily_trends,
             "content_opportunities": opportunities,
             "analysis_period": {
                 "start_date": start_date.isoformat(),
@@ -357,8 +522,8 @@ class HotspotAnalyzer:
         """识别内容创作机会"""
         opportunities = []
         
-        # 按热度排序，取前10个
-        top_topics = sorted(topics, key=lambda x: x.hot_score, reverse=True)[:10]
+        # 取热度最高的10个（部分选择，无需整体排序）
+        top_topics = heapq.nlargest(10, topics, key=lambda x: x.hot_score)
         
         for i, topic in enumerate(top_topics):
             opportunity = {
@@ -378,23 +543,11 @@ class HotspotAnalyzer:
     
     def _generate_content_suggestion(self, topic: HotTopic) -> str:
         """生成内容创作建议"""
-        suggestions = {
-            "positive": f"可以从正面角度解读'{topic.title}'，分享相关的成功经验或积极影响",
-            "negative": f"可以分析'{topic.title}'背后的问题，提供解决方案或预防措施",
-            "neutral": f"可以客观分析'{topic.title}'的多个方面，提供深度解读"
-        }
-        
-        base_suggestion = suggestions.get(topic.sentiment, "可以从多个角度分析这个话题")
+        template = _SENTIMENT_TEMPLATES.get(topic.sentiment)
+        base_suggestion = template.format(title=topic.title) if template else "可以从多个角度分析这个话题"
         
         if topic.category:
-            category_tips = {
-                "科技": "重点关注技术发展趋势和应用场景",
-                "教育": "结合学习方法和教育理念",
-                "娱乐": "注意娱乐性和话题性的平衡",
-                "健康": "提供科学可靠的健康知识",
-                "综合": "可以从多个维度进行分析"
-            }
-            base_suggestion += f"。{category_tips.get(topic.category, '')}"
+            base_suggestion += f"。{_CATEGORY_TIPS.get(topic.category, '')}"
         
         return base_suggestion
 
@@ -411,35 +564,37 @@ class AIUsageAnalyzer:
         start_date = end_date - timedelta(days=days)
         
         # 获取AI配置和使用记录
-        configs = self.db.query(AIModelConfig).all()
-        
-        # 从系统日志中获取AI使用记录
-        ai_logs = self.db.query(SystemLog).filter(
-            SystemLog.module == "ai_models",
-            SystemLog.created_at >= start_date,
-            SystemLog.created_at <= end_date
-        ).all()
+        configs = self.db.query(AIModelConfig.id, AIModelConfig.name, AIModelConfig.is_active).all()
+        
+        # 在数据库中按模型配置和日期聚合调用次数与token数（缓存命中未实际调用接口，不计入）
+        usage_date = func.date(LlmCallMetric.created_at)
+        usage_rows = self.db.query(
+            LlmCallMetric.config_id,
+            usage_date,
+            func.count(LlmCallMetric.id),
+            func.coalesce(func.sum(LlmCallMetric.total_tokens), 0)
+        ).filter(
+            LlmCallMetric.success == True,
+            LlmCallMetric.cache_hit == False,
+            LlmCallMetric.created_at >= start_date,
+            LlmCallMetric.created_at <= end_date
+        ).group_by(LlmCallMetric.config_id, usage_date).all()
+        config_names = {config.id: config.name for config in configs}
         
         # 分析使用模式
         usage_by_model = defaultdict(lambda: {"count": 0, "total_tokens": 0})
         daily_usage = defaultdict(lambda: {"count": 0, "tokens": 0})
         
-        for log in ai_logs:
-            if log.details:
-                try:
-                    details = json.loads(log.details) if isinstance(log.details, str) else log.details
-                    model_name = details.get("model", "unknown")
-                    tokens = details.get("tokens", 0)
-                    
-                    usage_by_model[model_name]["count"] += 1
-                    usage_by_model[model_name]["total_tokens"] += tokens
-                    
-                    date_key = log.created_at.strftime("%Y-%m-%d")
-                    daily_usage[date_key]["count"] += 1
-                    daily_usage[date_key]["tokens"] += tokens
-                    
-                except (json.JSONDecodeError, TypeError):
-                    continue
+        for config_id, day, count, tokens in usage_rows:
+            model_name = config_names.get(config_id, "unknown")
+            
+            usage_by_model[model_name]["count"] += count
+            usage_by_model[model_name]["total_tokens"] += tokens
+            
+            # SQLite返回字符串，PostgreSQL返回date对象，统一为YYYY-MM-DD
+            date_key = str(day)
+            daily_usage[date_key]["count"] += count
+            daily_usage[date_key]["tokens"] += tokens
         
         # 计算成本估算（简化版本）
         cost_analysis = {}
@@ -533,6 +688,20 @@ class AnalyticsManager:
         self.content_analyzer = ContentAnalyzer(db)
         self.hotspot_analyzer = HotspotAnalyzer(db)
         self.ai_analyzer = AIUsageAnalyzer(db)
+        
+        # 综合报告的三项分析各用独立会话并行执行；
+        # 内存SQLite的每个连接是独立的数据库，无法跨线程共享，只能在当前会话中顺序执行
+        bind = db.get_bind()
+        in_memory = bind.dialect.name == "sqlite" and bind.url.database in (None, "", ":memory:")
+        self._session_factory = None if in_memory else sessionmaker(bind=bind, autoflush=False)
+    
+    def _run_analysis(self, analyzer_cls, method: str, *args) -> Dict[str, Any]:
+        """在独立会话中运行单项分析（线程池中每个线程各自持有会话）"""
+        db = self._session_factory()
+        try:
+            return getattr(analyzer_cls(db), method)(*args)
+        finally:
+            db.close()
     
     def generate_comprehensive_report(self, days: int = 30) -> Dict[str, Any]:
         """生成综合分析报告"""
@@ -546,25 +715,53 @@ class AnalyticsManager:
             "recommendations": []
         }
         
+        # 内容表现、热点、AI使用三项分析互不依赖
+        sections = [
+            ("content_performance", ContentAnalyzer, "analyze_content_performance", days),
+            ("hotspot_analysis", HotspotAnalyzer, "analyze_trending_topics", min(days, 7)),
+            ("ai_usage", AIUsageAnalyzer, "analyze_ai_usage_patterns", days),
+        ]
+        errors = []
+        
+        if self._session_factory is None:
+            analyzers = {
+                ContentAnalyzer: self.content_analyzer,
+                HotspotAnalyzer: self.hotspot_analyzer,
+                AIUsageAnalyzer: self.ai_analyzer
+            }
+            for key, analyzer_cls, method, arg in sections:
+                try:
+                    report[key] = getattr(analyzers[analyzer_cls], method)(arg)
+                except Exception as e:
+                    errors.append(str(e))
+        else:
+            with ThreadPoolExecutor(max_workers=len(sections)) as executor:
+                futures = [
+                    (key, executor.submit(self._run_analysis, analyzer_cls, method, arg))
+                    for key, analyzer_cls, method, arg in sections
+                ]
+                # 单项失败不影响其他分析的结果
+                for key, future in futures:
+                    try:
+                        report[key] = future.result()
+                    except Exception as e:
+                        errors.append(str(e))
+        
         try:
-            # 内容表现分析
-            report["content_performance"] = self.content_analyzer.analyze_content_performance(days)
-            
-            # 热点分析
-            report["hotspot_analysis"] = self.hotspot_analyzer.analyze_trending_topics(min(days, 7))
-            
-            # AI使用分析
-            report["ai_usage"] = self.ai_analyzer.analyze_ai_usage_patterns(days)
-            
             # 生成摘要
             report["summary"] = self._generate_summary(report)
             
             # 获取建议
-            content_recs = self.content_analyzer.get_content_recommendations()
+            content_recs = self.content_analyzer.get_content_recommendations(
+                performance_data=report["content_performance"] if days == 30 and report["content_performance"] else None
+            )
             report["recommendations"] = content_recs.get("recommendations", [])
             
         except Exception as e:
-            report["error"] = f"生成报告时出错: {str(e)}"
+            errors.append(str(e))
+        
+        if errors:
+            report["error"] = f"生成报告时出错: {'; '.join(errors)}"
         
         return report
     
@@ -2,12 +2,26 @@
 自媒体运营工具 - Streamlit前端应用
 """
 import streamlit as st
+import atexit
+import copy
+import os
+import httpx
 import requests
-import json
-from typing import Dict, Any, Optional, List, Iterator
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+import orjson
+from urllib.parse import urlencode
+from typing import Callable, Dict, Any, Optional, List, Iterator
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 from datetime import datetime
+from functools import lru_cache
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # 配置页面
 st.set_page_config(
@@ -18,26 +32,152 @@ st.set_page_config(
 )
 
 # API基础URL
-API_BASE_URL = "http://localhost:8000"
+API_BASE_URL = os.getenv("MEDIA_TOOLS_API_URL", "http://localhost:8000")
+# 前后端部署在同一台机器时，设置 MEDIA_TOOLS_INPROCESS=1 可在前端进程内直接调用FastAPI应用，
+# 跳过本机回环网络；流式接口仍通过HTTP访问后端服务
+API_INPROCESS = os.getenv("MEDIA_TOOLS_INPROCESS") == "1"
+# 后端部署在支持HTTP/2的HTTPS反向代理之后时，设置 MEDIA_TOOLS_HTTP2=1 让并发请求在同一连接上多路复用
+# （uvicorn本身只支持HTTP/1.1，直连时该选项不起作用）
+API_HTTP2 = os.getenv("MEDIA_TOOLS_HTTP2") == "1"
+# 列表接口可返回Arrow IPC流，直接解码为DataFrame
+ARROW_STREAM_TYPE = "application/vnd.apache.arrow.stream"
+# 拼接请求URL用的前缀（去掉末尾斜杠，只计算一次）
+_API_BASE = API_BASE_URL.rstrip("/")
+_HTTP_METHODS = frozenset(("GET", "POST", "PUT", "DELETE"))
+
+
+class Endpoints:
+    """后端接口路径"""
+    HEALTH = "/health"
+    AI_CONFIGS = "/api/ai/configs"
+    AI_STATS = "/api/ai/stats"
+    CONTENT_COMPREHENSIVE = "/api/content/comprehensive"
+    CONTENT_COMPREHENSIVE_STREAM = "/api/content/comprehensive/stream"
+    CONTENT_REWRITE = "/api/content/rewrite"
+    CONTENT_REWRITE_STREAM = "/api/content/rewrite/stream"
+    DRAFTS = "/api/drafts"
+    DRAFT_CATEGORIES = "/api/drafts/categories"
+    PUBLISH_PLATFORMS = "/api/publish/platforms"
+    PUBLISH_ACCOUNTS = "/api/publish/accounts"
+    PUBLISH_BATCH = "/api/publish/batch"
+    PUBLISH_RECORDS = "/api/publish/records"
+    PUBLISH_STATS = "/api/publish/stats"
+    HOTSPOT_PLATFORMS = "/api/hotspot/platforms"
+    HOTSPOT_TOPICS = "/api/hotspot/topics"
+    HOTSPOT_KEYWORDS = "/api/hotspot/keywords"
+    HOTSPOT_STATS = "/api/hotspot/stats"
+    HOTSPOT_CRAWL = "/api/hotspot/crawl"
+    HOTSPOT_CLEANUP = "/api/hotspot/cleanup"
+    ANALYTICS_CONTENT = "/api/analytics/content"
+    ANALYTICS_HOTSPOT = "/api/analytics/hotspot"
+    ANALYTICS_REPORT = "/api/analytics/report"
+    ANALYTICS_RECOMMENDATIONS = "/api/analytics/recommendations"
+
+
+class InProcessAdapter(HTTPAdapter):
+    """把请求直接交给同进程内的FastAPI应用处理，响应转换为requests的Response"""
+    
+    def __init__(self, client, **kwargs):
+        super().__init__(**kwargs)
+        self._client = client
+    
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if stream:
+            # 进程内调用会等待响应全部生成，流式请求仍走HTTP
+            return super().send(request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+        
+        asgi_response = self._client.request(
+            request.method, request.url, content=request.body, headers=dict(request.headers)
+        )
+        return _to_requests_response(asgi_response, request)
+
+
+_HOP_BY_HOP_HEADERS = frozenset(("connection", "keep-alive", "transfer-encoding", "upgrade"))
+
+
+class Http2Adapter(HTTPAdapter):
+    """通过httpx的HTTP/2连接发送请求，响应转换为requests的Response"""
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._client = httpx.Client(http2=True, limits=httpx.Limits(max_keepalive_connections=10))
+    
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if stream:
+            # 流式响应仍走requests自身的连接
+            return super().send(request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+        
+        # requests的超时为 (连接超时, 读取超时) 或单个数值
+        if isinstance(timeout, tuple):
+            http_timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        else:
+            http_timeout = httpx.Timeout(timeout)
+        # HTTP/2不允许连接级请求头（Connection等）
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in _HOP_BY_HOP_HEADERS}
+        try:
+            http_response = self._client.request(
+                request.method, request.url, content=request.body, headers=headers, timeout=http_timeout
+            )
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(e, request=request)
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(e, request=request)
+        return _to_requests_response(http_response, request)
+    
+    def close(self):
+        super().close()
+        self._client.close()
+
+
+def _to_requests_response(http_response: httpx.Response, request) -> requests.Response:
+    """把httpx的响应转换为requests的Response"""
+    response = requests.Response()
+    response.status_code = http_response.status_code
+    response.reason = http_response.reason_phrase
+    response.headers = CaseInsensitiveDict(http_response.headers)
+    response._content = http_response.content
+    response.encoding = http_response.encoding
+    response.url = request.url
+    response.request = request
+    return response
+
 
 # 工具函数
-def call_api(endpoint: str, method: str = "GET", data: Dict = None) -> Dict[str, Any]:
-    """调用API接口"""
-    url = f"{API_BASE_URL}{endpoint}"
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """获取全局HTTP会话（跨rerun复用，保持长连接和连接池）"""
+    session = requests.Session()
+    session.headers["Connection"] = "keep-alive"
+    # 只对幂等请求（GET/PUT/DELETE等）在连接失败或网关错误时重试；POST生成类请求不重复发送，读取超时也不重试
+    retry = Retry(total=3, read=False, backoff_factor=0.2, status_forcelist=[502, 503, 504], raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if API_HTTP2:
+        session.mount(API_BASE_URL, Http2Adapter())
+    
+    if API_INPROCESS:
+        from fastapi.testclient import TestClient
+        from main import app as backend_app
+        
+        # 进入上下文以执行应用的启动流程（初始化数据库、启动日志写入任务），进程退出时关闭
+        client = TestClient(backend_app, raise_server_exceptions=False)
+        client.__enter__()
+        atexit.register(client.__exit__, None, None, None)
+        # 按最长前缀匹配，发往API_BASE_URL的请求交给进程内应用处理
+        session.mount(API_BASE_URL, InProcessAdapter(client, max_retries=retry))
+    return session
+
+
+def _request_api(endpoint: str, method: str = "GET", data: Dict = None, accept: str = None) -> Dict[str, Any]:
+    """发送API请求（accept指定期望的响应格式）"""
+    url = _API_BASE + endpoint
     
     try:
-        # 添加超时设置
-        timeout = 30
+        # 添加超时设置（连接超时, 读取超时）
+        timeout = (3, 30)
         
-        if method == "GET":
-            response = requests.get(url, timeout=timeout)
-        elif method == "POST":
-            response = requests.post(url, json=data, timeout=timeout)
-        elif method == "PUT":
-            response = requests.put(url, json=data, timeout=timeout)
-        elif method == "DELETE":
-            response = requests.delete(url, timeout=timeout)
-        else:
+        if method not in _HTTP_METHODS:
             return {
                 "success": False,
                 "error": f"不支持的HTTP方法: {method}",
@@ -45,12 +185,20 @@ def call_api(endpoint: str, method: str = "GET", data: Dict = None) -> Dict[str,
                 "status_code": 400
             }
         
+        # GET/DELETE不带请求体；请求体用orjson预先序列化
+        headers = {"Accept": accept} if accept else {}
+        body = None
+        if method in ("POST", "PUT") and data is not None:
+            body = orjson.dumps(data)
+            headers["Content-Type"] = "application/json"
+        response = get_http_session().request(method, url, data=body, headers=headers, timeout=timeout)
+        
         # 检查响应状态
         if response.status_code >= 400:
             try:
-                error_data = response.json()
+                error_data = orjson.loads(response.content)
                 error_message = error_data.get('detail', error_data.get('message', f'HTTP {response.status_code}'))
-            except:
+            except (orjson.JSONDecodeError, AttributeError):
                 error_message = f'HTTP {response.status_code} - {response.reason}'
             
             return {
@@ -60,10 +208,13 @@ def call_api(endpoint: str, method: str = "GET", data: Dict = None) -> Dict[str,
                 "status_code": response.status_code
             }
         
-        # 解析响应数据
+        # 解析响应数据（Arrow格式直接解码为DataFrame）
         try:
-            response_data = response.json() if response.content else {}
-        except json.JSONDecodeError:
+            if response.headers.get("content-type", "").startswith(ARROW_STREAM_TYPE):
+                response_data = pa.ipc.open_stream(response.content).read_pandas()
+            else:
+                response_data = orjson.loads(response.content) if response.content else {}
+        except orjson.JSONDecodeError:
             response_data = {"raw_response": response.text}
         
         return {
@@ -95,19 +246,162 @@ def call_api(endpoint: str, method: str = "GET", data: Dict = None) -> Dict[str,
         }
 
 
+# 草稿和发布记录状态对应的图标
+DRAFT_STATUS_ICONS = {"draft": "🟡", "published": "🟢", "deleted": "🔴"}
+PUBLISH_STATUS_ICONS = {"success": "🟢", "failed": "🔴", "scheduled": "🟡"}
+
+# 发布页草稿预览显示的正文字数（由后端截取，列表不传完整正文）
+DRAFT_PREVIEW_CHARS = 200
+
+# 读多写少的GET接口走缓存：Streamlit每次交互都会重跑脚本，缓存可避免重复请求
+# 草稿、模型配置和各类统计会变化，短期缓存；平台列表基本不变，长期缓存
+SHORT_CACHED_ENDPOINTS = (
+    Endpoints.AI_CONFIGS, Endpoints.DRAFTS, Endpoints.DRAFT_CATEGORIES,
+    Endpoints.PUBLISH_RECORDS, Endpoints.PUBLISH_STATS, Endpoints.AI_STATS
+)
+STATIC_CACHED_ENDPOINTS = (Endpoints.PUBLISH_PLATFORMS, Endpoints.HOTSPOT_PLATFORMS)
+# 这些路径下的写操作成功后清空短期缓存
+CACHE_INVALIDATING_PREFIXES = (Endpoints.AI_CONFIGS, Endpoints.DRAFTS)
+
+
+class _UncachedResult(Exception):
+    """请求失败时抛出，使失败结果不被写入缓存"""
+    
+    def __init__(self, result: Dict[str, Any]):
+        super().__init__(result.get("error"))
+        self.result = result
+
+
+def _fetch_for_cache(endpoint: str, accept: str = None) -> Dict[str, Any]:
+    """执行GET请求，失败时抛出异常而不是返回结果"""
+    result = _request_api(endpoint, accept=accept)
+    if not result["success"]:
+        raise _UncachedResult(result)
+    return result
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _cached_get(endpoint: str, accept: str = None) -> Dict[str, Any]:
+    """短期缓存的GET请求"""
+    return _fetch_for_cache(endpoint, accept)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_get_static(endpoint: str, accept: str = None) -> Dict[str, Any]:
+    """长期缓存的GET请求"""
+    return _fetch_for_cache(endpoint, accept)
+
+
+@st.cache_resource
+def _inflight_requests():
+    """进行中的GET请求表（跨rerun和会话共享）"""
+    return threading.Lock(), {}
+
+
+def _request_api_deduped(endpoint: str, accept: str = None) -> Dict[str, Any]:
+    """合并相同的并发GET请求：同一接口已有请求在进行时等待其结果，不再重复发送"""
+    key = (endpoint, accept)
+    lock, inflight = _inflight_requests()
+    with lock:
+        future = inflight.get(key)
+        is_owner = future is None
+        if is_owner:
+            future = inflight[key] = Future()
+    
+    if not is_owner:
+        # 复制一份，避免多个调用方修改同一个结果
+        return copy.deepcopy(future.result())
+    
+    try:
+        result = _request_api(endpoint, accept=accept)
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with lock:
+            inflight.pop(key, None)
+
+
+def api_caller(endpoint: str, method: str = "GET") -> Callable[..., Dict[str, Any]]:
+    """为固定接口生成调用函数，走缓存、合并请求还是清空缓存在生成时判断一次
+    
+    返回的函数签名为 (data=None, accept=None)，结果格式与call_api相同
+    """
+    # 按路径（不含查询参数）判断是否走缓存，查询参数不同的请求分别缓存
+    path = endpoint.split("?", 1)[0]
+    if method == "GET" and path in SHORT_CACHED_ENDPOINTS + STATIC_CACHED_ENDPOINTS:
+        getter = _cached_get if path in SHORT_CACHED_ENDPOINTS else _cached_get_static
+        
+        def call_cached(data: Dict = None, accept: str = None) -> Dict[str, Any]:
+            try:
+                return getter(endpoint, accept)
+            except _UncachedResult as e:
+                return e.result
+        return call_cached
+    
+    if method == "GET":
+        # 缓存层对同一键的并发未命中已加锁合并，其余GET请求在这里合并
+        return lambda data=None, accept=None: _request_api_deduped(endpoint, accept)
+    
+    if not endpoint.startswith(CACHE_INVALIDATING_PREFIXES):
+        return lambda data=None, accept=None: _request_api(endpoint, method, data, accept)
+    
+    def call_invalidating(data: Dict = None, accept: str = None) -> Dict[str, Any]:
+        result = _request_api(endpoint, method, data, accept)
+        if result["success"]:
+            _cached_get.clear()
+        return result
+    return call_invalidating
+
+
+def call_api(endpoint: str, method: str = "GET", data: Dict = None, accept: str = None) -> Dict[str, Any]:
+    """调用API接口（列表类GET请求走缓存，写操作成功后清空相关缓存）
+    
+    accept为ARROW_STREAM_TYPE时，支持该格式的列表接口返回DataFrame，否则仍为JSON解析结果
+    """
+    return api_caller(endpoint, method)(data, accept)
+
+
+# 页面中反复调用的固定接口
+get_ai_configs = api_caller(Endpoints.AI_CONFIGS)
+create_draft = api_caller(Endpoints.DRAFTS, "POST")
+publish_batch = api_caller(Endpoints.PUBLISH_BATCH, "POST")
+
+
+def call_api_many(specs: List[tuple]) -> List[Dict[str, Any]]:
+    """并发调用多个互不依赖的API接口，按传入顺序返回结果
+    
+    specs中每项为 (endpoint,)、(endpoint, method) 或 (endpoint, method, data)
+    """
+    if len(specs) <= 1:
+        return [call_api(*spec) for spec in specs]
+    
+    # 工作线程继承当前脚本的运行上下文，避免Streamlit缓存等功能在线程中报警告
+    ctx = get_script_run_ctx()
+    with ThreadPoolExecutor(
+        max_workers=min(len(specs), 8),
+        initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx)
+    ) as executor:
+        return list(executor.map(lambda spec: call_api(*spec), specs))
+
+
 def call_stream_api(endpoint: str, data: Dict = None) -> Iterator[Dict[str, Any]]:
     """调用流式API接口"""
-    url = f"{API_BASE_URL}{endpoint}"
+    url = _API_BASE + endpoint
     
     try:
         timeout = 60
-        response = requests.post(url, json=data, stream=True, timeout=timeout)
+        response = get_http_session().post(
+            url, data=orjson.dumps(data), headers={"Content-Type": "application/json"}, stream=True, timeout=timeout
+        )
         
         if response.status_code != 200:
             try:
-                error_data = response.json()
+                error_data = orjson.loads(response.content)
                 error_message = error_data.get('detail', f'HTTP {response.status_code}')
-            except:
+            except (orjson.JSONDecodeError, AttributeError):
                 error_message = f'HTTP {response.status_code} - {response.reason}'
             
             yield {
@@ -120,16 +414,16 @@ def call_stream_api(endpoint: str, data: Dict = None) -> Iterator[Dict[str, Any]
         # 处理流式响应
         for line in response.iter_lines():
             if line:
-                line_str = line.decode('utf-8')
-                if line_str.startswith('data: '):
-                    data_str = line_str[6:]  # 移除 'data: ' 前缀
-                    if data_str.strip() == '[DONE]':
+                # 直接解析字节，不先解码为字符串
+                if line.startswith(b'data: '):
+                    data_bytes = line[6:]  # 移除 'data: ' 前缀
+                    if data_bytes.strip() == b'[DONE]':
                         break
                     
                     try:
-                        chunk = json.loads(data_str)
+                        chunk = orjson.loads(data_bytes)
                         yield chunk
-                    except json.JSONDecodeError:
+                    except orjson.JSONDecodeError:
                         continue
     
     except requests.exceptions.Timeout:
@@ -152,15 +446,58 @@ def call_stream_api(endpoint: str, data: Dict = None) -> Iterator[Dict[str, Any]
         }
 
 
+@st.cache_resource
+def _datetime_formatter():
+    """创建带缓存的日期格式化函数（每次rerun都会重新执行脚本，放在cache_resource中使缓存跨rerun保留）"""
+    @lru_cache(maxsize=4096)
+    def _format(dt_str: str) -> str:
+        try:
+            dt = datetime.fromisoformat(dt_str.replace('Z', '+00:00'))
+            return dt.strftime("%Y-%m-%d %H:%M")
+        except:
+            return dt_str
+    return _format
+
+
 def format_datetime(dt_str: str) -> str:
-    """格式化日期时间"""
+    """格式化日期时间（相同的时间字符串只解析一次）"""
     try:
-        dt = datetime.fromisoformat(dt_str.replace('Z', '+00:00'))
-        return dt.strftime("%Y-%m-%d %H:%M")
-    except:
+        return _datetime_formatter()(dt_str)
+    except TypeError:
+        # 不可哈希的值不走缓存
         return dt_str
 
 
+def format_datetime_column(values: pd.Series) -> pd.Series:
+    """按列格式化日期时间（format_datetime的向量化版本，无法解析的值原样保留，空值为空字符串）"""
+    parsed = pd.to_datetime(values, errors="coerce", format="ISO8601", utc=True)
+    return parsed.dt.strftime("%Y-%m-%d %H:%M").fillna(values.astype(object)).fillna("")
+
+
+def status_with_icon(values: pd.Series, icons: Dict[str, str]) -> pd.Series:
+    """状态列前加上对应图标，未知状态用⚪"""
+    values = values.astype(object)
+    return values.map(icons).fillna("⚪") + " " + values.fillna("").astype(str)
+
+
+def text_or_default(values: pd.Series, default: str) -> pd.Series:
+    """空值和空字符串替换为默认文本"""
+    values = values.astype(object)
+    return values.where(values.notna() & (values != ""), default)
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_configs_frame(configs: List[Dict[str, Any]]) -> pd.DataFrame:
+    """AI配置使用情况表（按配置内容缓存，配置未变化时rerun直接复用）"""
+    df = pd.DataFrame(
+        configs, columns=["name", "provider", "usage_count", "total_tokens", "is_active", "is_default"]
+    )
+    df["is_active"] = np.where(df["is_active"].fillna(False).astype(bool), "✅ 活跃", "❌ 停用")
+    df["is_default"] = np.where(df["is_default"].fillna(False).astype(bool), "⭐ 是", "")
+    df.columns = ["名称", "提供商", "使用次数", "Token消耗", "状态", "默认"]
+    return df
+
+
 # 初始化session state
 def init_session_state():
     """初始化session state"""
@@ -322,13 +659,11 @@ if page == "🏠 首页":
     # 系统状态检查
     st.subheader("📈 系统状态")
     
-    # 检查API连接
-    health_result = call_api("/health")
+    # 检查API连接，同时获取统计信息
+    health_result, stats_result = call_api_many([(Endpoints.HEALTH,), (Endpoints.AI_STATS,)])
     if health_result["success"]:
         st.success("✅ API服务正常运行")
         
-        # 获取统计信息
-        stats_result = call_api("/api/ai/stats")
         if stats_result["success"]:
             stats = stats_result["data"]
             
@@ -350,7 +685,7 @@ elif page == "🤖 AI模型管理":
     st.title("🤖 AI模型管理")
     
     # 获取模型配置列表
-    configs_result = call_api("/api/ai/configs")
+    configs_result = get_ai_configs()
     
     if not configs_result["success"]:
         st.error(f"获取模型配置失败: {configs_result.get('error', '未知错误')}")
@@ -391,7 +726,7 @@ elif page == "🤖 AI模型管理":
                     "is_default": is_default
                 }
                 
-                result = call_api("/api/ai/configs", "POST", config_data)
+                result = call_api(Endpoints.AI_CONFIGS, "POST", config_data)
                 if result["success"]:
                     st.success("配置添加成功！")
                     st.rerun()
@@ -425,7 +760,7 @@ elif page == "🤖 AI模型管理":
                     test_button_key = f"test_{config['id']}"
                     if st.button(f"🔗 测试", key=test_button_key):
                         with st.spinner("测试连接中..."):
-                            test_result = call_api(f"/api/ai/configs/{config['id']}/test", "POST")
+                            test_result = call_api(f"{Endpoints.AI_CONFIGS}/{config['id']}/test", "POST")
                             if test_result["success"]:
                                 if test_result["data"].get("status") == "success":
                                     st.success("✅ 连接正常！")
@@ -449,7 +784,7 @@ elif page == "✍️ 内容创作":
     st.title("✍️ 智能内容创作")
     
     # 获取可用的AI模型
-    configs_result = call_api("/api/ai/configs")
+    configs_result = get_ai_configs()
     if configs_result["success"]:
         configs = configs_result["data"]
         active_configs = [c for c in configs if c["is_active"]]
@@ -520,7 +855,7 @@ elif page == "✍️ 内容创作":
                         
                         try:
                             full_content = ""
-                            for chunk in call_stream_api("/api/content/comprehensive/stream", data):
+                            for chunk in call_stream_api(Endpoints.CONTENT_COMPREHENSIVE_STREAM, data):
                                 if "error" in chunk:
                                     st.error(f"❌ 生成失败: {chunk['error']}")
                                     break
@@ -543,7 +878,7 @@ elif page == "✍️ 内容创作":
                     else:
                         # 普通生成
                         with st.spinner("AI正在进行综合创作..."):
-                            result = call_api("/api/content/comprehensive", "POST", data)
+                            result = call_api(Endpoints.CONTENT_COMPREHENSIVE, "POST", data)
                             
                             if result["success"]:
                                 st.success("✅ 综合创作成功！")
@@ -586,7 +921,7 @@ elif page == "✍️ 内容创作":
                 with col2:
                     if st.button("💾 保存为草稿", key=save_draft_key):
                         with st.spinner("正在保存草稿..."):
-                            draft_result = call_api("/api/drafts", "POST", draft_data)
+                            draft_result = create_draft(draft_data)
                             if draft_result["success"]:
                                 st.success("✅ 已保存为草稿！")
                                 st.info(f"草稿ID: {draft_result['data'].get('id', '未知')}")
@@ -657,7 +992,7 @@ elif page == "✍️ 内容创作":
                             
                             try:
                                 full_content = ""
-                                for chunk in call_stream_api("/api/content/rewrite/stream", data):
+                                for chunk in call_stream_api(Endpoints.CONTENT_REWRITE_STREAM, data):
                                     if "error" in chunk:
                                         st.error(f"❌ 改写失败: {chunk['error']}")
                                         break
@@ -680,7 +1015,7 @@ elif page == "✍️ 内容创作":
                     else:
                         # 普通生成
                         with st.spinner("AI正在改写内容..."):
-                            result = call_api("/api/content/rewrite", "POST", data)
+                            result = call_api(Endpoints.CONTENT_REWRITE, "POST", data)
                             
                             if result["success"]:
                                 st.success("✅ 内容改写成功！")
@@ -730,7 +1065,7 @@ elif page == "✍️ 内容创作":
                 with col2:
                     if st.button("💾 保存为草稿", key=save_rewrite_key):
                         with st.spinner("正在保存草稿..."):
-                            draft_result = call_api("/api/drafts", "POST", draft_data)
+                            draft_result = create_draft(draft_data)
                             if draft_result["success"]:
                                 st.success("✅ 已保存为草稿！")
                                 st.info(f"草稿ID: {draft_result['data'].get('id', '未知')}")
@@ -752,19 +1087,17 @@ elif page == "✍️ 内容创作":
 elif page == "📝 草稿管理":
     st.title("📝 草稿管理")
     
-    # 获取草稿列表
-    drafts_result = call_api("/api/drafts")
-    
-    if not drafts_result["success"]:
-        st.error("无法获取草稿列表")
-        st.stop()
+    # 草稿列表有短期缓存，可手动刷新获取其他地方的修改
+    if st.button("🔄 刷新列表", key="refresh_drafts_btn"):
+        _cached_get.clear()
     
-    drafts = drafts_result["data"]
+    # 筛选选项（分类列表由后端去重给出）
+    categories_result = call_api(Endpoints.DRAFT_CATEGORIES)
+    categories = categories_result["data"] if categories_result["success"] else []
     
-    # 筛选选项
     col1, col2, col3 = st.columns(3)
     with col1:
-        category_filter = st.selectbox("分类筛选", ["全部"] + list(set([d.get("category", "未分类") for d in drafts if d.get("category")])))
+        category_filter = st.selectbox("分类筛选", ["全部"] + categories)
     with col2:
         status_filter = st.selectbox("状态筛选", ["全部", "draft", "published", "deleted"])
     with col3:
@@ -799,7 +1132,7 @@ elif page == "📝 草稿管理":
                                 "platform_type": platform_type
                             }
                             
-                            result = call_api("/api/drafts", "POST", draft_data)
+                            result = create_draft(draft_data)
                             if result["success"]:
                                 st.success("草稿保存成功！")
                                 st.session_state.show_new_draft = False
@@ -812,47 +1145,59 @@ elif page == "📝 草稿管理":
                         st.session_state.show_new_draft = False
                         st.rerun()
     
+    # 获取草稿列表（筛选在后端完成）
+    draft_params = {}
+    if category_filter != "全部":
+        draft_params["category"] = category_filter
+    if status_filter != "全部":
+        draft_params["status"] = status_filter
+    drafts_endpoint = f"{Endpoints.DRAFTS}?{urlencode(draft_params)}" if draft_params else Endpoints.DRAFTS
+    drafts_result = call_api(drafts_endpoint, accept=ARROW_STREAM_TYPE)
+    
+    if not drafts_result["success"]:
+        st.error("无法获取草稿列表")
+        st.stop()
+    
+    # 后端未安装pyarrow时返回JSON列表，统一转为DataFrame按列处理
+    drafts_df = pd.DataFrame(drafts_result["data"])
+    
     # 显示草稿列表
-    if not drafts:
+    if drafts_df.empty:
         st.info("暂无草稿")
     else:
-        # 应用筛选
-        filtered_drafts = drafts
-        if category_filter != "全部":
-            filtered_drafts = [d for d in filtered_drafts if d.get("category") == category_filter]
-        if status_filter != "全部":
-            filtered_drafts = [d for d in filtered_drafts if d.get("status") == status_filter]
+        st.subheader(f"📋 草稿列表 ({len(drafts_df)}篇)")
         
-        st.subheader(f"📋 草稿列表 ({len(filtered_drafts)}篇)")
+        # 整个列表作为一张表格渲染，不再为每篇草稿创建一组列和按钮
+        st.dataframe(
+            pd.DataFrame({
+                "标题": drafts_df["title"],
+                "分类": text_or_default(drafts_df["category"], "未分类"),
+                "平台": text_or_default(drafts_df["platform_type"], "通用"),
+                "状态": status_with_icon(drafts_df["status"], DRAFT_STATUS_ICONS),
+                "字数": drafts_df["word_count"],
+                "来源": np.where(drafts_df["ai_generated"].fillna(False).astype(bool), "🤖 AI生成", "👤 手动创建"),
+                "创建时间": format_datetime_column(drafts_df["created_at"]),
+            }),
+            use_container_width=True,
+            hide_index=True
+        )
         
-        for draft in filtered_drafts:
-            with st.container():
-                col1, col2, col3, col4 = st.columns([4, 2, 2, 2])
-                
-                with col1:
-                    st.write(f"**{draft['title']}**")
-                    st.write(f"🏷️ {draft.get('category', '未分类')} | 📱 {draft.get('platform_type', '通用')}")
-                
-                with col2:
-                    status_color = {"draft": "🟡", "published": "🟢", "deleted": "🔴"}
-                    st.write(f"{status_color.get(draft['status'], '⚪')} {draft['status']}")
-                    st.write(f"📝 {draft['word_count']}字")
-                
-                with col3:
-                    ai_icon = "🤖" if draft.get("ai_generated") else "👤"
-                    st.write(f"{ai_icon} {'AI生成' if draft.get('ai_generated') else '手动创建'}")
-                    st.write(f"⏰ {format_datetime(draft['created_at'])}")
-                
-                with col4:
-                    if st.button("👁️ 查看", key=f"view_{draft['id']}"):
-                        st.session_state.view_draft_id = draft['id']
-                
-                st.divider()
+        # 选择要查看的草稿（单个选择框代替每行一个查看按钮）
+        view_options = {
+            f"{title} (ID: {draft_id})": int(draft_id)
+            for title, draft_id in zip(drafts_df["title"], drafts_df["id"])
+        }
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            view_draft_name = st.selectbox("选择草稿", list(view_options.keys()), key="view_draft_select")
+        with col2:
+            if st.button("👁️ 查看", key="view_draft_btn"):
+                st.session_state.view_draft_id = view_options[view_draft_name]
         
         # 查看草稿详情
         if st.session_state.get("view_draft_id"):
             draft_id = st.session_state.view_draft_id
-            draft_result = call_api(f"/api/drafts/{draft_id}")
+            draft_result = call_api(f"{Endpoints.DRAFTS}/{draft_id}")
             
             if draft_result["success"]:
                 draft = draft_result["data"]
@@ -879,7 +1224,7 @@ elif page == "📝 草稿管理":
                             st.rerun()
                     with col2:
                         if st.button("🗑️ 删除草稿", key="delete_draft_btn"):
-                            delete_result = call_api(f"/api/drafts/{draft_id}", "DELETE")
+                            delete_result = call_api(f"{Endpoints.DRAFTS}/{draft_id}", "DELETE")
                             if delete_result["success"]:
                                 st.success("草稿已删除")
                                 del st.session_state.view_draft_id
@@ -892,15 +1237,22 @@ elif page == "📝 草稿管理":
 elif page == "🚀 发布管理":
     st.title("🚀 发布管理")
     
-    # 标签页
-    tab1, tab2, tab3, tab4 = st.tabs(["📤 内容发布", "🔧 平台账号", "📋 发布记录", "📊 发布统计"])
+    # 功能选择：st.tabs每次rerun都会执行所有标签页，这里只运行当前选中的部分，未查看的统计等数据不再请求
+    publish_section = st.radio(
+        "选择功能",
+        ["📤 内容发布", "🔧 平台账号", "📋 发布记录", "📊 发布统计"],
+        horizontal=True,
+        label_visibility="collapsed"
+    )
     
     # 内容发布标签页
-    with tab1:
+    if publish_section == "📤 内容发布":
         st.subheader("📤 发布内容到各平台")
         
-        # 获取草稿列表
-        drafts_result = call_api("/api/drafts")
+        # 同时获取草稿列表和支持的平台
+        drafts_result, platforms_result = call_api_many([
+            (f"{Endpoints.DRAFTS}?preview_chars={DRAFT_PREVIEW_CHARS}",), (Endpoints.PUBLISH_PLATFORMS,)
+        ])
         if not drafts_result["success"]:
             st.error("无法获取草稿列表")
             st.stop()
@@ -910,27 +1262,26 @@ elif page == "🚀 发布管理":
         if not drafts:
             st.warning("暂无草稿可发布，请先在草稿管理中创建内容")
         else:
-            # 选择草稿
-            draft_options = {f"{draft['title']} (ID: {draft['id']})": draft['id'] for draft in drafts}
+            # 选择草稿（选项直接映射到草稿，选中后无需再遍历列表查找）
+            draft_options = {f"{draft['title']} (ID: {draft['id']})": draft for draft in drafts}
             selected_draft_name = st.selectbox("选择要发布的草稿", list(draft_options.keys()))
-            selected_draft_id = draft_options[selected_draft_name]
+            selected_draft = draft_options[selected_draft_name]
+            selected_draft_id = selected_draft['id']
             
             # 显示草稿预览
-            selected_draft = next(d for d in drafts if d['id'] == selected_draft_id)
-            
             with st.expander("📖 草稿预览", expanded=True):
                 st.markdown(f"**标题：** {selected_draft['title']}")
                 st.markdown(f"**字数：** {selected_draft['word_count']}")
-                if selected_draft.get('content'):
+                if selected_draft.get('content_preview'):
                     st.markdown("**内容预览：**")
-                    content_preview = selected_draft['content'][:200] + "..." if len(selected_draft['content']) > 200 else selected_draft['content']
+                    content_preview = selected_draft['content_preview']
+                    if selected_draft['content_length'] > len(content_preview):
+                        content_preview += "..."
                     st.markdown(content_preview)
             
             # 平台选择和内容检查
             st.subheader("🎯 选择发布平台")
             
-            # 获取支持的平台
-            platforms_result = call_api("/api/publish/platforms")
             if platforms_result["success"]:
                 platforms = platforms_result["data"]
                 
@@ -946,16 +1297,16 @@ elif page == "🚀 发布管理":
                 if selected_platforms:
                     st.subheader("✅ 内容适配检查")
                     
-                    # 检查内容适配性
+                    # 检查内容适配性（只检查已选平台，内容由后端从草稿读取）
                     check_data = {
-                        "title": selected_draft['title'],
-                        "content": selected_draft.get('content', ''),
-                        "platform": "all"
+                        "draft_id": selected_draft_id,
+                        "platforms": selected_platforms,
+                        "dry_run": True
                     }
                     
-                    check_result = call_api("/api/publish/check", "POST", check_data)
+                    check_result = publish_batch(check_data)
                     if check_result["success"]:
-                        suggestions = check_result["data"]["platform_suggestions"]
+                        suggestions = check_result["data"]["checks"]
                         
                         for platform in selected_platforms:
                             if platform in suggestions:
@@ -999,15 +1350,21 @@ elif page == "🚀 发布管理":
                             "publish_time": publish_time
                         }
                         
+                        # 检查和发布在一次请求中完成，检查未通过的平台不会发布
                         with st.spinner("发布中..."):
-                            publish_result = call_api("/api/publish", "POST", publish_data)
+                            publish_result = publish_batch(publish_data)
                             
                             if publish_result["success"]:
+                                # 发布记录和统计已变化（预检查走同一接口，不在这里统一失效）
+                                _cached_get.clear()
                                 result_data = publish_result["data"]
-                                st.success(f"✅ {result_data['summary']}")
+                                if result_data["success"]:
+                                    st.success(f"✅ {result_data['summary']}")
+                                else:
+                                    st.warning(f"⚠️ {result_data['summary']}")
                                 
                                 # 显示详细结果
-                                for platform, result in result_data["results"].items():
+                                for platform, result in result_data["publishes"].items():
                                     if result["success"]:
                                         if result.get("message"):
                                             st.info(f"📅 {platform}: {result['message']}")
@@ -1024,7 +1381,7 @@ elif page == "🚀 发布管理":
                 st.error("无法获取平台列表")
     
     # 平台账号管理标签页
-    with tab2:
+    if publish_section == "🔧 平台账号":
         st.subheader("🔧 平台账号管理")
         
         # 添加新账号
@@ -1046,7 +1403,7 @@ elif page == "🚀 发布管理":
                         "access_token": access_token
                     }
                     
-                    result = call_api("/api/publish/accounts", "POST", account_data)
+                    result = call_api(Endpoints.PUBLISH_ACCOUNTS, "POST", account_data)
                     if result["success"]:
                         st.success("账号添加成功！")
                         st.rerun()
@@ -1054,7 +1411,7 @@ elif page == "🚀 发布管理":
                         st.error(f"添加失败: {result.get('error', '未知错误')}")
         
         # 显示现有账号
-        accounts_result = call_api("/api/publish/accounts")
+        accounts_result = call_api(Endpoints.PUBLISH_ACCOUNTS)
         if accounts_result["success"]:
             accounts = accounts_result["data"]
             
@@ -1087,9 +1444,13 @@ elif page == "🚀 发布管理":
             st.error("无法获取账号列表")
     
     # 发布记录标签页
-    with tab3:
+    if publish_section == "📋 发布记录":
         st.subheader("📋 发布记录")
         
+        # 发布记录有短期缓存，可手动刷新
+        if st.button("🔄 刷新记录", key="refresh_records_btn"):
+            _cached_get.clear()
+        
         # 筛选选项
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -1099,56 +1460,49 @@ elif page == "🚀 发布管理":
         with col3:
             limit = st.selectbox("显示数量", [10, 20, 50], index=1)
         
-        # 获取发布记录
-        records_result = call_api(f"/api/publish/records?limit={limit}")
+        # 获取发布记录（筛选在后端完成）
+        # 只请求表格中展示的字段
+        record_params = {"limit": limit, "fields": "title,platform,status,publish_time,platform_post_id,error_message"}
+        if platform_filter != "全部":
+            record_params["platform"] = platform_filter
+        if status_filter != "全部":
+            record_params["status"] = status_filter
+        records_result = call_api(f"{Endpoints.PUBLISH_RECORDS}?{urlencode(record_params)}")
         if records_result["success"]:
             records_data = records_result["data"]
             records = records_data["records"]
             
             if records:
-                # 应用筛选
-                if platform_filter != "全部":
-                    records = [r for r in records if r["platform"] == platform_filter]
-                if status_filter != "全部":
-                    records = [r for r in records if r["status"] == status_filter]
-                
-                st.write(f"共 {len(records)} 条记录")
+                st.write(f"共 {records_data['total']} 条记录，显示 {len(records)} 条")
                 
-                for record in records:
-                    with st.container():
-                        col1, col2, col3, col4 = st.columns([3, 2, 2, 2])
-                        
-                        with col1:
-                            st.write(f"**{record['title']}**")
-                            st.write(f"平台: {record['platform']}")
-                        
-                        with col2:
-                            status_color = {"success": "🟢", "failed": "🔴", "scheduled": "🟡"}
-                            st.write(f"{status_color.get(record['status'], '⚪')} {record['status']}")
-                        
-                        with col3:
-                            if record.get('publish_time'):
-                                st.write(f"发布时间: {format_datetime(record['publish_time'])}")
-                        
-                        with col4:
-                            if record.get('platform_post_id'):
-                                st.code(record['platform_post_id'])
-                        
-                        if record.get('error_message'):
-                            st.error(f"错误: {record['error_message']}")
-                        
-                        st.divider()
+                # 整页记录作为一张表格渲染，不再为每条记录创建一组列和组件
+                records_df = pd.DataFrame(records)
+                st.dataframe(
+                    pd.DataFrame({
+                        "标题": records_df["title"],
+                        "平台": records_df["platform"],
+                        "状态": status_with_icon(records_df["status"], PUBLISH_STATUS_ICONS),
+                        "发布时间": format_datetime_column(records_df["publish_time"]),
+                        "平台文章ID": records_df["platform_post_id"].fillna(""),
+                        "错误信息": records_df["error_message"].fillna(""),
+                    }),
+                    column_config={"错误信息": st.column_config.TextColumn(width="large")},
+                    use_container_width=True,
+                    hide_index=True
+                )
             else:
                 st.info("暂无发布记录")
         else:
             st.error("无法获取发布记录")
     
     # 发布统计标签页
-    with tab4:
+    if publish_section == "📊 发布统计":
         st.subheader("📊 发布统计")
         
-        # 获取统计数据
-        stats_result = call_api("/api/publish/stats")
+        # 刷新在回调中清空缓存，随后的运行重新获取
+        st.button("🔄 刷新统计", key="refresh_publish_stats_btn", on_click=_cached_get.clear)
+        
+        stats_result = call_api(Endpoints.PUBLISH_STATS)
         if stats_result["success"]:
             stats = stats_result["data"]
             
@@ -1158,41 +1512,25 @@ elif page == "🚀 发布管理":
                 
                 platform_stats = stats["platform_stats"]
                 
-                # 创建指标显示
-                cols = st.columns(len(platform_stats))
-                for i, stat in enumerate(platform_stats):
-                    with cols[i]:
-                        st.metric(
-                            f"{stat['platform']} 平台",
-                            f"{stat['total']} 次",
-                            f"成功率 {stat['success_rate']}%"
-                        )
+                # 创建DataFrame用于详细展示（直接按列构建）
+                df = pd.DataFrame(platform_stats, columns=["platform", "total", "success", "failed", "success_rate"])
                 
-                # 创建DataFrame用于详细展示
-                df_data = []
-                for stat in platform_stats:
-                    df_data.append({
-                        "平台": stat["platform"],
-                        "总发布数": stat["total"],
-                        "成功数": stat["success"],
-                        "失败数": stat["failed"],
-                        "成功率": f"{stat['success_rate']}%"
-                    })
+                # 只为全部平台的汇总显示一组指标，各平台数据在表格中展示
+                total_count = int(df["total"].sum())
+                overall_rate = round(df["success"].sum() / total_count * 100, 1) if total_count else 0
+                st.metric("全部平台", f"{total_count} 次", f"成功率 {overall_rate}%")
                 
-                df = pd.DataFrame(df_data)
-                st.dataframe(df, use_container_width=True)
+                df["success_rate"] = df["success_rate"].astype(str) + "%"
+                df.columns = ["平台", "总发布数", "成功数", "失败数", "成功率"]
+                st.dataframe(df, use_container_width=True, hide_index=True)
             
             # 日期统计
-            if stats.get("daily_stats"):
-                st.subheader("📅 最近发布趋势")
-                daily_stats = stats["daily_stats"]
-                
-                if daily_stats:
-                    # 创建图表数据
-                    chart_data = {stat["date"]: stat["count"] for stat in daily_stats}
-                    st.line_chart(chart_data)
-                else:
-                    st.info("最近7天暂无发布记录")
+            st.subheader("📅 最近发布趋势")
+            daily_stats = stats.get("daily_stats") or []
+            if daily_stats:
+                st.line_chart({stat["date"]: stat["count"] for stat in daily_stats})
+            else:
+                st.info("最近7天暂无发布记录")
         else:
             st.error("无法获取统计数据")
 
@@ -1231,7 +1569,7 @@ elif page == "🔥 热点分析":
         
         # 构建查询字符串
         query_string = "&".join([f"{k}={v}" for k, v in params.items()])
-        topics_result = call_api(f"/api/hotspot/topics?{query_string}")
+        topics_result = call_api(f"{Endpoints.HOTSPOT_TOPICS}?{query_string}")
         
         if topics_result["success"]:
             topics_data = topics_result["data"]
@@ -1289,36 +1627,30 @@ elif page == "🔥 热点分析":
                             if st.button(f"✍️ 创作内容", key=f"create_{topic['id']}"):
                                 st.session_state[f"create_content_{topic['id']}"] = True
                         
-                        # 处理生成创意
+                        # 处理生成创意（流式输出，边生成边显示）
                         if st.session_state.get(f"generate_idea_{topic['id']}", False):
-                            with st.spinner("AI正在分析热点并生成创意..."):
-                                # 获取可用的AI模型
-                                configs_result = call_api("/api/ai/configs")
-                                if configs_result["success"]:
-                                    active_configs = [c for c in configs_result["data"] if c["is_active"]]
-                                    if active_configs:
-                                        config_id = active_configs[0]["id"]  # 使用第一个活跃配置
-                                        
-                                        # 生成创意
-                                        idea_data = {
-                                            "topic": topic['title'],
-                                            "platform": "通用",
-                                            "style": "专业",
-                                            "requirements": f"基于热点话题：{topic['title']}，生成3-5个创作角度和内容方向建议",
-                                            "config_id": config_id
-                                        }
-                                        
-                                        idea_result = call_api("/api/content/title", "POST", idea_data)
-                                        if idea_result["success"]:
-                                            st.success("创意生成成功！")
-                                            st.markdown("### 💡 创作建议：")
-                                            st.markdown(idea_result["data"]["titles"])
-                                        else:
-                                            st.error(f"创意生成失败: {idea_result.get('error', '未知错误')}")
-                                    else:
-                                        st.error("没有可用的AI模型配置")
+                            # 获取可用的AI模型
+                            configs_result = get_ai_configs()
+                            if configs_result["success"]:
+                                active_configs = [c for c in configs_result["data"] if c["is_active"]]
+                                if active_configs:
+                                    config_id = active_configs[0]["id"]  # 使用第一个活跃配置
+                                    
+                                    # 生成创意
+                                    idea_data = {
+                                        "topic": topic['title'],
+                                        "platform": "通用",
+                                        "style": "专业",
+                                        "requirements": f"基于热点话题：{topic['title']}，生成3-5个创作角度和内容方向建议",
+                                        "config_id": config_id
+                                    }
+                                    
+                                    st.markdown("### 💡 创作建议：")
+                                    display_stream_content(st.empty(), Endpoints.CONTENT_COMPREHENSIVE_STREAM, idea_data)
                                 else:
-                                    st.error("无法获取AI模型配置")
+                                    st.error("没有可用的AI模型配置")
+                            else:
+                                st.error("无法获取AI模型配置")
                             
                             # 重置状态
                             st.session_state[f"generate_idea_{topic['id']}"] = False
@@ -1344,7 +1676,7 @@ elif page == "🔥 热点分析":
         with col2:
             keyword_limit = st.selectbox("关键词数量", [10, 20, 50], key="keyword_limit")
         
-        keywords_result = call_api(f"/api/hotspot/keywords?hours={keyword_hours}&limit={keyword_limit}")
+        keywords_result = call_api(f"{Endpoints.HOTSPOT_KEYWORDS}?hours={keyword_hours}&limit={keyword_limit}")
         
         if keywords_result["success"]:
             keywords_data = keywords_result["data"]["keywords"]
@@ -1387,7 +1719,7 @@ elif page == "🔥 热点分析":
         st.subheader("📊 热点数据统计")
         
         # 获取统计数据
-        stats_result = call_api("/api/hotspot/stats")
+        stats_result = call_api(Endpoints.HOTSPOT_STATS)
         
         if stats_result["success"]:
             stats = stats_result["data"]
@@ -1455,7 +1787,7 @@ elif page == "🔥 热点分析":
         st.subheader("⚙️ 抓取设置")
         
         # 获取支持的平台
-        platforms_result = call_api("/api/hotspot/platforms")
+        platforms_result = call_api(Endpoints.HOTSPOT_PLATFORMS)
         
         if platforms_result["success"]:
             platforms = platforms_result["data"]["platforms"]
@@ -1476,7 +1808,7 @@ elif page == "🔥 热点分析":
                 if selected_platforms:
                     with st.spinner("正在抓取热点数据..."):
                         crawl_data = selected_platforms if selected_platforms else None
-                        crawl_result = call_api("/api/hotspot/crawl", "POST", crawl_data)
+                        crawl_result = call_api(Endpoints.HOTSPOT_CRAWL, "POST", crawl_data)
                         
                         if crawl_result["success"]:
                             st.success("抓取完成！")
@@ -1518,7 +1850,7 @@ elif page == "🔥 热点分析":
             with col2:
                 if st.button("🗑️ 清理旧数据", key="cleanup_data_btn"):
                     with st.spinner("正在清理数据..."):
-                        cleanup_result = call_api(f"/api/hotspot/cleanup?days={cleanup_days}", "DELETE")
+                        cleanup_result = call_api(f"{Endpoints.HOTSPOT_CLEANUP}?days={cleanup_days}", "DELETE")
                         
                         if cleanup_result["success"]:
                             st.success(f"✅ {cleanup_result['data']['message']}")
@@ -1555,7 +1887,7 @@ elif page == "📊 使用统计":
             params["platform"] = platform_filter
         
         query_string = "&".join([f"{k}={v}" for k, v in params.items()])
-        content_result = call_api(f"/api/analytics/content?{query_string}")
+        content_result = call_api(f"{Endpoints.ANALYTICS_CONTENT}?{query_string}")
         
         if content_result["success"]:
             data = content_result["data"]
@@ -1628,7 +1960,7 @@ elif page == "📊 使用统计":
         
         days_filter = st.selectbox("分析时间范围", [3, 7, 14], index=1, format_func=lambda x: f"最近{x}天", key="hotspot_days")
         
-        hotspot_result = call_api(f"/api/analytics/hotspot?days={days_filter}")
+        hotspot_result = call_api(f"{Endpoints.ANALYTICS_HOTSPOT}?days={days_filter}")
         
         if hotspot_result["success"]:
             data = hotspot_result["data"]
@@ -1702,18 +2034,32 @@ elif page == "📊 使用统计":
     with tab3:
         st.subheader("🤖 AI使用统计")
         
+        if st.button("🔄 刷新统计", key="refresh_ai_stats_btn"):
+            _cached_get.clear()
+        
         # 获取AI使用统计
-        stats_result = call_api("/api/ai/stats")
+        stats_result = call_api(Endpoints.AI_STATS)
         if stats_result["success"]:
             stats = stats_result["data"]
             configs = stats.get("configs", [])
             
+            # 一次遍历得到活跃数和各模型的使用量、Token消耗
+            active_count = 0
+            usage_data = {}
+            token_data = {}
+            for config in configs:
+                active_count += bool(config["is_active"])
+                if config["usage_count"] > 0:
+                    usage_data[config["name"]] = config["usage_count"]
+                if config["total_tokens"] > 0:
+                    token_data[config["name"]] = config["total_tokens"]
+            
             # 总体统计
             col1, col2, col3, col4 = st.columns(4)
             with col1:
                 st.metric("配置总数", len(configs))
             with col2:
-                st.metric("活跃配置", len([c for c in configs if c["is_active"]]))
+                st.metric("活跃配置", active_count)
             with col3:
                 st.metric("总使用次数", stats.get("total_usage", 0))
             with col4:
@@ -1723,32 +2069,17 @@ elif page == "📊 使用统计":
             if configs:
                 st.subheader("📊 各模型使用情况")
                 
-                df_data = []
-                for config in configs:
-                    df_data.append({
-                        "名称": config["name"],
-                        "提供商": config["provider"],
-                        "使用次数": config["usage_count"],
-                        "Token消耗": config["total_tokens"],
-                        "状态": "✅ 活跃" if config["is_active"] else "❌ 停用",
-                        "默认": "⭐ 是" if config["is_default"] else ""
-                    })
-                
-                df = pd.DataFrame(df_data)
-                st.dataframe(df, use_container_width=True)
+                st.dataframe(build_configs_frame(configs), use_container_width=True)
                 
                 # 使用量图表
-                if any(config["usage_count"] > 0 for config in configs):
+                # 两个图表各自独立判断（token_data同样在上面的单次遍历中得到）
+                if usage_data:
                     st.subheader("📈 使用分布")
-                    
-                    usage_data = {config["name"]: config["usage_count"] for config in configs if config["usage_count"] > 0}
-                    if usage_data:
-                        st.bar_chart(usage_data)
-                    
-                    token_data = {config["name"]: config["total_tokens"] for config in configs if config["total_tokens"] > 0}
-                    if token_data:
-                        st.subheader("🥧 Token消耗分布")
-                        st.bar_chart(token_data)
+                    st.bar_chart(usage_data)
+                
+                if token_data:
+                    st.subheader("🥧 Token消耗分布")
+                    st.bar_chart(token_data)
             else:
                 st.info("暂无AI模型配置数据")
         else:
@@ -1762,7 +2093,7 @@ elif page == "📊 使用统计":
         
         if st.button("生成综合报告", type="primary", key="generate_report_btn"):
             with st.spinner("正在生成综合报告..."):
-                report_result = call_api(f"/api/analytics/report?days={days_filter}")
+                report_result = call_api(f"{Endpoints.ANALYTICS_REPORT}?days={days_filter}")
                 
                 if report_result["success"]:
                     data = report_result["data"]
@@ -1808,7 +2139,7 @@ elif page == "📊 使用统计":
         
         # 获取内容创作建议
         st.subheader("💡 实时创作建议")
-        recommendations_result = call_api("/api/analytics/recommendations")
+        recommendations_result = call_api(Endpoints.ANALYTICS_RECOMMENDATIONS)
         
         if recommendations_result["success"]:
             data = recommendations_result["data"]
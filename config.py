@@ -42,6 +42,23 @@ class Settings(BaseSettings):
     MAX_TOKENS: int = 2000
     TEMPERATURE: float = 0.7
     
+    # AI接口HTTP设置（大负载下HTTP/2单连接成为瓶颈时可关闭，改用HTTP/1.1多连接）
+    AI_HTTP2: bool = True
+    # OpenAI异步请求合并窗口（秒），窗口内相同提示词的请求合并为一次n=k调用，默认0表示不合并。
+    # 开启后每次调用都要多等一个窗口（如0.02即20ms）；n=k的k个结果来自同一次采样请求，
+    # 与k次独立请求的采样语义不同，token用量也只能按条均摊，适合大量重复提示词的批量场景
+    AI_OPENAI_BATCH_WINDOW: float = 0
+    
+    # 提示词缓存（相同或语义相近的提示词直接返回已生成结果）
+    AI_PROMPT_CACHE_ENABLED: bool = False
+    AI_PROMPT_CACHE_SIZE: int = 1000
+    AI_PROMPT_CACHE_SEMANTIC: bool = False  # 需要安装sentence-transformers
+    AI_PROMPT_CACHE_SIMILARITY: float = 0.92
+    
+    # temperature为0的确定性调用结果缓存
+    AI_RESPONSE_CACHE_SIZE: int = 10000
+    AI_RESPONSE_CACHE_TTL: int = 3600  # 秒
+    
     # 文件存储设置
     UPLOAD_DIR: str = "uploads"
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
@@ -4,21 +4,62 @@ FastAPI后端主文件
 """
 from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import uvicorn
-import json
-from sqlalchemy.orm import Session
+import asyncio
+import orjson
+import numpy as np
+import pandas as pd
+from sqlalchemy import func
+from sqlalchemy.orm import Session, load_only
 from contextlib import asynccontextmanager
 
 from config import settings
 from models import get_db, init_db, AIModelConfig, ContentDraft, PublishRecord, PlatformAccount, HotTopic
-from ai_models import AIModelManager, PromptTemplates
+from ai_models import AIModelManager, PromptTemplates, close_async_client, flush_logs, log_flush_loop
 from publisher import PublishManager, ScheduledPublishManager
 from hotspot_crawler import HotspotCrawlerManager
 from analytics import AnalyticsManager
 
+try:
+    import pyarrow as pa
+except ImportError:  # 可选依赖，未安装时列表接口只返回JSON
+    pa = None
+
+
+# 流式接口的结束标记
+SSE_DONE = b"data: [DONE]\n\n"
+
+
+def sse_event(payload: Dict[str, Any]) -> bytes:
+    """将数据编码为一条SSE事件（orjson直接输出UTF-8字节）"""
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+
+# 列表接口的Arrow IPC流格式
+ARROW_STREAM_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def accepts_arrow(request: Request) -> bool:
+    """客户端是否接受Arrow格式（且后端已安装pyarrow）"""
+    return pa is not None and ARROW_STREAM_TYPE in request.headers.get("accept", "")
+
+
+def arrow_response(rows: List[Dict[str, Any]], dictionary_columns: tuple = ()) -> Response:
+    """将行列表编码为Arrow IPC流，取值重复较多的字符串列按字典编码"""
+    table = pa.Table.from_pylist(rows)
+    for name in dictionary_columns:
+        index = table.schema.get_field_index(name)
+        if index >= 0 and pa.types.is_string(table.schema.field(index).type):
+            table = table.set_column(index, name, table.column(index).dictionary_encode())
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return Response(content=sink.getvalue().to_pybytes(), media_type=ARROW_STREAM_TYPE)
+
 
 # 请求/响应模型
 class AIModelConfigCreate(BaseModel):
@@ -30,6 +71,9 @@ class AIModelConfigCreate(BaseModel):
     max_tokens: Optional[int] = 2000
     temperature: Optional[float] = 0.7
     is_default: Optional[bool] = False
+    max_concurrent: Optional[int] = None
+    requests_per_minute: Optional[int] = None
+    max_tokens_budget: Optional[int] = None
 
 
 class AIModelConfigUpdate(BaseModel):
@@ -41,6 +85,9 @@ class AIModelConfigUpdate(BaseModel):
     temperature: Optional[float] = None
     is_active: Optional[bool] = None
     is_default: Optional[bool] = None
+    max_concurrent: Optional[int] = None
+    requests_per_minute: Optional[int] = None
+    max_tokens_budget: Optional[int] = None
 
 
 class ContentGenerateRequest(BaseModel):
@@ -50,6 +97,13 @@ class ContentGenerateRequest(BaseModel):
     temperature: Optional[float] = None
 
 
+class ContentBatchGenerateRequest(BaseModel):
+    prompts: List[str]
+    config_id: Optional[int] = None
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+
+
 
 
 
@@ -89,6 +143,13 @@ class ContentPublishRequest(BaseModel):
     publish_time: Optional[str] = None  # ISO格式时间字符串
 
 
+class PublishBatchRequest(BaseModel):
+    draft_id: int
+    platforms: List[str]
+    publish_time: Optional[str] = None  # ISO格式时间字符串
+    dry_run: bool = False  # 只检查内容适配性，不发布
+
+
 class ContentCheckRequest(BaseModel):
     title: str
     content: str
@@ -113,9 +174,14 @@ async def lifespan(app: FastAPI):
     # 启动时初始化数据库
     init_db()
     print("数据库初始化完成")
+    # 后台批量写入AI日志
+    log_flush_task = asyncio.create_task(log_flush_loop())
     yield
     # 关闭时清理资源
     print("应用正在关闭...")
+    log_flush_task.cancel()
+    flush_logs()
+    await close_async_client()
 
 
 # 创建FastAPI应用
@@ -209,8 +275,8 @@ async def update_ai_config(config_id: int, config_data: AIModelConfigUpdate, db:
 
 
 @app.post("/api/ai/configs/{config_id}/test", summary="测试AI模型配置")
-async def test_ai_config(config_id: int, db: Session = Depends(get_db)):
-    """测试AI模型配置连接"""
+def test_ai_config(config_id: int, db: Session = Depends(get_db)):
+    """测试AI模型配置连接（同步调用模型接口，普通函数由FastAPI放到线程池执行）"""
     manager = AIModelManager(db)
     result = manager.test_config(config_id)
     if result["success"]:
@@ -231,7 +297,7 @@ async def get_ai_stats(config_id: Optional[int] = None, db: Session = Depends(ge
 async def generate_content(request: ContentGenerateRequest, db: Session = Depends(get_db)):
     """使用AI生成内容"""
     manager = AIModelManager(db)
-    result = manager.generate_content(
+    result = await manager.generate_content_async(
         prompt=request.prompt,
         config_id=request.config_id,
         max_tokens=request.max_tokens,
@@ -248,24 +314,60 @@ async def generate_content(request: ContentGenerateRequest, db: Session = Depend
     }
 
 
+# 单次批量生成最多包含的提示词数
+MAX_BATCH_PROMPTS = 50
+
+
+@app.post("/api/content/generate/batch", summary="批量生成内容")
+async def generate_content_batch(request: ContentBatchGenerateRequest, db: Session = Depends(get_db)):
+    """并发生成多个提示词的内容（按模型配置限流），结果与提示词顺序一致，单条失败不影响其他结果"""
+    if not request.prompts:
+        raise HTTPException(status_code=400, detail="请至少提供一个提示词")
+    if len(request.prompts) > MAX_BATCH_PROMPTS:
+        raise HTTPException(status_code=400, detail=f"单次最多生成{MAX_BATCH_PROMPTS}条内容")
+    
+    manager = AIModelManager(db)
+    results = await manager.generate_many(
+        request.prompts,
+        config_id=request.config_id,
+        max_tokens=request.max_tokens,
+        temperature=request.temperature
+    )
+    success_count = sum(1 for result in results if result["success"])
+    
+    return {
+        "success": success_count > 0,
+        "summary": f"成功生成{success_count}/{len(results)}条内容",
+        "results": [
+            {
+                "success": result["success"],
+                "content": result.get("content"),
+                "error": result.get("error"),
+                "usage": result.get("usage"),
+                "model": result.get("model")
+            }
+            for result in results
+        ]
+    }
+
+
 @app.post("/api/content/generate/stream", summary="流式生成内容")
 async def generate_content_stream(request: ContentGenerateRequest, db: Session = Depends(get_db)):
     """使用AI流式生成内容"""
-    def stream_generator():
+    async def stream_generator():
         manager = AIModelManager(db)
         
-        for chunk in manager.generate_content_stream(
+        async for chunk in manager.agenerate_content_stream(
             prompt=request.prompt,
             config_id=request.config_id,
             max_tokens=request.max_tokens,
             temperature=request.temperature
         ):
             # 将chunk转换为SSE格式
-            data = json.dumps(chunk, ensure_ascii=False)
-            yield f"data: {data}\n\n"
+            yield sse_event(chunk)
         
         # 发送结束标记
-        yield "data: [DONE]\n\n"
+        yield SSE_DONE
     
     return StreamingResponse(
         stream_generator(),
@@ -288,7 +390,7 @@ async def create_comprehensive_content(request: ComprehensiveCreationRequest, db
     manager = AIModelManager(db)
     
     # 构建综合创作提示词
-    prompt = PromptTemplates.COMPREHENSIVE_CREATION.format(
+    prompt = PromptTemplates.render_comprehensive(
         topic=request.topic,
         platform=request.platform,
         style=request.style,
@@ -299,7 +401,11 @@ async def create_comprehensive_content(request: ComprehensiveCreationRequest, db
     )
     
     try:
-        result = manager.generate_content(prompt, request.config_id)
+        result = await manager.generate_content_async(
+            prompt, request.config_id,
+            category=PromptTemplates.category("comprehensive"),
+            platform=request.platform
+        )
         return {
             "content": result["content"],
             "usage": result.get("usage", {}),
@@ -316,7 +422,7 @@ async def create_comprehensive_content_stream(request: ComprehensiveCreationRequ
     manager = AIModelManager(db)
     
     # 构建综合创作提示词
-    prompt = PromptTemplates.COMPREHENSIVE_CREATION.format(
+    prompt = PromptTemplates.render_comprehensive(
         topic=request.topic,
         platform=request.platform,
         style=request.style,
@@ -326,18 +432,18 @@ async def create_comprehensive_content_stream(request: ComprehensiveCreationRequ
         requirements=request.requirements
     )
     
-    def stream_generator():
+    async def stream_generator():
         try:
-            for chunk in manager.generate_content_stream(prompt, request.config_id):
+            async for chunk in manager.agenerate_content_stream(prompt, request.config_id):
                 # 统一输出格式
                 if "error" in chunk:
-                    yield f"data: {json.dumps({'error': chunk['error']})}\n\n"
+                    yield sse_event({'error': chunk['error']})
                 else:
-                    yield f"data: {json.dumps(chunk)}\n\n"
+                    yield sse_event(chunk)
         except Exception as e:
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            yield sse_event({'error': str(e)})
         finally:
-            yield f"data: [DONE]\n\n"
+            yield SSE_DONE
     
     return StreamingResponse(stream_generator(), media_type="text/plain")
 
@@ -349,7 +455,7 @@ async def rewrite_content(request: ContentRewriteRequest, db: Session = Depends(
     manager = AIModelManager(db)
     
     # 构建改写提示词
-    prompt = PromptTemplates.CONTENT_REWRITE.format(
+    prompt = PromptTemplates.render_rewrite(
         original_content=request.original_content,
         rewrite_type=request.rewrite_type,
         rewrite_strength=request.rewrite_strength,
@@ -362,7 +468,11 @@ async def rewrite_content(request: ContentRewriteRequest, db: Session = Depends(
     )
     
     try:
-        result = manager.generate_content(prompt, request.config_id)
+        result = await manager.generate_content_async(
+            prompt, request.config_id,
+            category=PromptTemplates.category("rewrite"),
+            platform=request.platform
+        )
         return {
             "rewritten_content": result["content"],
             "usage": result.get("usage", {}),
@@ -379,7 +489,7 @@ async def rewrite_content_stream(request: ContentRewriteRequest, db: Session = D
     manager = AIModelManager(db)
     
     # 构建改写提示词
-    prompt = PromptTemplates.CONTENT_REWRITE.format(
+    prompt = PromptTemplates.render_rewrite(
         original_content=request.original_content,
         rewrite_type=request.rewrite_type,
         rewrite_strength=request.rewrite_strength,
@@ -391,18 +501,18 @@ async def rewrite_content_stream(request: ContentRewriteRequest, db: Session = D
         requirements=request.requirements
     )
     
-    def stream_generator():
+    async def stream_generator():
         try:
-            for chunk in manager.generate_content_stream(prompt, request.config_id):
+            async for chunk in manager.agenerate_content_stream(prompt, request.config_id):
                 # 统一输出格式
                 if "error" in chunk:
-                    yield f"data: {json.dumps({'error': chunk['error']})}\n\n"
+                    yield sse_event({'error': chunk['error']})
                 else:
-                    yield f"data: {json.dumps(chunk)}\n\n"
+                    yield sse_event(chunk)
         except Exception as e:
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            yield sse_event({'error': str(e)})
         finally:
-            yield f"data: [DONE]\n\n"
+            yield SSE_DONE
     
     return StreamingResponse(stream_generator(), media_type="text/plain")
 
@@ -410,24 +520,39 @@ async def rewrite_content_stream(request: ContentRewriteRequest, db: Session = D
 # 草稿管理相关API
 @app.get("/api/drafts", summary="获取草稿列表")
 async def list_drafts(
+    request: Request,
     skip: int = 0,
     limit: int = 20,
     category: Optional[str] = None,
     status: Optional[str] = None,
+    preview_chars: int = 0,
     db: Session = Depends(get_db)
 ):
-    """获取草稿列表"""
-    query = db.query(ContentDraft)
+    """获取草稿列表（请求头Accept为Arrow流格式时以Arrow IPC返回）
+    
+    preview_chars大于0时附带正文前若干字（content_preview）和正文总字数（content_length），
+    截取在数据库中完成，列表接口不加载完整正文
+    """
+    query = db.query(ContentDraft).options(load_only(
+        ContentDraft.id, ContentDraft.title, ContentDraft.category, ContentDraft.platform_type,
+        ContentDraft.status, ContentDraft.word_count, ContentDraft.ai_generated,
+        ContentDraft.created_at, ContentDraft.updated_at
+    ))
+    if preview_chars > 0:
+        query = query.add_columns(
+            func.substr(ContentDraft.content, 1, preview_chars),
+            func.coalesce(func.length(ContentDraft.content), 0)
+        )
     
     if category:
         query = query.filter(ContentDraft.category == category)
     if status:
         query = query.filter(ContentDraft.status == status)
     
-    drafts = query.offset(skip).limit(limit).all()
-    
-    return [
-        {
+    rows = []
+    for result in query.offset(skip).limit(limit).all():
+        draft = result[0] if preview_chars > 0 else result
+        row = {
             "id": draft.id,
             "title": draft.title,
             "category": draft.category,
@@ -438,8 +563,22 @@ async def list_drafts(
             "created_at": draft.created_at,
             "updated_at": draft.updated_at
         }
-        for draft in drafts
-    ]
+        if preview_chars > 0:
+            row["content_preview"], row["content_length"] = result[1], result[2]
+        rows.append(row)
+    if accepts_arrow(request):
+        return arrow_response(rows, dictionary_columns=("category", "platform_type", "status"))
+    return rows
+
+
+@app.get("/api/drafts/categories", summary="获取草稿分类列表")
+async def list_draft_categories(db: Session = Depends(get_db)):
+    """获取已有草稿的分类（去重后排序）"""
+    rows = db.query(ContentDraft.category).filter(
+        ContentDraft.category.isnot(None),
+        ContentDraft.category != ""
+    ).distinct().order_by(ContentDraft.category).all()
+    return [category for (category,) in rows]
 
 
 @app.post("/api/drafts", summary="创建草稿")
@@ -605,19 +744,24 @@ async def check_content_compatibility(request: ContentCheckRequest, db: Session
         }
 
 
+def parse_publish_time(value: Optional[str]):
+    """解析ISO格式的发布时间"""
+    if not value:
+        return None
+    try:
+        from datetime import datetime
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="发布时间格式错误，请使用ISO格式")
+
+
 @app.post("/api/publish", summary="发布内容")
 async def publish_content(request: ContentPublishRequest, db: Session = Depends(get_db)):
     """发布内容到指定平台"""
     manager = PublishManager(db)
     
     # 处理发布时间
-    publish_time = None
-    if request.publish_time:
-        try:
-            from datetime import datetime
-            publish_time = datetime.fromisoformat(request.publish_time.replace('Z', '+00:00'))
-        except ValueError:
-            raise HTTPException(status_code=400, detail="发布时间格式错误，请使用ISO格式")
+    publish_time = parse_publish_time(request.publish_time)
     
     result = manager.publish_content(
         draft_id=request.draft_id,
@@ -631,36 +775,95 @@ async def publish_content(request: ContentPublishRequest, db: Session = Depends(
     return result
 
 
+# 单次批量发布最多包含的平台数
+MAX_BATCH_PLATFORMS = 100
+
+
+@app.post("/api/publish/batch", summary="批量检查并发布")
+async def publish_batch(request: PublishBatchRequest, db: Session = Depends(get_db)):
+    """按草稿在一次请求中完成多个平台的内容检查和发布，dry_run时只返回检查结果"""
+    if not request.platforms:
+        raise HTTPException(status_code=400, detail="请至少选择一个发布平台")
+    if len(request.platforms) > MAX_BATCH_PLATFORMS:
+        raise HTTPException(status_code=400, detail=f"单次最多发布到{MAX_BATCH_PLATFORMS}个平台")
+    
+    draft = db.query(ContentDraft).filter(ContentDraft.id == request.draft_id).first()
+    if not draft:
+        raise HTTPException(status_code=404, detail="草稿不存在")
+    
+    publish_time = parse_publish_time(request.publish_time)
+    
+    # 内容直接从草稿读取，前端无需再上传标题和正文
+    manager = PublishManager(db)
+    checks = manager.get_platform_suggestions(
+        {"title": draft.title, "content": draft.content or ""}, request.platforms
+    )
+    if request.dry_run:
+        return {"checks": checks}
+    
+    # 只发布检查通过的平台，未通过的平台单独返回错误
+    passed = [platform for platform in request.platforms if checks[platform]["valid"]]
+    results = {}
+    if passed:
+        results = manager.publish_content(
+            draft_id=request.draft_id,
+            platforms=passed,
+            publish_time=publish_time
+        )["results"]
+    
+    publishes = {
+        platform: results[platform] if platform in results else {
+            "success": False,
+            "error": checks[platform]["error"] or "内容检查未通过"
+        }
+        for platform in request.platforms
+    }
+    success_count = sum(1 for result in publishes.values() if result.get("success"))
+    
+    return {
+        "success": success_count > 0,
+        "summary": f"成功发布到{success_count}/{len(publishes)}个平台",
+        "checks": checks,
+        "publishes": publishes
+    }
+
+
+# 发布记录列表可返回的字段
+PUBLISH_RECORD_FIELDS = (
+    "id", "draft_id", "platform", "platform_post_id", "title",
+    "status", "publish_time", "error_message", "created_at"
+)
+
+
 @app.get("/api/publish/records", summary="获取发布记录")
 async def list_publish_records(
     draft_id: Optional[int] = None,
     platform: Optional[str] = None,
+    status: Optional[str] = None,
     skip: int = 0,
     limit: int = 20,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """获取发布记录列表"""
-    manager = PublishManager(db)
-    records = manager.get_publish_records(draft_id, platform)
+    """获取发布记录列表（筛选和分页在数据库中完成）
+    
+    fields为逗号分隔的字段名，只返回并只从数据库读取这些字段；不传时返回全部字段
+    """
+    selected = PUBLISH_RECORD_FIELDS
+    if fields:
+        selected = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+        unknown = [name for name in selected if name not in PUBLISH_RECORD_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"未知字段: {', '.join(unknown)}")
     
-    # 分页
-    total = len(records)
-    records = records[skip:skip + limit]
+    manager = PublishManager(db)
+    total = manager.count_publish_records(draft_id, platform, status)
+    records = manager.get_publish_records(draft_id, platform, status, skip, limit, fields=selected)
     
     return {
         "total": total,
         "records": [
-            {
-                "id": record.id,
-                "draft_id": record.draft_id,
-                "platform": record.platform,
-                "platform_post_id": record.platform_post_id,
-                "title": record.title,
-                "status": record.status,
-                "publish_time": record.publish_time,
-                "error_message": record.error_message,
-                "created_at": record.created_at
-            }
+            {name: getattr(record, name) for name in selected}
             for record in records
         ]
     }
@@ -670,44 +873,41 @@ async def list_publish_records(
 async def get_publish_stats(db: Session = Depends(get_db)):
     """获取发布统计数据"""
     from datetime import datetime, timedelta
-    from collections import defaultdict
     
-    # 获取所有发布记录
-    all_records = db.query(PublishRecord).all()
+    # 只取统计需要的三列，转为列式数据后完成平台统计和最近7天的日期统计
+    rows = db.query(PublishRecord.platform, PublishRecord.status, PublishRecord.created_at).all()
+    week_ago = datetime.now() - timedelta(days=7)
     
-    # 按平台统计
-    platform_counts = defaultdict(lambda: {"total": 0, "success": 0, "failed": 0})
+    platforms, statuses, created = zip(*rows) if rows else ((), (), ())
     
-    for record in all_records:
-        platform_counts[record.platform]["total"] += 1
-        if record.status == "success":
-            platform_counts[record.platform]["success"] += 1
-        elif record.status == "failed":
-            platform_counts[record.platform]["failed"] += 1
+    # 平台编码为整数后按列累加：[total, success, failed]
+    codes, uniques = pd.factorize(np.asarray(platforms, dtype=object))
+    statuses = np.asarray(statuses, dtype=object)
+    counts = np.column_stack([
+        np.bincount(codes, minlength=len(uniques)),
+        np.bincount(codes[statuses == "success"], minlength=len(uniques)),
+        np.bincount(codes[statuses == "failed"], minlength=len(uniques)),
+    ])
     
     platform_stats = []
-    for platform, counts in platform_counts.items():
-        success_rate = round(counts["success"] / counts["total"] * 100, 1) if counts["total"] > 0 else 0
+    for platform, (total, success, failed) in zip(uniques, counts.tolist()):
+        success_rate = round(success / total * 100, 1) if total > 0 else 0
         platform_stats.append({
             "platform": platform,
-            "total": counts["total"],
-            "success": counts["success"],
-            "failed": counts["failed"],
+            "total": total,
+            "success": success,
+            "failed": failed,
             "success_rate": success_rate
         })
     
-    # 按日期统计（最近7天）
-    week_ago = datetime.now() - timedelta(days=7)
-    daily_counts = defaultdict(int)
-    
-    for record in all_records:
-        if record.created_at >= week_ago:
-            date_str = record.created_at.strftime('%Y-%m-%d')
-            daily_counts[date_str] += 1
+    # 最近7天按天计数：截断到天后去重计数，结果已按日期升序
+    created = np.asarray(created, dtype="datetime64[us]")
+    recent_days = created[created >= np.datetime64(week_ago)].astype("datetime64[D]")
+    days, day_counts = np.unique(recent_days, return_counts=True)
     
     daily_stats = [
         {"date": date, "count": count}
-        for date, count in sorted(daily_counts.items())
+        for date, count in zip(np.datetime_as_string(days, unit="D").tolist(), day_counts.tolist())
     ]
     
     return {
@@ -880,39 +1080,43 @@ async def get_hotspot_stats(db: Session = Depends(get_db)):
         from datetime import datetime, timedelta
         from collections import defaultdict
         
-        # 获取最近24小时的数据
-        recent_topics = db.query(HotTopic).filter(
+        # 最近24小时的数据在数据库中按平台、类别、情感分组聚合，
+        # 按各组最早一条记录排序，使各项统计保持原先的首次出现顺序
+        grouped = db.query(
+            HotTopic.platform,
+            HotTopic.category,
+            HotTopic.sentiment,
+            func.count(HotTopic.id),
+            func.coalesce(func.sum(HotTopic.hot_score), 0.0)
+        ).filter(
             HotTopic.created_at >= datetime.now() - timedelta(hours=24)
-        ).all()
+        ).group_by(
+            HotTopic.platform, HotTopic.category, HotTopic.sentiment
+        ).order_by(func.min(HotTopic.id)).all()
         
-        # 按平台统计
-        platform_stats = defaultdict(lambda: {"count": 0, "avg_score": 0})
-        total_score = defaultdict(float)
+        platforms, categories, sentiments, counts, scores = zip(*grouped) if grouped else ((),) * 5
+        counts = np.asarray(counts, dtype=np.int64)
         
-        for topic in recent_topics:
-            platform_stats[topic.platform]["count"] += 1
-            total_score[topic.platform] += topic.hot_score
+        # 按平台统计：平台编码为整数，数量和总热度各用一次bincount累加
+        codes, uniques = pd.factorize(np.asarray(platforms, dtype=object))
+        platform_counts = np.bincount(codes, weights=counts, minlength=len(uniques)).astype(np.int64)
+        total_score = np.bincount(codes, weights=np.asarray(scores, dtype=np.float64), minlength=len(uniques))
         
-        # 计算平均分数
-        for platform in platform_stats:
-            if platform_stats[platform]["count"] > 0:
-                platform_stats[platform]["avg_score"] = round(
-                    total_score[platform] / platform_stats[platform]["count"], 2
-                )
+        platform_stats = {
+            platform: {"count": count, "avg_score": round(total / count, 2)}
+            for platform, count, total in zip(uniques, platform_counts.tolist(), total_score.tolist())
+        }
         
-        # 按类别统计
+        # 按类别和情感统计（只需合并少量分组行）
         category_stats = defaultdict(int)
-        for topic in recent_topics:
-            category_stats[topic.category] += 1
-        
-        # 情感分析统计
         sentiment_stats = defaultdict(int)
-        for topic in recent_topics:
-            sentiment_stats[topic.sentiment] += 1
+        for category, sentiment, count in zip(categories, sentiments, counts.tolist()):
+            category_stats[category] += count
+            sentiment_stats[sentiment] += count
         
         return {
-            "total_topics": len(recent_topics),
-            "platform_stats": dict(platform_stats),
+            "total_topics": int(counts.sum()),
+            "platform_stats": platform_stats,
             "category_stats": dict(category_stats),
             "sentiment_stats": dict(sentiment_stats),
             "time_range": "最近24小时"
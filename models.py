@@ -1,21 +1,32 @@
 """
 数据库模型定义
 """
+import json
 from datetime import datetime
 from typing import Optional, List
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Boolean, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Boolean, JSON, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, insert, inspect, select, text
 from sqlalchemy.orm import sessionmaker
 from config import settings
 
+try:
+    import orjson
+except ImportError:  # 未安装orjson时使用标准库json
+    orjson = None
+
 Base = declarative_base()
 
 
 class AIModelConfig(Base):
     """AI模型配置表"""
     __tablename__ = "ai_model_configs"
+    __table_args__ = (
+        # get_model / list_configs 按启用和默认状态过滤
+        Index("ix_ai_model_configs_active_default", "is_active", "is_default"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(50), unique=True, index=True)  # 模型名称
@@ -29,6 +40,11 @@ class AIModelConfig(Base):
     is_default = Column(Boolean, default=False)
     usage_count = Column(Integer, default=0)  # 使用次数
     total_tokens = Column(Integer, default=0)  # 总使用token数
+    max_concurrent = Column(Integer)  # 最大并发请求数（为空时使用提供商默认值）
+    requests_per_minute = Column(Integer)  # 每分钟请求上限（为空时不限制）
+    max_tokens_budget = Column(Integer)  # 单次调用的token预算，含提示词和最大输出（为空时不限制）
+    access_token = Column(String(500))  # 访问令牌（百度等需要OAuth换取令牌的提供商）
+    token_expires_at = Column(DateTime)  # 令牌过期时间
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -42,7 +58,7 @@ class ContentDraft(Base):
     content = Column(Text)
     outline = Column(Text)  # 大纲
     tags = Column(String(500))  # 标签，逗号分隔
-    category = Column(String(50))  # 分类
+    category = Column(String(50), index=True)  # 分类
     platform_type = Column(String(20))  # 目标平台类型
     status = Column(String(20), default="draft")  # draft, published, deleted
     version = Column(Integer, default=1)  # 版本号
@@ -60,6 +76,13 @@ class ContentDraft(Base):
 class PublishRecord(Base):
     """发布记录表"""
     __tablename__ = "publish_records"
+    __table_args__ = (
+        # 内容分析按时间窗口（及平台）过滤
+        Index("ix_publish_records_platform_created", "platform", "created_at"),
+        Index("ix_publish_records_created", "created_at"),
+        # 发布记录列表按状态筛选并按时间倒序
+        Index("ix_publish_records_status_created", "status", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     draft_id = Column(Integer, ForeignKey("content_drafts.id"))
@@ -84,6 +107,10 @@ class PublishRecord(Base):
 class HotTopic(Base):
     """热点话题表"""
     __tablename__ = "hot_topics"
+    __table_args__ = (
+        # 热点分析与统计按时间窗口过滤，再按热度排序
+        Index("ix_hot_topics_created_score", "created_at", "hot_score"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     platform = Column(String(20), nullable=False)  # 平台来源
@@ -119,17 +146,60 @@ class PlatformAccount(Base):
 class SystemLog(Base):
     """系统日志表"""
     __tablename__ = "system_logs"
+    __table_args__ = (
+        Index("ix_system_logs_module_created", "module", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     level = Column(String(10), nullable=False)  # DEBUG, INFO, WARNING, ERROR
     module = Column(String(50))  # 模块名称
     message = Column(Text, nullable=False)
-    details = Column(JSON)  # 详细信息，JSON格式
+    details = Column(JSON().with_variant(JSONB(), "postgresql"))  # 详细信息，JSON格式（PostgreSQL下使用JSONB）
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
+class LlmCallMetric(Base):
+    """AI调用指标表（成功调用只记录轻量指标，失败详情写入系统日志）"""
+    __tablename__ = "llm_call_metrics"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    config_id = Column(Integer, index=True)  # AI模型配置ID
+    duration_ms = Column(Integer, default=0)  # 响应耗时（毫秒）
+    total_tokens = Column(Integer, default=0)
+    success = Column(Boolean, default=True)
+    cache_hit = Column(Boolean, default=False)  # 是否命中提示词缓存
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class SchemaVersion(Base):
+    """数据库结构版本表（只有一行，记录已执行到的迁移版本号）"""
+    __tablename__ = "schema_version"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
 # 数据库连接
-engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False})
+def _json_serializer(value) -> str:
+    """JSON列序列化，优先使用orjson"""
+    if orjson is not None:
+        return orjson.dumps(value).decode()
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _json_deserializer(value: str):
+    """JSON列反序列化，优先使用orjson"""
+    if orjson is not None:
+        return orjson.loads(value)
+    return json.loads(value)
+
+
+engine = create_engine(
+    settings.DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    json_serializer=_json_serializer,
+    json_deserializer=_json_deserializer
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
@@ -142,9 +212,84 @@ def get_db():
         db.close()
 
 
+def _add_columns(conn, table_name: str, column_names):
+    """按模型定义为已有表添加列（旧版本可能已补过部分列，已存在的列跳过）"""
+    table = Base.metadata.tables[table_name]
+    existing_columns = {column["name"] for column in inspect(conn).get_columns(table_name)}
+    for name in column_names:
+        if name not in existing_columns:
+            column_type = table.columns[name].type.compile(dialect=conn.dialect)
+            conn.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {name} {column_type}'))
+
+
+def _backfill_llm_call_metrics(conn):
+    """把旧版本写在系统日志中的成功调用转换为调用指标，使用统计不丢失历史数据
+    （旧版本每次成功调用写一条INFO日志，新版本只为失败调用写ERROR日志，因此只转换INFO日志，不会重复）"""
+    rows = conn.execute(select(SystemLog.details, SystemLog.created_at).where(
+        SystemLog.module == "ai_models",
+        SystemLog.level == "INFO"
+    ))
+    metrics = []
+    for details, created_at in rows:
+        if isinstance(details, str):
+            try:
+                details = json.loads(details)
+            except ValueError:
+                continue
+        if not isinstance(details, dict) or not details.get("success"):
+            continue
+        usage = details.get("usage")
+        metrics.append({
+            "config_id": details.get("config_id"),
+            "duration_ms": int((details.get("response_time") or 0) * 1000),
+            "total_tokens": (usage.get("total_tokens") or 0) if isinstance(usage, dict) else 0,
+            "success": True,
+            "cache_hit": False,
+            "created_at": created_at
+        })
+    if metrics:
+        conn.execute(insert(LlmCallMetric.__table__), metrics)
+
+
+# 结构迁移：(版本号, 迁移步骤)，修改已有表时在末尾追加一项并递增版本号
+SCHEMA_MIGRATIONS = [
+    (1, lambda conn: _add_columns(conn, "ai_model_configs", ("access_token", "token_expires_at"))),
+    (2, lambda conn: _add_columns(conn, "ai_model_configs", ("max_concurrent", "requests_per_minute"))),
+    (3, lambda conn: _add_columns(conn, "ai_model_configs", ("max_tokens_budget",))),
+    (4, _backfill_llm_call_metrics),
+]
+
+
+def migrate_db(is_new: bool):
+    """执行尚未执行的结构迁移（新建的数据库已是最新结构，只记录版本号）"""
+    latest = SCHEMA_MIGRATIONS[-1][0]
+    with engine.begin() as conn:
+        current = conn.execute(text("SELECT version FROM schema_version WHERE id = 1")).scalar()
+        if current is None:
+            current = latest if is_new else 0
+            conn.execute(text("INSERT INTO schema_version (id, version) VALUES (1, :version)"), {"version": current})
+        if current >= latest:
+            return
+        
+        for version, step in SCHEMA_MIGRATIONS:
+            if version > current:
+                step(conn)
+        conn.execute(text("UPDATE schema_version SET version = :version WHERE id = 1"), {"version": latest})
+
+
+def ensure_indexes():
+    """为已存在的表补建索引（create_all不会给旧表添加新索引）"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
 def init_db():
     """初始化数据库"""
+    is_new = not inspect(engine).get_table_names()
     Base.metadata.create_all(bind=engine)
+    migrate_db(is_new)
+    ensure_indexes()
     
     # 创建默认AI模型配置
     db = SessionLocal()
@@ -0,0 +1,221 @@
+"""
+提示词缓存模块
+对相同或语义相近的提示词复用已生成的结果，减少重复调用AI接口
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple
+
+import numpy as np
+
+from config import settings
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # 可选依赖，未安装时只使用精确匹配
+    SentenceTransformer = None
+
+
+class PromptCache:
+    """提示词缓存（精确匹配 + 语义相似匹配）"""
+
+    def __init__(self, max_size: int = 1000, similarity_threshold: float = 0.92,
+                 semantic: bool = False, model_name: str = "all-MiniLM-L6-v2",
+                 ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl  # 过期时间（秒），None表示不过期
+        self.similarity_threshold = similarity_threshold
+        self.semantic = semantic and SentenceTransformer is not None
+        self.model_name = model_name
+        self._encoder = None
+        # 精确匹配：sha256(命名空间+提示词) -> 生成结果
+        self.exact: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+        self._expires: Dict[bytes, float] = {}
+        self.hits = 0
+        self.misses = 0
+        # 语义匹配：归一化向量按行存放在预分配的max_size×d矩阵中（首次写入向量时按维度分配），
+        # 行号与_row_keys、_row_namespaces一一对应，空闲行的命名空间为-1，删除的行放回空闲列表复用
+        self._namespace_ids: Dict[str, int] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._row_namespaces = np.empty(0, dtype=np.int32)
+        self._row_keys: List[Optional[bytes]] = []
+        self._rows: Dict[bytes, int] = {}  # 缓存键 -> 行号
+        self._free_rows: List[int] = []
+        self._used_rows = 0  # 分配过的最大行数，查找时只计算这些行
+        self._lock = threading.Lock()
+        # 正在计算中的向量任务，避免同一提示词被并发重复编码
+        self._inflight: Dict[bytes, "asyncio.Future[Optional[np.ndarray]]"] = {}
+
+    @staticmethod
+    def _hash(namespace: str, prompt: str) -> bytes:
+        """计算缓存键"""
+        return hashlib.sha256(f"{namespace}\x00{prompt}".encode("utf-8")).digest()
+
+    def _embed(self, prompt: str) -> Optional[np.ndarray]:
+        """计算提示词的归一化向量"""
+        if not self.semantic:
+            return None
+        if self._encoder is None:
+            self._encoder = SentenceTransformer(self.model_name)
+        vector = self._encoder.encode(prompt, normalize_embeddings=True)
+        return np.asarray(vector, dtype=np.float32)
+
+    async def _aembed(self, prompt: str) -> Optional[np.ndarray]:
+        """在线程池中计算向量，避免阻塞事件循环"""
+        if not self.semantic:
+            return None
+        key = hashlib.sha256(prompt.encode("utf-8")).digest()
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(asyncio.to_thread(self._embed, prompt))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield保证单个等待方被取消时不影响其他等待同一向量的请求
+        return await asyncio.shield(task)
+
+    def _remove(self, key: bytes):
+        """删除缓存项（调用方需持有锁）"""
+        self.exact.pop(key, None)
+        self._expires.pop(key, None)
+        row = self._rows.pop(key, None)
+        if row is not None:
+            self._row_namespaces[row] = -1
+            self._row_keys[row] = None
+            self._free_rows.append(row)
+
+    def _expired(self, key: bytes) -> bool:
+        """判断缓存项是否已过期（调用方需持有锁）"""
+        return self.ttl is not None and self._expires.get(key, 0) < time.time()
+
+    def _store_vector(self, key: bytes, vector: np.ndarray, namespace: str):
+        """把向量写入空闲行（调用方需持有锁，且已淘汰到有空闲行）"""
+        if self._matrix is None:
+            self._matrix = np.zeros((self.max_size, vector.shape[-1]), dtype=np.float32)
+            self._row_namespaces = np.full(self.max_size, -1, dtype=np.int32)
+            self._row_keys = [None] * self.max_size
+        if self._free_rows:
+            row = self._free_rows.pop()
+        else:
+            row = self._used_rows
+            self._used_rows += 1
+        self._matrix[row] = vector
+        self._row_namespaces[row] = self._namespace_ids.setdefault(namespace, len(self._namespace_ids))
+        self._row_keys[row] = key
+        self._rows[key] = row
+
+    def _get_exact(self, key: bytes) -> Optional[Dict[str, Any]]:
+        """精确匹配查找"""
+        with self._lock:
+            result = self.exact.get(key)
+            if result is not None:
+                if self._expired(key):
+                    self._remove(key)
+                    return None
+                self.exact.move_to_end(key)
+            return result
+
+    def _count(self, result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """记录命中/未命中次数"""
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def _search(self, vector: np.ndarray, namespace: str) -> Optional[Dict[str, Any]]:
+        """语义相似查找（与精确匹配一样检查过期并更新LRU顺序）"""
+        with self._lock:
+            namespace_id = self._namespace_ids.get(namespace)
+            if namespace_id is None or not self._rows:
+                return None
+
+            # 向量已归一化，矩阵乘一次即得到与所有缓存提示词的余弦相似度
+            scores = self._matrix[:self._used_rows] @ vector
+            scores[self._row_namespaces[:self._used_rows] != namespace_id] = -1.0
+            while True:
+                best = int(np.argmax(scores))
+                if scores[best] < self.similarity_threshold:
+                    return None
+                key = self._row_keys[best]
+                if not self._expired(key):
+                    self.exact.move_to_end(key)
+                    return self.exact[key]
+                # 最相似的缓存项已过期：删除后继续找次相似的
+                self._remove(key)
+                scores[best] = -1.0
+
+    def lookup(self, prompt: str, namespace: str = "") -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+        """查找缓存，返回(命中结果, 提示词向量)，向量可在写入时复用"""
+        result = self._get_exact(self._hash(namespace, prompt))
+        if result is not None:
+            return self._count(result), None
+
+        vector = self._embed(prompt)
+        if vector is None:
+            return self._count(None), None
+        return self._count(self._search(vector, namespace)), vector
+
+    async def alookup(self, prompt: str, namespace: str = "") -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+        """异步查找缓存"""
+        result = self._get_exact(self._hash(namespace, prompt))
+        if result is not None:
+            return self._count(result), None
+
+        vector = await self._aembed(prompt)
+        if vector is None:
+            return self._count(None), None
+        return self._count(self._search(vector, namespace)), vector
+
+    def put(self, prompt: str, result: Dict[str, Any], namespace: str = "",
+            vector: Optional[np.ndarray] = None):
+        """写入缓存"""
+        key = self._hash(namespace, prompt)
+        if vector is None and key not in self.exact:
+            vector = self._embed(prompt)
+
+        with self._lock:
+            if self.max_size <= 0:
+                return
+            if self.ttl is not None:
+                self._expires[key] = time.time() + self.ttl
+            if key in self.exact:
+                self.exact[key] = result
+                self.exact.move_to_end(key)
+                return
+
+            # 先淘汰最久未使用的缓存项，保证新缓存项有空闲行
+            while len(self.exact) >= self.max_size:
+                self._remove(next(iter(self.exact)))
+            self.exact[key] = result
+            if vector is not None:
+                self._store_vector(key, vector, namespace)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self.exact.clear()
+            self._expires.clear()
+            self._namespace_ids.clear()
+            self._matrix = None
+            self._row_namespaces = np.empty(0, dtype=np.int32)
+            self._row_keys = []
+            self._rows.clear()
+            self._free_rows.clear()
+            self._used_rows = 0
+
+
+# 全局提示词缓存
+prompt_cache = PromptCache(
+    max_size=settings.AI_PROMPT_CACHE_SIZE,
+    similarity_threshold=settings.AI_PROMPT_CACHE_SIMILARITY,
+    semantic=settings.AI_PROMPT_CACHE_SEMANTIC
+)
+
+# 确定性调用（temperature为0）的精确响应缓存，始终启用
+response_cache = PromptCache(
+    max_size=settings.AI_RESPONSE_CACHE_SIZE,
+    ttl=settings.AI_RESPONSE_CACHE_TTL
+)
@@ -5,10 +5,10 @@
 import json
 import time
 import requests
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Sequence
 from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only
 from config import settings, PLATFORM_CONFIGS
 from models import PublishRecord, ContentDraft, PlatformAccount, SystemLog
 
@@ -337,16 +337,40 @@ class PublishManager:
             "results": results
         }
     
-    def get_publish_records(self, draft_id: Optional[int] = None, platform: Optional[str] = None) -> List[PublishRecord]:
-        """获取发布记录"""
+    def _publish_records_query(self, draft_id: Optional[int] = None, platform: Optional[str] = None,
+                               status: Optional[str] = None):
+        """按条件筛选发布记录的查询"""
         query = self.db.query(PublishRecord)
         
         if draft_id:
             query = query.filter(PublishRecord.draft_id == draft_id)
         if platform:
             query = query.filter(PublishRecord.platform == platform)
+        if status:
+            query = query.filter(PublishRecord.status == status)
+        return query
+    
+    def get_publish_records(self, draft_id: Optional[int] = None, platform: Optional[str] = None,
+                            status: Optional[str] = None, skip: int = 0,
+                            limit: Optional[int] = None,
+                            fields: Optional[Sequence[str]] = None) -> List[PublishRecord]:
+        """获取发布记录（按创建时间倒序，筛选和分页在数据库中完成）
         
-        return query.order_by(PublishRecord.created_at.desc()).all()
+        fields指定时只从数据库加载这些列（正文等大字段不再读取）
+        """
+        query = self._publish_records_query(draft_id, platform, status).order_by(PublishRecord.created_at.desc())
+        if fields:
+            query = query.options(load_only(*(getattr(PublishRecord, name) for name in fields)))
+        if skip:
+            query = query.offset(skip)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+    
+    def count_publish_records(self, draft_id: Optional[int] = None, platform: Optional[str] = None,
+                              status: Optional[str] = None) -> int:
+        """统计符合条件的发布记录数"""
+        return self._publish_records_query(draft_id, platform, status).count()
     
     def check_platform_content(self, platform: str, content: Dict[str, Any]) -> Dict[str, Any]:
         """检查内容是否适合指定平台"""
@@ -367,11 +391,11 @@ class PublishManager:
         publisher = publisher_class(account)
         return publisher.check_content(content)
     
-    def get_platform_suggestions(self, content: Dict[str, Any]) -> Dict[str, Any]:
-        """获取平台适配建议"""
+    def get_platform_suggestions(self, content: Dict[str, Any], platforms: Optional[List[str]] = None) -> Dict[str, Any]:
+        """获取平台适配建议（platforms为空时检查所有支持的平台）"""
         suggestions = {}
         
-        for platform in self.publishers.keys():
+        for platform in platforms or self.publishers.keys():
             check_result = self.check_platform_content(platform, content)
             
             config = PLATFORM_CONFIGS.get(platform, {})
@@ -0,0 +1,1031 @@
+#!/usr/bin/env python3
+"""
+接口输出测试脚本
+在临时数据库中写入样例数据，通过FastAPI测试客户端调用接口，
+将输出与逐条计算的参考结果（与优化前的实现逻辑一致）对比；
+AI模型相关测试使用测试模型或模拟客户端，不访问真实接口
+"""
+import asyncio
+import json
+import os
+import tempfile
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import httpx
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, insert, inspect, select, text
+from sqlalchemy.orm import sessionmaker
+
+import ai_models
+import main
+import models
+from ai_models import AIModelManager, BaiduModel, BaseAIModel, OpenAIModel, PromptCategory
+from analytics import ContentAnalyzer, invalidate_performance_cache
+from config import settings
+from models import (
+    AIModelConfig, Base, ContentDraft, HotTopic, LlmCallMetric, PlatformAccount, PublishRecord, SystemLog
+)
+from prompt_cache import PromptCache, response_cache
+
+CATEGORIES = ["科技", "娱乐", "财经", None]
+SENTIMENTS = ["positive", "negative", "neutral"]
+KEYWORDS = ["人工智能", "手机", "电影", "股市", "新能源"]
+PUBLISH_PLATFORMS = ["weibo", "wechat", "toutiao"]
+PUBLISH_STATUSES = ["success", "success", "failed", "scheduled"]
+TITLES = ["短标题", "一个中等长度的标题用来测试标题长度分析效果", "这是一个非常长的标题" * 5]
+
+
+def create_test_client():
+    """创建使用临时SQLite文件数据库的测试客户端，返回(client, Session工厂, 数据库文件路径)"""
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    main.app.dependency_overrides[main.get_db] = override_get_db
+    return TestClient(main.app), session_factory, path
+
+
+def close_test_client(path: str):
+    """清理测试数据库"""
+    main.app.dependency_overrides.clear()
+    os.remove(path)
+
+
+class StubModel(BaseAIModel):
+    """测试用模型：只实现异步接口，同步接口被调用时直接失败"""
+
+    def generate_text(self, prompt: str, **kwargs):
+        raise AssertionError("接口请求中不应调用同步生成")
+
+    async def agenerate_text(self, prompt: str, **kwargs):
+        await asyncio.sleep(0)
+        return {"success": True, "content": f"生成结果:{prompt}", "usage": {"total_tokens": 10}, "model": "stub"}
+
+    def generate_text_stream(self, prompt: str, **kwargs):
+        raise AssertionError("接口请求中不应调用同步流式生成")
+
+    def test_connection(self) -> bool:
+        return True
+
+
+def add_stub_config(db) -> int:
+    """注册测试模型并写入默认配置，返回配置ID"""
+    AIModelManager.MODEL_CLASSES["stub"] = StubModel
+    config = AIModelConfig(name="测试模型", provider="stub", api_key="test", is_default=True)
+    db.add(config)
+    db.commit()
+    return config.id
+
+
+def remove_stub_model():
+    """注销测试模型，清空模型缓存并丢弃测试产生的调用指标"""
+    AIModelManager.MODEL_CLASSES.pop("stub", None)
+    AIModelManager._invalidate_model_cache()
+    ai_models._metric_buffer.clear()
+    ai_models._log_buffer.clear()
+
+
+def seed_hot_topics(db, count: int = 40):
+    """写入最近几天的热点数据"""
+    now = datetime.now()
+    for i in range(count):
+        db.add(HotTopic(
+            platform=["weibo", "zhihu", "baidu"][i % 3],
+            title=f"热点话题{i}",
+            keywords=",".join(KEYWORDS[j % len(KEYWORDS)] for j in range(i % 4)) or None,
+            hot_score=float((i * 37) % 100) + 0.5,
+            category=CATEGORIES[i % len(CATEGORIES)],
+            sentiment=SENTIMENTS[i % len(SENTIMENTS)],
+            created_at=now - timedelta(hours=i * 3)
+        ))
+    db.commit()
+
+
+def seed_publish_records(db, count: int = 36):
+    """写入发布记录（部分记录缺少发布时间、互动数据或错误信息）"""
+    now = datetime.now()
+    for i in range(count):
+        status = PUBLISH_STATUSES[i % len(PUBLISH_STATUSES)]
+        db.add(PublishRecord(
+            draft_id=None,
+            platform=PUBLISH_PLATFORMS[i % len(PUBLISH_PLATFORMS)],
+            platform_post_id=f"post_{i}" if status == "success" else None,
+            title=TITLES[i % len(TITLES)] if i % 7 else None,
+            content="正文内容" * (i % 5) or None,
+            status=status,
+            publish_time=now - timedelta(hours=i * 5 + 1) if i % 5 else None,
+            error_message=(f"发布失败原因{i % 3}" if i % 6 else None) if status == "failed" else None,
+            view_count=(i * 13) % 200 if i % 4 else None,
+            like_count=(i * 7) % 50,
+            comment_count=i % 9 if i % 3 else None,
+            share_count=i % 4,
+            created_at=now - timedelta(hours=i * 5)
+        ))
+    db.commit()
+
+
+def reference_trending(topics):
+    """逐条计算热点趋势统计（参考结果）"""
+    platform_stats = defaultdict(lambda: {"count": 0, "total_score": 0})
+    daily_trends = defaultdict(lambda: {"count": 0, "total_score": 0})
+    all_keywords = []
+    for topic in topics:
+        platform_stats[topic.platform]["count"] += 1
+        platform_stats[topic.platform]["total_score"] += topic.hot_score
+        date_key = topic.created_at.strftime("%Y-%m-%d")
+        daily_trends[date_key]["count"] += 1
+        daily_trends[date_key]["total_score"] += topic.hot_score
+        if topic.keywords:
+            all_keywords.extend(kw.strip() for kw in topic.keywords.split(","))
+    for stats in list(platform_stats.values()) + list(daily_trends.values()):
+        stats["avg_score"] = round(stats["total_score"] / stats["count"], 2)
+    return {
+        "platform_analysis": dict(platform_stats),
+        "category_distribution": dict(Counter(t.category for t in topics).most_common(10)),
+        "sentiment_analysis": dict(Counter(t.sentiment for t in topics)),
+        "top_keywords": dict(Counter(all_keywords).most_common(20)),
+        "daily_trends": dict(daily_trends),
+    }
+
+
+def engagement(record):
+    """单条记录的互动总数"""
+    return (record.view_count or 0) + (record.like_count or 0) + \
+        (record.comment_count or 0) + (record.share_count or 0)
+
+
+def reference_content_performance(records, days):
+    """逐条计算内容表现分析（参考结果，不含分析时间段）"""
+    total_posts = len(records)
+    successful = [r for r in records if r.status == "success"]
+    failed = [r for r in records if r.status == "failed"]
+
+    platform_stats = defaultdict(lambda: {"posts": 0, "success": 0, "views": 0, "likes": 0, "comments": 0, "shares": 0})
+    hour_stats = defaultdict(lambda: {"posts": 0, "success": 0, "total_engagement": 0})
+    for record in records:
+        stats = platform_stats[record.platform]
+        stats["posts"] += 1
+        if record.status == "success":
+            stats["success"] += 1
+            stats["views"] += record.view_count or 0
+            stats["likes"] += record.like_count or 0
+            stats["comments"] += record.comment_count or 0
+            stats["shares"] += record.share_count or 0
+        if record.publish_time:
+            hour = hour_stats[record.publish_time.hour]
+            hour["posts"] += 1
+            if record.status == "success":
+                hour["success"] += 1
+                hour["total_engagement"] += engagement(record)
+
+    platform_analysis = {}
+    for platform, stats in platform_stats.items():
+        base = max(stats["success"], 1)
+        total = stats["views"] + stats["likes"] + stats["comments"] + stats["shares"]
+        platform_analysis[platform] = {
+            "posts": stats["posts"],
+            "success_rate": round(stats["success"] / stats["posts"] * 100, 2),
+            "avg_views": round(stats["views"] / base, 2),
+            "avg_likes": round(stats["likes"] / base, 2),
+            "avg_comments": round(stats["comments"] / base, 2),
+            "avg_shares": round(stats["shares"] / base, 2),
+            "avg_engagement": round(total / base, 2)
+        }
+
+    best_hours = []
+    for hour, stats in hour_stats.items():
+        if stats["success"] > 0:
+            avg_engagement = stats["total_engagement"] / stats["success"]
+            success_rate = stats["success"] / stats["posts"] * 100
+            best_hours.append({
+                "hour": hour,
+                "success_rate": round(success_rate, 2),
+                "avg_engagement": round(avg_engagement, 2),
+                "score": round(success_rate * 0.7 + avg_engagement * 0.3, 2)
+            })
+    best_hours.sort(key=lambda x: x["score"], reverse=True)
+
+    # 标题长度分组的平均互动
+    groups = {"short": [], "medium": [], "long": []}
+    for record in successful:
+        if record.title:
+            length = len(record.title)
+            key = "short" if length <= 20 else "medium" if length <= 40 else "long"
+            groups[key].append(engagement(record))
+    title_ranges = {key: sum(values) / len(values) for key, values in groups.items() if values}
+    failure_reasons = Counter(r.error_message[:50] if r.error_message else "未知错误" for r in failed)
+
+    return {
+        "total_posts": total_posts,
+        "performance_summary": {
+            "success_rate": round(len(successful) / total_posts * 100, 2),
+            "failure_rate": round(len(failed) / total_posts * 100, 2),
+            "avg_daily_posts": round(total_posts / days, 2)
+        },
+        "platform_analysis": platform_analysis,
+        "time_analysis": {
+            "best_hours": best_hours[:5],
+            "hour_distribution": dict(hour_stats)
+        },
+        "content_insights": {
+            "best_title_length": max(title_ranges.items(), key=lambda x: x[1])[0] if title_ranges else "medium",
+            "title_length_analysis": title_ranges,
+            "total_successful_posts": len(successful),
+            "total_failed_posts": len(failed),
+            "common_failure_reasons": dict(failure_reasons.most_common(5))
+        }
+    }
+
+
+def reference_publish_stats(records):
+    """逐条计算发布统计（参考结果）"""
+    platform_counts = defaultdict(lambda: {"total": 0, "success": 0, "failed": 0})
+    daily_counts = defaultdict(int)
+    week_ago = datetime.now() - timedelta(days=7)
+    for record in records:
+        platform_counts[record.platform]["total"] += 1
+        if record.status in ("success", "failed"):
+            platform_counts[record.platform][record.status] += 1
+        if record.created_at >= week_ago:
+            daily_counts[record.created_at.strftime("%Y-%m-%d")] += 1
+    return {
+        "platform_stats": [
+            {"platform": platform, **counts, "success_rate": round(counts["success"] / counts["total"] * 100, 1)}
+            for platform, counts in platform_counts.items()
+        ],
+        "daily_stats": [{"date": date, "count": count} for date, count in sorted(daily_counts.items())]
+    }
+
+
+def reference_hotspot_stats(topics):
+    """逐条计算最近24小时的热点统计（参考结果）"""
+    day_ago = datetime.now() - timedelta(hours=24)
+    recent = [t for t in topics if t.created_at >= day_ago]
+    platform_stats = defaultdict(lambda: {"count": 0, "total_score": 0.0})
+    for topic in recent:
+        platform_stats[topic.platform]["count"] += 1
+        platform_stats[topic.platform]["total_score"] += topic.hot_score
+    return {
+        "total_topics": len(recent),
+        "platform_stats": {
+            platform: {"count": stats["count"], "avg_score": round(stats["total_score"] / stats["count"], 2)}
+            for platform, stats in platform_stats.items()
+        },
+        "category_stats": dict(Counter(t.category for t in recent)),
+        "sentiment_stats": dict(Counter(t.sentiment for t in recent)),
+    }
+
+
+def assert_stats_equal(actual, expected, name):
+    """递归比较统计结果（字典按键、列表逐项），浮点数允许舍入误差"""
+    if isinstance(expected, dict):
+        assert set(actual) == set(expected), f"{name} 键不一致: {sorted(actual, key=str)} != {sorted(expected, key=str)}"
+        for key, value in expected.items():
+            assert_stats_equal(actual[key], value, f"{name}[{key}]")
+    elif isinstance(expected, list):
+        assert len(actual) == len(expected), f"{name} 长度不一致: {len(actual)} != {len(expected)}"
+        for i, (item, value) in enumerate(zip(actual, expected)):
+            assert_stats_equal(item, value, f"{name}[{i}]")
+    elif isinstance(expected, float):
+        assert abs(actual - expected) < 1e-6, f"{name}: {actual} != {expected}"
+    else:
+        assert actual == expected, f"{name}: {actual} != {expected}"
+
+
+def test_hotspot_analysis_endpoint():
+    """测试热点分析接口：非空数据时可正常序列化，且与参考结果一致"""
+    print("🧪 测试热点分析接口...")
+    client, session_factory, path = create_test_client()
+    try:
+        db = session_factory()
+        seed_hot_topics(db)
+        topics = db.query(HotTopic).all()
+        # 经过JSON编码后比较（空分类等键会变成"null"）
+        expected = json.loads(json.dumps(reference_trending(topics)))
+        db.close()
+
+        response = client.get("/api/analytics/hotspot?days=7")
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert data["total_topics"] == len(topics)
+        assert data["analysis_period"]["days"] == 7
+        for key, value in expected.items():
+            assert_stats_equal(data[key], value, key)
+        assert [o["rank"] for o in data["content_opportunities"]] == list(range(1, 11))
+
+        report = client.get("/api/analytics/report?days=7")
+        assert report.status_code == 200, report.text
+        assert report.json()["hotspot_analysis"]["analysis_period"]["days"] == 7
+        print("✅ 热点分析接口正常")
+    finally:
+        close_test_client(path)
+
+
+def test_content_analysis_endpoint():
+    """测试内容表现分析接口与参考结果一致"""
+    print("🧪 测试内容表现分析接口...")
+    client, session_factory, path = create_test_client()
+    try:
+        db = session_factory()
+        seed_publish_records(db)
+        week_ago = datetime.now() - timedelta(days=7)
+        records = db.query(PublishRecord).filter(PublishRecord.created_at >= week_ago).all()
+        expected = json.loads(json.dumps(reference_content_performance(records, 7)))
+        weibo = [r for r in records if r.platform == "weibo"]
+        expected_weibo = json.loads(json.dumps(reference_content_performance(weibo, 7)))
+        db.close()
+
+        response = client.get("/api/analytics/content?days=7")
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert data["analysis_period"]["days"] == 7
+        for key, value in expected.items():
+            assert_stats_equal(data[key], value, key)
+
+        response = client.get("/api/analytics/content?days=7&platform=weibo")
+        assert response.status_code == 200, response.text
+        data = response.json()
+        for key, value in expected_weibo.items():
+            assert_stats_equal(data[key], value, f"weibo.{key}")
+
+        response = client.get("/api/analytics/content?days=7&platform=douyin")
+        assert response.status_code == 200, response.text
+        assert response.json()["total_posts"] == 0
+        print("✅ 内容表现分析接口正常")
+    finally:
+        close_test_client(path)
+
+
+def test_content_performance_cache():
+    """测试内容表现分析缓存在分析器实例间共享，发布记录变更提交后失效，回滚不影响缓存"""
+    print("🧪 测试内容表现分析缓存...")
+    client, session_factory, path = create_test_client()
+    try:
+        db = session_factory()
+        seed_publish_records(db)
+        first = ContentAnalyzer(db).analyze_content_performance(days=7)
+        other_db = session_factory()
+        assert ContentAnalyzer(other_db).analyze_content_performance(days=7) is first, "缓存没有在分析器实例间共享"
+        other_db.close()
+
+        db.add(PublishRecord(platform="weibo", title="新记录", status="failed"))
+        db.flush()
+        db.rollback()
+        assert ContentAnalyzer(db).analyze_content_performance(days=7) is first
+
+        db.add(PublishRecord(platform="weibo", title="新记录", status="failed"))
+        db.commit()
+        response = client.get("/api/analytics/content?days=7")
+        assert response.status_code == 200, response.text
+        assert response.json()["total_posts"] == first["total_posts"] + 1
+        db.close()
+        print("✅ 内容表现分析缓存正常")
+    finally:
+        invalidate_performance_cache()
+        close_test_client(path)
+
+
+def test_publish_stats_endpoints():
+    """测试发布统计和热点统计接口与参考结果一致"""
+    print("🧪 测试发布统计接口...")
+    client, session_factory, path = create_test_client()
+    try:
+        response = client.get("/api/publish/stats")
+        assert response.status_code == 200, response.text
+        assert response.json() == {"platform_stats": [], "daily_stats": []}
+
+        db = session_factory()
+        seed_publish_records(db)
+        seed_hot_topics(db)
+        expected_publish = reference_publish_stats(db.query(PublishRecord).order_by(PublishRecord.id).all())
+        expected_hotspot = json.loads(json.dumps(reference_hotspot_stats(db.query(HotTopic).all())))
+        db.close()
+
+        response = client.get("/api/publish/stats")
+        assert response.status_code == 200, response.text
+        assert_stats_equal(response.json(), expected_publish, "publish_stats")
+
+        response = client.get("/api/hotspot/stats")
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert data["time_range"] == "最近24小时"
+        for key, value in expected_hotspot.items():
+            assert_stats_equal(data[key], value, key)
+        print("✅ 发布统计接口正常")
+    finally:
+        close_test_client(path)
+
+
+def test_publish_records_fields():
+    """测试发布记录接口：筛选、分页和字段选择"""
+    print("🧪 测试发布记录接口...")
+    client, session_factory, path = create_test_client()
+    try:
+        db = session_factory()
+        seed_publish_records(db)
+        records = db.query(PublishRecord).order_by(PublishRecord.created_at.desc()).all()
+        expected = jsonable_encoder([
+            {name: getattr(record, name) for name in main.PUBLISH_RECORD_FIELDS}
+            for record in records
+        ])
+        db.close()
+
+        response = client.get("/api/publish/records?skip=5&limit=10")
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert data["total"] == len(records)
+        assert data["records"] == expected[5:15]
+
+        response = client.get("/api/publish/records?platform=weibo&status=failed&limit=100")
+        assert response.status_code == 200, response.text
+        data = response.json()
+        filtered = [r for r in expected if r["platform"] == "weibo" and r["status"] == "failed"]
+        assert data["total"] == len(filtered)
+        assert data["records"] == filtered
+
+        response = client.get("/api/publish/records?fields=status, id,status&limit=100")
+        assert response.status_code == 200, response.text
+        assert response.json()["records"] == [{"status": r["status"], "id": r["id"]} for r in expected]
+
+        response = client.get("/api/publish/records?fields=id,content")
+        assert response.status_code == 400
+        assert "content" in response.json()["detail"]
+        print("✅ 发布记录接口正常")
+    finally:
+        close_test_client(path)
+
+
+def test_publish_batch_endpoint():
+    """测试批量发布接口：检查结果与单平台检查一致，只发布检查通过的平台"""
+    print("🧪 测试批量发布接口...")
+    client, session_factory, path = create_test_client()
+    try:
+        db = session_factory()
+        db.add(PlatformAccount(platform="weibo", account_name="测试微博"))
+        draft = ContentDraft(title="测试标题", content="一段适合发布到微博的短内容")
+        db.add(draft)
+        db.commit()
+        draft_id = draft.id
+        db.close()
+
+        platforms = ["weibo", "wechat", "douyin"]
+        response = client.post("/api/publish/batch", json={
+            "draft_id": draft_id, "platforms": platforms, "dry_run": True
+        })
+        assert response.status_code == 200, response.text
+        checks = response.json()["checks"]
+        assert list(checks) == platforms
+        for platform in platforms:
+            single = client.post("/api/publish/check", json={
+                "title": "测试标题", "content": "一段适合发布到微博的短内容", "platform": platform
+            }).json()
+            assert checks[platform]["valid"] == single["valid"]
+            assert checks[platform]["error"] == single["error"]
+        assert client.get("/api/publish/records").json()["total"] == 0
+
+        response = client.post("/api/publish/batch", json={"draft_id": draft_id, "platforms": platforms})
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert data["success"] is True
+        assert data["summary"] == "成功发布到1/3个平台"
+        assert data["publishes"]["weibo"]["success"] is True
+        assert data["publishes"]["wechat"] == {"success": False, "error": checks["wechat"]["error"]}
+        records = client.get("/api/publish/records").json()["records"]
+        assert [(r["platform"], r["status"]) for r in records] == [("weibo", "success")]
+
+        assert client.post("/api/publish/batch", json={"draft_id": draft_id, "platforms": []}).status_code == 400
+        assert client.post("/api/publish/batch", json={"draft_id": draft_id + 1, "platforms": ["weibo"]}).status_code == 404
+        print("✅ 批量发布接口正常")
+    finally:
+        close_test_client(path)
+
+
+def test_content_generate_endpoints():
+    """测试内容生成接口走异步生成路径，并记录使用统计"""
+    print("🧪 测试内容生成接口...")
+    client, session_factory, path = create_test_client()
+    try:
+        db = session_factory()
+        config_id = add_stub_config(db)
+        db.close()
+
+        response = client.post("/api/content/generate", json={"prompt": "写一段介绍"})
+        assert response.status_code == 200, response.text
+        assert response.json()["content"] == "生成结果:写一段介绍"
+
+        response = client.post("/api/content/comprehensive", json={"topic": "异步接口", "config_id": config_id})
+        assert response.status_code == 200, response.text
+        assert "异步接口" in response.json()["content"]
+
+        response = client.post("/api/content/rewrite", json={"original_content": "原文内容", "config_id": config_id})
+        assert response.status_code == 200, response.text
+        assert "原文内容" in response.json()["rewritten_content"]
+
+        db = session_factory()
+        config = db.query(AIModelConfig).filter(AIModelConfig.id == config_id).first()
+        assert (config.usage_count, config.total_tokens) == (3, 30)
+        db.close()
+        print("✅ 内容生成接口正常")
+    finally:
+        remove_stub_model()
+        close_test_client(path)
+
+
+class SlowStubModel(StubModel):
+    """测试用模型：记录同时进行的调用数，提示词含"失败"时返回失败结果"""
+    active = 0
+    peak = 0
+
+    async def agenerate_text(self, prompt: str, **kwargs):
+        SlowStubModel.active += 1
+        SlowStubModel.peak = max(SlowStubModel.peak, SlowStubModel.active)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            SlowStubModel.active -= 1
+        if "失败" in prompt:
+            return {"success": False, "error": "生成失败", "content": None}
+        return await super().agenerate_text(prompt, **kwargs)
+
+
+def test_content_generate_batch_endpoint():
+    """测试批量生成接口：并发生成，结果按提示词顺序返回，单条失败不影响其他结果"""
+    print("🧪 测试批量生成接口...")
+    client, session_factory, path = create_test_client()
+    try:
+        db = session_factory()
+        config_id = add_stub_config(db)
+        AIModelManager.MODEL_CLASSES["stub"] = SlowStubModel
+        db.close()
+
+        prompts = [f"标题{i}" for i in range(8)] + ["这条会失败"]
+        response = client.post("/api/content/generate/batch", json={"prompts": prompts, "config_id": config_id})
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert data["success"] is True
+        assert data["summary"] == "成功生成8/9条内容"
+        assert [r["content"] for r in data["results"][:8]] == [f"生成结果:标题{i}" for i in range(8)]
+        assert data["results"][8] == {"success": False, "content": None, "error": "生成失败", "usage": None, "model": None}
+        assert SlowStubModel.peak > 1, "批量生成没有并发执行"
+
+        db = session_factory()
+        config = db.query(AIModelConfig).filter(AIModelConfig.id == config_id).first()
+        assert (config.usage_count, config.total_tokens) == (8, 80)
+        db.close()
+
+        assert client.post("/api/content/generate/batch", json={"prompts": []}).status_code == 400
+        too_many = ["提示词"] * (main.MAX_BATCH_PROMPTS + 1)
+        assert client.post("/api/content/generate/batch", json={"prompts": too_many}).status_code == 400
+        print("✅ 批量生成接口正常")
+    finally:
+        remove_stub_model()
+        close_test_client(path)
+
+
+def test_async_generation_sessions():
+    """测试并发异步生成：使用统计写入独立会话，请求会话只在事件循环线程中使用"""
+    print("🧪 测试异步生成统计...")
+    client, session_factory, path = create_test_client()
+    try:
+        db = session_factory()
+        config_id = add_stub_config(db)
+        threads = set()
+        query = db.query
+
+        def tracked_query(*args, **kwargs):
+            threads.add(threading.get_ident())
+            return query(*args, **kwargs)
+
+        db.query = tracked_query
+        manager = AIModelManager(db)
+
+        async def run():
+            return threading.get_ident(), await asyncio.gather(*(
+                manager.generate_content_async(f"提示词{i}", config_id) for i in range(20)
+            ))
+
+        loop_thread, results = asyncio.run(run())
+        assert all(result["success"] for result in results)
+        assert threads == {loop_thread}, "请求会话被线程池中的任务使用"
+        db.close()
+
+        db = session_factory()
+        config = db.query(AIModelConfig).filter(AIModelConfig.id == config_id).first()
+        assert (config.usage_count, config.total_tokens) == (20, 200)
+        db.close()
+        print("✅ 异步生成统计正常")
+    finally:
+        remove_stub_model()
+        close_test_client(path)
+
+
+class StreamStubModel(StubModel):
+    """测试用模型：异步分段输出，记录同时进行的流数量"""
+    active = 0
+    peak = 0
+
+    async def agenerate_text_stream(self, prompt: str, **kwargs):
+        StreamStubModel.active += 1
+        StreamStubModel.peak = max(StreamStubModel.peak, StreamStubModel.active)
+        try:
+            for piece in ("生成", "结果:", prompt):
+                await asyncio.sleep(0.01)
+                yield {"success": True, "content": piece, "finished": False}
+        finally:
+            StreamStubModel.active -= 1
+        yield {"success": True, "content": "", "finished": True,
+               "full_content": f"生成结果:{prompt}", "usage": {"total_tokens": 10}}
+
+
+def test_concurrent_content_streams():
+    """测试异步流式生成：两个流并发输出，完成后写入使用统计，流式接口不再调用同步流"""
+    print("🧪 测试并发流式生成...")
+    client, session_factory, path = create_test_client()
+    try:
+        db = session_factory()
+        config_id = add_stub_config(db)
+        AIModelManager.MODEL_CLASSES["stub"] = StreamStubModel
+        StreamStubModel.peak = 0
+        manager = AIModelManager(db)
+
+        async def consume(prompt):
+            return [chunk async for chunk in manager.agenerate_content_stream(prompt, config_id)]
+
+        async def run():
+            return await asyncio.gather(consume("甲"), consume("乙"))
+
+        for prompt, chunks in zip(("甲", "乙"), asyncio.run(run())):
+            assert "".join(chunk["content"] for chunk in chunks) == f"生成结果:{prompt}"
+            assert chunks[-1]["finished"] and chunks[-1]["full_content"] == f"生成结果:{prompt}"
+        assert StreamStubModel.peak == 2, "两个流没有交替进行"
+        db.close()
+
+        response = client.post("/api/content/generate/stream", json={"prompt": "丙", "config_id": config_id})
+        assert response.status_code == 200, response.text
+        events = [line[len("data: "):] for line in response.text.split("\n\n") if line]
+        assert events[-1] == "[DONE]"
+        assert json.loads(events[-2])["full_content"] == "生成结果:丙"
+
+        db = session_factory()
+        config = db.query(AIModelConfig).filter(AIModelConfig.id == config_id).first()
+        assert (config.usage_count, config.total_tokens) == (3, 30)
+        db.close()
+        print("✅ 并发流式生成正常")
+    finally:
+        remove_stub_model()
+        close_test_client(path)
+
+
+def test_response_cache_per_config():
+    """测试temperature为0的响应缓存按模型配置隔离，同一配置重复请求命中缓存"""
+    print("🧪 测试响应缓存隔离...")
+    client, session_factory, path = create_test_client()
+    try:
+        db = session_factory()
+        first_id = add_stub_config(db)
+        second = AIModelConfig(name="测试模型2", provider="stub", api_key="other")
+        db.add(second)
+        db.commit()
+        manager = AIModelManager(db)
+
+        async def run(config_id):
+            return await manager.generate_content_async(
+                "写一段介绍", config_id, category=PromptCategory.INFORMATIONAL, temperature=0
+            )
+
+        assert asyncio.run(run(first_id))["cache_hit"] is False
+        assert asyncio.run(run(second.id))["cache_hit"] is False, "不同配置共享了响应缓存"
+        assert asyncio.run(run(first_id))["cache_hit"] is True
+        db.close()
+        print("✅ 响应缓存隔离正常")
+    finally:
+        response_cache.clear()
+        remove_stub_model()
+        close_test_client(path)
+
+
+def test_prompt_cache_semantic_rows():
+    """测试语义缓存：矩阵预分配并复用空闲行，语义命中同样更新LRU顺序并检查过期"""
+    print("🧪 测试语义提示词缓存...")
+    vectors = {
+        "写一个手机标题": [1.0, 0.0, 0.0], "写个手机标题": [0.99, 0.141, 0.0],
+        "写一个电影标题": [0.0, 1.0, 0.0], "写一个股市标题": [0.0, 0.0, 1.0],
+        "写一个新能源标题": [0.6, 0.0, 0.8],
+    }
+    cache = PromptCache(max_size=3, similarity_threshold=0.9, ttl=60)
+    cache.semantic = True
+    cache._embed = lambda prompt: np.asarray(vectors[prompt], dtype=np.float32)
+
+    for prompt in ("写一个手机标题", "写一个电影标题", "写一个股市标题"):
+        cache.put(prompt, {"content": prompt})
+    matrix = cache._matrix
+    assert matrix.shape == (3, 3)
+
+    # 语义命中把手机标题移到LRU末尾，写入新提示词时淘汰最久未使用的电影标题并复用它的行
+    hit, _ = cache.lookup("写个手机标题")
+    assert hit == {"content": "写一个手机标题"}
+    movie_row = cache._rows[cache._hash("", "写一个电影标题")]
+    cache.put("写一个新能源标题", {"content": "写一个新能源标题"})
+    assert cache.lookup("写一个电影标题")[0] is None
+    assert cache.lookup("写一个手机标题")[0] == {"content": "写一个手机标题"}
+    assert cache._rows[cache._hash("", "写一个新能源标题")] == movie_row
+    assert cache._matrix is matrix, "写入时重新分配了矩阵"
+
+    # 语义命中的缓存项过期后不再返回，并被删除
+    cache._expires[cache._hash("", "写一个手机标题")] = 0
+    assert cache.lookup("写个手机标题")[0] is None
+    assert cache._hash("", "写一个手机标题") not in cache.exact
+    print("✅ 语义提示词缓存正常")
+
+
+def test_model_cache_shared():
+    """测试模型实例缓存在管理器之间共享，配置更新后失效"""
+    print("🧪 测试模型实例缓存...")
+    client, session_factory, path = create_test_client()
+    try:
+        db = session_factory()
+        config_id = add_stub_config(db)
+        AIModelManager._invalidate_model_cache()
+        first = AIModelManager(db)
+        first.get_model(config_id)
+        # 第二次访问达到缓存阈值，模型实例写入缓存
+        model = first.get_model(config_id)
+        db.close()
+
+        # 新请求的管理器直接命中缓存，不再查询配置；缓存的配置副本在原会话关闭后仍可读取
+        db = session_factory()
+        queries = []
+        query = db.query
+        db.query = lambda *args, **kwargs: queries.append(args) or query(*args, **kwargs)
+        second = AIModelManager(db)
+        cached = second.get_model(config_id)
+        assert cached is model
+        assert queries == []
+        assert cached.config.name == "测试模型"
+
+        second.update_config(config_id, temperature=0.2)
+        db.close()
+
+        db = session_factory()
+        updated = AIModelManager(db).get_model(config_id)
+        assert updated is not cached
+        assert updated.config.temperature == 0.2
+        db.close()
+        print("✅ 模型实例缓存正常")
+    finally:
+        remove_stub_model()
+        close_test_client(path)
+
+
+class StubCompletions:
+    """模拟OpenAI异步接口：记录每次调用的参数，按n返回编号不同的结果"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def create(self, **params):
+        self.calls.append(params)
+        await asyncio.sleep(0)
+        prompt = params["messages"][0]["content"]
+        return SimpleNamespace(
+            model=params["model"],
+            usage=SimpleNamespace(prompt_tokens=10 * params["n"], completion_tokens=7 * params["n"] + 1),
+            choices=[
+                SimpleNamespace(message=SimpleNamespace(content=f"{prompt}-{index}"))
+                for index in range(params["n"])
+            ]
+        )
+
+
+def test_openai_batch_queue():
+    """测试请求合并默认关闭；开启合并窗口后并发的相同请求合并为一次n=k调用，每个调用方拿到各自的结果"""
+    print("🧪 测试OpenAI请求合并...")
+    config = AIModelConfig(id=1, name="openai", provider="openai", api_key="sk-test",
+                           model_name="gpt-3.5-turbo", max_tokens=100, temperature=0.7)
+    model = OpenAIModel(config)
+    completions = StubCompletions()
+    stub_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+    async def run():
+        # 异步客户端按事件循环创建，在当前循环中替换为模拟接口
+        model._async_clients[asyncio.get_running_loop()] = stub_client
+        return await asyncio.gather(
+            *(model.agenerate_text("写标题") for _ in range(5)),
+            model.agenerate_text("写正文"),
+            model.agenerate_text("写标题", temperature=0.1)
+        )
+
+    # 默认不合并，每个请求单独调用接口
+    assert settings.AI_OPENAI_BATCH_WINDOW == 0
+    asyncio.run(run())
+    assert [call["n"] for call in completions.calls] == [1] * 7
+    completions.calls.clear()
+
+    settings.AI_OPENAI_BATCH_WINDOW = 0.02
+    try:
+        results = asyncio.run(run())
+    finally:
+        settings.AI_OPENAI_BATCH_WINDOW = 0
+    titles, body, other = results[:5], results[5], results[6]
+
+    # 相同提示词和参数的5个请求只调用一次接口，其余请求各自单独调用
+    assert sorted((call["messages"][0]["content"], call["temperature"], call["n"]) for call in completions.calls) == [
+        ("写标题", 0.1, 1), ("写标题", 0.7, 5), ("写正文", 0.7, 1)
+    ]
+    assert all(result["success"] for result in results)
+    assert sorted(result["content"] for result in titles) == [f"写标题-{i}" for i in range(5)]
+    assert (body["content"], other["content"]) == ("写正文-0", "写标题-0")
+
+    # token用量按条均摊，合计等于接口返回的用量
+    assert sum(result["usage"]["prompt_tokens"] for result in titles) == 50
+    assert sum(result["usage"]["completion_tokens"] for result in titles) == 36
+    print("✅ OpenAI请求合并正常")
+
+
+def test_async_client_per_loop():
+    """测试共享异步HTTP客户端按事件循环创建，同一循环内复用，关闭后不影响其他循环"""
+    print("🧪 测试异步HTTP客户端...")
+
+    async def use_client():
+        client = ai_models.get_async_client()
+        assert ai_models.get_async_client() is client
+        await ai_models.close_async_client()
+        assert client.is_closed
+        return client
+
+    first, second = asyncio.run(use_client()), asyncio.run(use_client())
+    assert first is not second, "不同事件循环复用了同一个客户端"
+    print("✅ 异步HTTP客户端正常")
+
+
+def test_baidu_http_status():
+    """测试百度接口返回非200状态码时给出HTTP错误，而不是解析响应体失败"""
+    print("🧪 测试百度接口状态码...")
+    responses = [httpx.Response(502, text="Bad Gateway"), httpx.Response(200, json={"result": "生成结果"})]
+
+    def handler(request):
+        if request.url.path.endswith("/token"):
+            return httpx.Response(200, json={"access_token": "token", "expires_in": 3600})
+        return responses.pop(0)
+
+    config = AIModelConfig(id=2, name="baidu", provider="baidu", api_key="ak", api_secret="sk",
+                           model_name="ernie-bot-turbo", max_tokens=100, temperature=0.7)
+    model = BaiduModel(config)
+    BaiduModel._client = httpx.Client(transport=httpx.MockTransport(handler))
+    try:
+        failed = model.generate_text("写标题")
+        assert failed == {"success": False, "error": "HTTP 502: Bad Gateway", "content": None}, failed
+        assert model.generate_text("写标题")["content"] == "生成结果"
+        print("✅ 百度接口状态码处理正常")
+    finally:
+        BaiduModel.close_client()
+        ai_models._TOKEN_CACHE.pop(model._token_key(), None)
+
+
+def test_baidu_token_persisted_once():
+    """测试百度访问令牌只在新获取时随使用统计写入配置表，之后的调用不再重复写入"""
+    print("🧪 测试百度令牌持久化...")
+    client, session_factory, path = create_test_client()
+
+    def handler(request):
+        if request.url.path.endswith("/token"):
+            return httpx.Response(200, json={"access_token": "token", "expires_in": 3600})
+        return httpx.Response(200, json={"result": "生成结果", "usage": {"total_tokens": 5}})
+
+    BaiduModel._client = httpx.Client(transport=httpx.MockTransport(handler))
+    try:
+        db = session_factory()
+        config = AIModelConfig(name="百度", provider="baidu", api_key="persist-ak", api_secret="persist-sk")
+        db.add(config)
+        db.commit()
+        manager = AIModelManager(db)
+
+        assert manager.generate_content("写标题", config.id)["success"]
+        db.refresh(config)
+        assert config.access_token == "token" and config.token_expires_at is not None
+
+        # 令牌未刷新时不再写入：缓存的模型实例仍持有旧令牌，手工改动的值保持不变
+        assert manager.generate_content("写标题", config.id)["success"]
+        config.access_token = "stored"
+        db.commit()
+        assert manager.generate_content("写标题", config.id)["success"]
+        db.refresh(config)
+        assert (config.access_token, config.usage_count) == ("stored", 3)
+        db.close()
+        print("✅ 百度令牌持久化正常")
+    finally:
+        BaiduModel.close_client()
+        ai_models._TOKEN_CACHE.pop(("persist-ak", "persist-sk"), None)
+        AIModelManager._invalidate_model_cache()
+        ai_models._metric_buffer.clear()
+        ai_models._log_buffer.clear()
+        close_test_client(path)
+
+
+def test_schema_migration():
+    """测试结构迁移：旧数据库补齐新增列、旧日志中的调用记录转换为调用指标，已是最新版本时不再检查表结构"""
+    print("🧪 测试数据库结构迁移...")
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{path}")
+    original_engine = models.engine
+    models.engine = engine
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE ai_model_configs (id INTEGER PRIMARY KEY, name VARCHAR(50), "
+                              "provider VARCHAR(20) NOT NULL, max_concurrent INTEGER)"))
+        Base.metadata.create_all(engine)
+        # 旧版本在系统日志中记录的调用：成功调用为INFO日志，失败调用为ERROR日志
+        legacy_time = datetime.now() - timedelta(days=2)
+        with engine.begin() as conn:
+            conn.execute(insert(SystemLog), [
+                {"level": "INFO", "module": "ai_models", "message": "AI内容生成", "created_at": legacy_time,
+                 "details": {"config_id": 1, "success": True, "response_time": 1.5, "usage": {"total_tokens": 120}}},
+                {"level": "INFO", "module": "ai_models", "message": "AI流式生成完成", "created_at": legacy_time,
+                 "details": {"config_id": 1, "success": True, "response_time": 0.5, "usage": None}},
+                {"level": "ERROR", "module": "ai_models", "message": "AI内容生成", "created_at": legacy_time,
+                 "details": {"config_id": 1, "success": False, "error": "超时"}},
+                {"level": "INFO", "module": "publisher", "message": "发布完成", "created_at": legacy_time,
+                 "details": {"success": True}},
+            ])
+        models.migrate_db(is_new=False)
+
+        columns = {column["name"] for column in inspect(engine).get_columns("ai_model_configs")}
+        assert {"access_token", "token_expires_at", "requests_per_minute", "max_tokens_budget"} <= columns
+        with engine.connect() as conn:
+            metrics = conn.execute(select(
+                LlmCallMetric.config_id, LlmCallMetric.duration_ms, LlmCallMetric.total_tokens, LlmCallMetric.success
+            ).order_by(LlmCallMetric.duration_ms)).all()
+        assert [tuple(row) for row in metrics] == [(1, 500, 0, True), (1, 1500, 120, True)]
+        with engine.connect() as conn:
+            version = conn.execute(text("SELECT version FROM schema_version")).scalar()
+        assert version == models.SCHEMA_MIGRATIONS[-1][0]
+
+        # 已是最新版本：再次启动时不执行任何ALTER TABLE
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        models.migrate_db(is_new=False)
+        assert not any("ALTER" in statement for statement in statements)
+        print("✅ 数据库结构迁移正常")
+    finally:
+        models.engine = original_engine
+        engine.dispose()
+        os.remove(path)
+
+
+def main_tests():
+    """运行所有测试"""
+    print("🎯 自媒体运营工具 - 接口输出测试")
+    print("=" * 50)
+
+    tests = [
+        ("热点分析接口", test_hotspot_analysis_endpoint),
+        ("内容表现分析接口", test_content_analysis_endpoint),
+        ("内容表现分析缓存", test_content_performance_cache),
+        ("发布统计接口", test_publish_stats_endpoints),
+        ("发布记录接口", test_publish_records_fields),
+        ("批量发布接口", test_publish_batch_endpoint),
+        ("内容生成接口", test_content_generate_endpoints),
+        ("批量生成接口", test_content_generate_batch_endpoint),
+        ("异步生成统计", test_async_generation_sessions),
+        ("并发流式生成", test_concurrent_content_streams),
+        ("响应缓存隔离", test_response_cache_per_config),
+        ("语义提示词缓存", test_prompt_cache_semantic_rows),
+        ("模型实例缓存", test_model_cache_shared),
+        ("OpenAI请求合并", test_openai_batch_queue),
+        ("异步HTTP客户端", test_async_client_per_loop),
+        ("百度接口状态码", test_baidu_http_status),
+        ("百度令牌持久化", test_baidu_token_persisted_once),
+        ("数据库结构迁移", test_schema_migration),
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test_name}测试失败: {e}")
+        print()
+
+    print("=" * 50)
+    print(f"📊 测试结果: {passed}/{len(tests)} 通过")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    main_tests()
@@ -10,20 +10,17 @@ from datetime import datetime, timedelta
 class PublishTester:
     def __init__(self, base_url="http://localhost:8000"):
         self.base_url = base_url
+        # 所有测试请求复用同一个会话，保持长连接
+        self.session = requests.Session()
     
     def call_api(self, endpoint, method="GET", data=None):
         """调用API接口"""
         url = f"{self.base_url}{endpoint}"
         
         try:
-            if method == "GET":
-                response = requests.get(url)
-            elif method == "POST":
-                response = requests.post(url, json=data)
-            elif method == "PUT":
-                response = requests.put(url, json=data)
-            elif method == "DELETE":
-                response = requests.delete(url)
+            # GET/DELETE不带请求体
+            body = data if method in ("POST", "PUT") else None
+            response = self.session.request(method, url, json=body)
             
             return {
                 "success": response.status_code < 400,